@@ -0,0 +1,100 @@
+# -*- test-case-name: admintools.test.test_admin -*-
+import json
+
+from twisted.internet import reactor
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+
+from .profiler import COLLAPSED, PROFILE_FORMATS, PSTATS
+
+class MetricsResource(Resource):
+    """
+    Serves the gateway metrics in the Prometheus text format.
+    """
+    isLeaf = True
+
+    def __init__(self, registry):
+        super().__init__()
+        self.registry = registry
+
+    def render_GET(self, request):
+        request.setHeader(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")
+        return self.registry.render().encode("utf-8")
+
+def _json(request, data, code=200):
+    request.setResponseCode(code)
+    request.setHeader(b"Content-Type", b"application/json")
+    return json.dumps(data).encode("utf-8")
+
+class StagesResource(Resource):
+    """
+    Serves the per-stage timings of the hot paths as JSON. POST resets them.
+    """
+    isLeaf = True
+
+    def __init__(self, stage_timings):
+        super().__init__()
+        self.stage_timings = stage_timings
+
+    def render_GET(self, request):
+        return _json(request, self.stage_timings.snapshot())
+
+    def render_POST(self, request):
+        self.stage_timings.reset()
+        return _json(request, self.stage_timings.snapshot())
+
+class ProfileResource(Resource):
+    """
+    Profiles the gateway on demand: GET /profile?seconds=N&format=collapsed|pstats
+    responds once the profile is written, with the path of the file.
+    """
+    isLeaf = True
+    max_seconds = 300
+
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+
+    def render_GET(self, request):
+        try:
+            seconds = float(request.args.get(b"seconds", [b"10"])[0])
+            format = request.args.get(b"format", [COLLAPSED.encode()])[0].decode()
+        except (ValueError, UnicodeDecodeError):
+            return _json(request, {"error": "Invalid seconds or format"}, 400)
+        if not 0 < seconds <= self.max_seconds or format not in PROFILE_FORMATS:
+            return _json(request, {"error": f"seconds must be in ]0, {self.max_seconds}] and format one of {', '.join(PROFILE_FORMATS)}"}, 400)
+        if self.profiler.running is not None:
+            return _json(request, {"error": "A profile is already running"}, 409)
+
+        disconnected = []
+        request.notifyFinish().addErrback(disconnected.append)
+
+        def written(path):
+            if disconnected:
+                return # the profile is still written, the client just does not get its path
+            format = PSTATS if path.endswith(".pstats") else COLLAPSED # collapsed falls back to pstats without setitimer
+            request.write(_json(request, {"path": path, "format": format, "seconds": seconds}))
+            request.finish()
+        self.profiler.start(seconds, format).addCallback(written)
+        return NOT_DONE_YET
+
+def admin_site(registry, stage_timings=None, profiler=None):
+    """
+    Builds the admin web site: /metrics, and /stages and /profile when given the stage timings and a Profiler.
+    """
+    root = Resource()
+    root.putChild(b"metrics", MetricsResource(registry))
+    if stage_timings is not None:
+        root.putChild(b"stages", StagesResource(stage_timings))
+    if profiler is not None:
+        root.putChild(b"profile", ProfileResource(profiler))
+    return Site(root)
+
+def listen_admin(port, interface, site, reactor=reactor):
+    """
+    Starts the admin listener.
+
+    Returns:
+        the listening port
+    """
+    return reactor.listenTCP(port, site, interface=interface)
@@ -0,0 +1,197 @@
+# -*- test-case-name: admintools.test.test_metrics -*-
+from bisect import bisect_left
+
+from twisted.internet import reactor, task
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class PduTypeCounter:
+    """
+    Counter per DIS PDU type, preallocated for the 256 possible types.
+    """
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = [0] * 256
+
+    def inc(self, pdu_type):
+        self.counts[pdu_type] += 1
+
+class Histogram:
+    """
+    Histogram with fixed buckets, preallocated so that observing a value does not allocate.
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class ReactorLagMonitor:
+    """
+    Measures how late the reactor runs a call scheduled at a fixed interval, which is the time it spends
+    busy with other work.
+    """
+    def __init__(self, interval=0.5, clock=reactor):
+        self.interval = interval
+        self.clock = clock
+        self.lag = 0.0 # seconds, last measure
+        self.max_lag = 0.0
+        self.expected = None
+        self.loop = task.LoopingCall(self.measure)
+        self.loop.clock = clock
+
+    def start(self):
+        self.expected = self.clock.seconds() + self.interval
+        self.loop.start(self.interval, now=False)
+
+    def stop(self):
+        if self.loop.running:
+            self.loop.stop()
+
+    def measure(self):
+        now = self.clock.seconds()
+        self.lag = max(0.0, now - self.expected)
+        self.max_lag = max(self.max_lag, self.lag)
+        self.expected = now + self.interval
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    """
+    Collects the metrics of the gateway components when scraped and renders them in the Prometheus text format.
+    Components keep their own plain counters; the registry only reads them through the functions given at
+    registration, so that nothing is computed or allocated per event.
+    """
+    def __init__(self):
+        self.metrics = [] # (name, type, help, function returning [(suffix, labels, value)])
+
+    def counter(self, name, help, value, labels=()):
+        """
+        Registers a counter or adds a labelled series to it.
+
+        Args:
+            value: function returning the current value
+            labels: ((label, value), ...) of the series
+        """
+        self.add(name, "counter", help, lambda: [("", labels, value())])
+
+    def gauge(self, name, help, value, labels=()):
+        self.add(name, "gauge", help, lambda: [("", labels, value())])
+
+    def pdu_type_counter(self, name, help, counter):
+        """
+        Registers a PduTypeCounter, rendered with a pdu_type label for the types seen so far.
+        """
+        self.add(name, "counter", help,
+                 lambda: [("", (("pdu_type", pdu_type),), count) for pdu_type, count in enumerate(counter.counts) if count])
+
+    def histogram(self, name, help, histogram, labels=()):
+        def samples():
+            result = []
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                result.append(("_bucket", labels + (("le", _number(float(bound))),), cumulative))
+            result.append(("_sum", labels, histogram.sum))
+            result.append(("_count", labels, histogram.count))
+            return result
+        self.add(name, "histogram", help, samples)
+
+    def add(self, name, kind, help, samples):
+        for metric in self.metrics:
+            if metric[0] == name:
+                metric[3].append(samples)
+                return
+        self.metrics.append((name, kind, help, [samples]))
+
+    def render(self):
+        """
+        Returns:
+            the current value of every metric, in the Prometheus text exposition format
+        """
+        lines = []
+        for name, kind, help, sources in self.metrics:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for samples in sources:
+                for suffix, labels, value in samples():
+                    lines.append(f"{name}{suffix}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+def gateway_metrics(communicator, http_poster, poller=None, scheduler=None, lag_monitor=None, stage_timings=None):
+    """
+    Registers the metrics of the gateway components.
+
+    Args:
+        communicator: the DISCommunicator
+        http_poster: the HttpPoster
+        poller: the HttpPoller, if any
+        scheduler: the SimulationScheduler, if any
+        lag_monitor: a started ReactorLagMonitor, if any
+        stage_timings: the StageTimings of the hot paths, if any
+
+    Returns:
+        a MetricsRegistry
+    """
+    registry = MetricsRegistry()
+    registry.pdu_type_counter("dis_datagrams_received_total", "DIS datagrams received, by PDU type", communicator.received_by_type)
+    registry.pdu_type_counter("dis_datagrams_decoded_total", "DIS datagrams decoded, by PDU type", communicator.decoded_by_type)
+    registry.counter("dis_datagrams_malformed_total", "DIS datagrams too short for their PDU header", lambda: communicator.malformed_datagrams)
+    registry.counter("dis_decode_errors_total", "DIS datagrams that failed to decode or relay", lambda: communicator.decode_errors)
+    registry.counter("dis_pdus_relayed_total", "EntityStatePdus forwarded to the HTTP receiver", lambda: communicator.relayed_pdus)
+    registry.counter("dis_pdus_emitted_total", "DIS PDUs emitted", lambda: communicator.pdus_emitted)
+    registry.counter("dis_bytes_emitted_total", "Bytes of DIS PDUs emitted", lambda: communicator.bytes_emitted)
+    ingest_queue = communicator.ingest_queue
+    registry.gauge("dis_ingest_queue_size", "Datagrams waiting in the ingest queue", lambda: ingest_queue.size)
+    registry.counter("dis_ingest_queue_shed_total", "Datagrams shed by the ingest queue", lambda: ingest_queue.shed)
+    if communicator.sharding is not None:
+        sharding = communicator.sharding
+        registry.counter("dis_datagrams_foreign_total", "EntityStatePdus of entities handled by another worker", lambda: sharding.foreign)
+    if communicator.enrichment is not None:
+        enrichment = communicator.enrichment
+        registry.gauge("dis_enrichment_pending", "EntityStatePdus submitted to the enrichment executor and not delivered yet", lambda: enrichment.pending)
+        registry.counter("dis_enrichment_batches_total", "Batches sent to the enrichment executor", lambda: enrichment.batches)
+    if communicator.dead_reckoning_filter is not None:
+        dr_filter = communicator.dead_reckoning_filter
+        registry.counter("dis_dead_reckoning_suppressed_total", "EntityStatePdus suppressed by the dead reckoning filter", lambda: dr_filter.suppressed)
+        registry.counter("dis_dead_reckoning_evicted_total", "Entities forgotten by the dead reckoning filter after a few heartbeats without update", lambda: dr_filter.evicted)
+
+    for endpoint, histogram in http_poster.post_latency.items():
+        registry.histogram("http_post_duration_seconds", "Duration of HTTP POSTs, by endpoint", histogram, (("endpoint", endpoint),))
+    registry.gauge("http_requests_in_flight", "HTTP POSTs waiting for a response", lambda: http_poster.active_posts)
+    registry.counter("http_posts_dropped_total", "Forwarded PDUs dropped by the in-flight window", lambda: http_poster.dropped)
+
+    if poller is not None:
+        registry.histogram("http_poll_duration_seconds", "Duration of engagement polls, including their processing", poller.poll_duration)
+        registry.histogram("http_poll_fetch_duration_seconds", "Duration of the GET of engagement polls", poller.fetch_duration)
+        registry.counter("http_poll_not_modified_total", "Engagement requests answered 304 Not Modified", lambda: poller.not_modified)
+        registry.counter("http_poll_stream_reconnects_total", "Reconnections of the engagement long poll or stream", lambda: poller.reconnects)
+    if scheduler is not None:
+        registry.gauge("sim_live_missiles", "Missiles currently simulated", lambda: len(scheduler))
+    if lag_monitor is not None:
+        registry.gauge("reactor_lag_seconds", "Delay of the last reactor lag probe", lambda: lag_monitor.lag)
+        registry.gauge("reactor_lag_max_seconds", "Largest delay of the reactor lag probe", lambda: lag_monitor.max_lag)
+    if stage_timings is not None:
+        for name, stage in sorted(stage_timings.stages.items()):
+            labels = (("stage", name),)
+            registry.counter("stage_calls_total", "Timed calls of a hot path stage", lambda stage=stage: stage.calls, labels)
+            registry.counter("stage_seconds_total", "Time spent in a hot path stage", lambda stage=stage: stage.total, labels)
+            registry.gauge("stage_max_seconds", "Longest call of a hot path stage", lambda stage=stage: stage.max, labels)
+    return registry
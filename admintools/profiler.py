@@ -0,0 +1,168 @@
+# -*- test-case-name: admintools.test.test_profiler -*-
+import cProfile
+import os
+import signal
+import time
+from collections import Counter
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+
+from logtools.logger import get_logger
+
+log = get_logger("admin.info")
+
+class Stage:
+    """
+    Aggregated timing of one stage of a hot path: number of calls, total and maximum duration in seconds.
+    """
+    __slots__ = ("name", "calls", "total", "max")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+class StageTimings:
+    """
+    Registry of the stages timed in the hot paths. Call sites get their Stage once, at import time,
+    and add the durations they measure with time.perf_counter().
+    """
+    def __init__(self):
+        self.stages = {}
+
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        return stage
+
+    def snapshot(self):
+        """
+        Returns:
+            a dictionary of stage name -> {"calls", "total", "mean", "max"}
+        """
+        return {
+            name: {"calls": s.calls, "total": s.total, "mean": s.total / s.calls if s.calls else 0.0, "max": s.max}
+            for name, s in sorted(self.stages.items())
+        }
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.calls = 0
+            stage.total = 0.0
+            stage.max = 0.0
+
+# Stages of the gateway hot paths
+timings = StageTimings()
+
+# Output formats of the profiler
+COLLAPSED = "collapsed" # sampled stacks, one "frame;frame;frame count" line per stack, for flamegraph tools
+PSTATS = "pstats"       # cProfile statistics, for pstats or snakeviz
+PROFILE_FORMATS = (COLLAPSED, PSTATS)
+
+def sampling_supported():
+    return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Profiler:
+    """
+    Profiles the reactor thread for a given duration, on demand.
+    The collapsed format samples the stack on SIGPROF, every interval of CPU time, which keeps the overhead low;
+    it needs setitimer, so on Windows profiles are always taken with cProfile in the pstats format.
+    """
+    def __init__(self, directory="profiles", interval=0.005, clock=reactor):
+        self.directory = directory
+        self.interval = interval # seconds of CPU time between two samples
+        self.clock = clock
+        self.samples = Counter() # collapsed stack -> number of samples
+        self.profile = None # cProfile.Profile of the running pstats profile
+        self.running = None # (format, path, Deferred) of the running profile
+        self.previous_handler = None
+
+    def start(self, duration, format=COLLAPSED):
+        """
+        Starts profiling for the given duration.
+
+        Args:
+            duration: profiling duration, in seconds
+            format: COLLAPSED or PSTATS
+
+        Returns:
+            a Deferred fired with the path of the written file
+        """
+        if self.running is not None:
+            raise RuntimeError("A profile is already running")
+        if format not in PROFILE_FORMATS:
+            raise ValueError(f"Invalid profile format: '{format}'. Expected one of {', '.join(PROFILE_FORMATS)}.")
+        if format == COLLAPSED and not sampling_supported():
+            format = PSTATS
+        os.makedirs(self.directory, exist_ok=True)
+        extension = "folded" if format == COLLAPSED else "pstats"
+        path = os.path.join(self.directory, time.strftime(f"profile-%Y%m%d-%H%M%S-{os.getpid()}.{extension}"))
+        done = Deferred()
+        self.running = (format, path, done)
+        if format == COLLAPSED:
+            self.samples.clear()
+            self.previous_handler = signal.signal(signal.SIGPROF, self.sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.clock.callLater(duration, self.stop)
+        return done
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """
+        Stops the running profile and writes it.
+        """
+        format, path, done = self.running
+        self.running = None
+        if format == COLLAPSED:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self.previous_handler or signal.SIG_DFL)
+            with open(path, "w") as output:
+                for stack, count in self.samples.most_common():
+                    output.write(f"{stack} {count}\n")
+        else:
+            self.profile.disable()
+            self.profile.dump_stats(path)
+            self.profile = None
+        done.callback(path)
+
+    def install_signal_trigger(self, duration, signum=None, format=COLLAPSED):
+        """
+        Starts a profile of the given duration when the process receives a signal (SIGUSR2 by default).
+        Does nothing on platforms without that signal.
+        """
+        signum = signum if signum is not None else getattr(signal, "SIGUSR2", None)
+        if signum is None:
+            return
+
+        def trigger(signum, frame):
+            self.clock.callLater(0, self.start_from_signal, duration, format)
+        signal.signal(signum, trigger)
+
+    def start_from_signal(self, duration, format):
+        if self.running is not None:
+            log.warning("A profile is already running")
+            return
+        log.info("Profiling for %s seconds", duration)
+        self.start(duration, format).addCallback(lambda path: log.info("Profile written to %s", path))
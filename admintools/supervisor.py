@@ -0,0 +1,90 @@
+# -*- test-case-name: admintools.test.test_supervisor -*-
+import os
+import signal
+import subprocess
+import time
+
+from logtools.logger import get_logger
+
+log = get_logger("admin.info")
+
+# Environment variable giving its index to a worker process
+WORKER_INDEX_ENV = "GATEWAY_WORKER_INDEX"
+
+class Supervisor:
+    """
+    Starts and watches the gateway worker processes. Each worker is a new interpreter running the given
+    command, with WORKER_INDEX_ENV set to its index: the reactor is never shared across a fork.
+    A worker that exits is started again after restart_delay seconds, unless respawn is False.
+    SIGINT and SIGTERM stop all the workers. The signals listed in forward_signals (e.g. SIGUSR2, which
+    triggers a profile) are sent on to every worker.
+    """
+    def __init__(self, count, command, env=None, respawn=True, restart_delay=1.0, poll_interval=0.5, forward_signals=()):
+        self.count = count
+        self.command = command
+        self.env = dict(os.environ if env is None else env)
+        self.respawn = respawn
+        self.restart_delay = restart_delay
+        self.poll_interval = poll_interval
+        self.forward_signals = tuple(forward_signals)
+        self.workers = {} # index -> Popen
+        self.restarts = {} # index -> time at which to start it again
+        self.stopping = False
+
+    def spawn(self, index):
+        self.workers[index] = subprocess.Popen(self.command, env={**self.env, WORKER_INDEX_ENV: str(index)})
+        log.info("Worker %s started with pid %s", index, self.workers[index].pid)
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def forward(self, signum, frame=None):
+        for worker in self.workers.values():
+            worker.send_signal(signum)
+
+    def run(self):
+        """
+        Runs the workers until a stop signal, or until they all exited when respawn is False.
+
+        Returns:
+            the exit codes of the workers, by index
+        """
+        previous_handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        previous_handlers.update((signum, signal.signal(signum, self.forward)) for signum in self.forward_signals)
+        for index in range(self.count):
+            self.spawn(index)
+        codes = {}
+        while not self.stopping:
+            now = time.monotonic()
+            for index, worker in list(self.workers.items()):
+                code = worker.poll()
+                if code is None:
+                    continue
+                codes[index] = code
+                del self.workers[index]
+                if self.respawn:
+                    log.warning("Worker %s exited with code %s, restarting it in %s s", index, code, self.restart_delay)
+                    self.restarts[index] = now + self.restart_delay
+            for index, at in list(self.restarts.items()):
+                if now >= at:
+                    del self.restarts[index]
+                    self.spawn(index)
+            if not self.workers and not self.restarts:
+                break
+            time.sleep(self.poll_interval)
+        self.terminate()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        return codes
+
+    def terminate(self, timeout=10.0):
+        for worker in self.workers.values():
+            worker.terminate()
+        for index, worker in self.workers.items():
+            try:
+                worker.wait(timeout)
+            except subprocess.TimeoutExpired:
+                log.warning("Worker %s did not stop, killing it", index)
+                worker.kill()
+                worker.wait()
+        self.workers.clear()
@@ -0,0 +1,16 @@
+from twisted.trial import unittest
+from twisted.web.test.requesthelper import DummyRequest
+
+from admintools.admin import admin_site
+from admintools.metrics import MetricsRegistry
+
+class adminTestCase(unittest.TestCase):
+    def test_metrics_resource(self):
+        registry = MetricsRegistry()
+        registry.gauge("sim_live_missiles", "Missiles currently simulated", lambda: 3)
+        site = admin_site(registry)
+        request = DummyRequest([b"metrics"])
+        resource = site.getResourceFor(request)
+        body = resource.render(request)
+        self.assertIn(b"sim_live_missiles 3\n", body)
+        self.assertTrue(request.responseHeaders.getRawHeaders(b"Content-Type")[0].startswith(b"text/plain"))
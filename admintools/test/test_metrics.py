@@ -0,0 +1,61 @@
+from twisted.internet import task
+from twisted.trial import unittest
+
+from admintools.metrics import Histogram, MetricsRegistry, PduTypeCounter, ReactorLagMonitor, gateway_metrics
+from admintools.profiler import timings
+from distools.dis_communicator import DISCommunicator
+from httptools.http_poster import HttpPoster
+from simtools.scheduler import SimulationScheduler
+
+class metricsTestCase(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        registry = MetricsRegistry()
+        registry.histogram("latency_seconds", "Latency", histogram, (("endpoint", "pdu"),))
+        self.assertEqual(registry.render().splitlines(), [
+            "# HELP latency_seconds Latency",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{endpoint="pdu",le="0.1"} 2',
+            'latency_seconds_bucket{endpoint="pdu",le="1.0"} 3',
+            'latency_seconds_bucket{endpoint="pdu",le="+Inf"} 4',
+            'latency_seconds_sum{endpoint="pdu"} 3.65',
+            'latency_seconds_count{endpoint="pdu"} 4',
+        ])
+
+    def test_pdu_type_counter(self):
+        counter = PduTypeCounter()
+        counter.inc(1)
+        counter.inc(1)
+        counter.inc(20)
+        registry = MetricsRegistry()
+        registry.pdu_type_counter("received_total", "Received", counter)
+        self.assertEqual(registry.render().splitlines()[2:], ['received_total{pdu_type="1"} 2', 'received_total{pdu_type="20"} 1'])
+
+    def test_series_share_help_and_type(self):
+        registry = MetricsRegistry()
+        registry.counter("posts_total", "Posts", lambda: 1, (("endpoint", "pdu"),))
+        registry.counter("posts_total", "Posts", lambda: 2, (("endpoint", "ack"),))
+        self.assertEqual(registry.render().count("# TYPE posts_total counter"), 1)
+
+    def test_reactor_lag(self):
+        clock = task.Clock()
+        monitor = ReactorLagMonitor(interval=0.5, clock=clock)
+        monitor.start()
+        clock.advance(0.5)
+        self.assertEqual(monitor.lag, 0.0)
+        clock.advance(0.8) # the next probe runs 0.3 s late
+        self.assertAlmostEqual(monitor.lag, 0.3)
+        self.assertAlmostEqual(monitor.max_lag, 0.3)
+        monitor.stop()
+
+    def test_gateway_metrics(self):
+        communicator = DISCommunicator(None, {"ip": "127.0.0.1", "port": 3000, "mode": 0}, {"ip": "127.0.0.1", "port": 3001, "mode": 0}, 1)
+        communicator.datagramReceived(b"\x07\x01\x14\x05" + b"\x00" * 4 + b"\x00\x0c\x00\x00", ("127.0.0.1", 3000))
+        poster = HttpPoster(None, "http://receiver", "http://ack", "token")
+        text = gateway_metrics(communicator, poster, scheduler=SimulationScheduler(clock=task.Clock()), stage_timings=timings).render()
+        self.assertIn('dis_datagrams_received_total{pdu_type="20"} 1', text)
+        self.assertIn('http_post_duration_seconds_count{endpoint="ack"} 0', text)
+        self.assertIn("sim_live_missiles 0", text)
+        self.assertIn('stage_calls_total{stage="dis.decode"} ', text)
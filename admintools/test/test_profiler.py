@@ -0,0 +1,93 @@
+import json
+import os
+import pstats
+import time
+
+from twisted.internet import task
+from twisted.trial import unittest
+from twisted.web.test.requesthelper import DummyRequest
+
+from admintools.admin import admin_site
+from admintools.metrics import MetricsRegistry
+from admintools.profiler import COLLAPSED, PSTATS, Profiler, StageTimings, sampling_supported
+
+def busy(seconds):
+    end = time.process_time() + seconds
+    total = 0
+    while time.process_time() < end:
+        total += 1
+    return total
+
+class stageTimingsTestCase(unittest.TestCase):
+    def test_snapshot_and_reset(self):
+        timings = StageTimings()
+        stage = timings.stage("dis.decode")
+        self.assertIs(timings.stage("dis.decode"), stage)
+        stage.add(0.001)
+        stage.add(0.003)
+        self.assertEqual(timings.snapshot(), {"dis.decode": {"calls": 2, "total": 0.004, "mean": 0.002, "max": 0.003}})
+        timings.reset()
+        self.assertEqual(timings.snapshot()["dis.decode"]["calls"], 0)
+
+class profilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = self.mktemp()
+        self.clock = task.Clock()
+
+    def test_pstats_profile(self):
+        profiler = Profiler(self.directory, clock=self.clock)
+        paths = []
+        profiler.start(5, PSTATS).addCallback(paths.append)
+        self.assertRaises(RuntimeError, profiler.start, 5)
+        busy(0.01)
+        self.clock.advance(5)
+        self.assertTrue(paths[0].endswith(".pstats"))
+        self.assertIsNone(profiler.running)
+        functions = [function for _, _, function in pstats.Stats(paths[0]).stats]
+        self.assertIn("busy", functions)
+
+    def test_invalid_format(self):
+        self.assertRaises(ValueError, Profiler(self.directory, clock=self.clock).start, 5, "svg")
+
+    def test_collapsed_profile(self):
+        if not sampling_supported():
+            raise unittest.SkipTest("SIGPROF sampling is not available on this platform")
+        profiler = Profiler(self.directory, interval=0.001, clock=self.clock)
+        paths = []
+        profiler.start(1, COLLAPSED).addCallback(paths.append)
+        busy(0.1)
+        self.clock.advance(1)
+        self.assertTrue(paths[0].endswith(".folded"))
+        with open(paths[0]) as profile:
+            lines = profile.read().splitlines()
+        self.assertTrue(any("busy (test_profiler.py" in line for line in lines))
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+
+    def test_profile_resource(self):
+        profiler = Profiler(self.directory, clock=self.clock)
+        site = admin_site(MetricsRegistry(), StageTimings(), profiler)
+        request = DummyRequest([b"profile"])
+        request.args = {b"seconds": [b"2"], b"format": [b"pstats"]}
+        site.getResourceFor(request).render(request)
+        self.assertEqual(request.written, [])
+        self.clock.advance(2)
+        response = json.loads(b"".join(request.written))
+        self.assertEqual(response["format"], "pstats")
+        self.assertTrue(os.path.exists(response["path"]))
+        self.assertEqual(request.finished, 1)
+
+    def test_profile_resource_rejects_invalid_arguments(self):
+        site = admin_site(MetricsRegistry(), StageTimings(), Profiler(self.directory, clock=self.clock))
+        request = DummyRequest([b"profile"])
+        request.args = {b"seconds": [b"-1"]}
+        site.getResourceFor(request).render(request)
+        self.assertEqual(request.responseCode, 400)
+
+    def test_stages_resource(self):
+        timings = StageTimings()
+        timings.stage("sim.emit").add(0.5)
+        site = admin_site(MetricsRegistry(), timings)
+        request = DummyRequest([b"stages"])
+        body = site.getResourceFor(request).render(request)
+        self.assertEqual(json.loads(body)["sim.emit"]["calls"], 1)
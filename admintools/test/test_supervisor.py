@@ -0,0 +1,53 @@
+import os
+import signal
+import sys
+import time
+
+from twisted.trial import unittest
+
+from admintools.supervisor import WORKER_INDEX_ENV, Supervisor
+
+class supervisorTestCase(unittest.TestCase):
+    def test_workers_get_their_index(self):
+        directory = self.mktemp()
+        os.makedirs(directory)
+        script = f"import os; open(os.path.join({directory!r}, os.environ[{WORKER_INDEX_ENV!r}]), 'w').close()"
+        codes = Supervisor(3, [sys.executable, "-c", script], respawn=False, poll_interval=0.05).run()
+        self.assertEqual(codes, {0: 0, 1: 0, 2: 0})
+        self.assertEqual(sorted(os.listdir(directory)), ["0", "1", "2"])
+
+    def test_respawn(self):
+        counter = self.mktemp()
+        script = f"open({counter!r}, 'a').write('x')"
+        supervisor = Supervisor(1, [sys.executable, "-c", script], restart_delay=0, poll_interval=0.05)
+        original_spawn = supervisor.spawn
+
+        def spawn(index):
+            original_spawn(index)
+            if os.path.exists(counter) and len(open(counter).read()) >= 2:
+                supervisor.stop()
+        supervisor.spawn = spawn
+        supervisor.run()
+        with open(counter) as started:
+            self.assertGreaterEqual(len(started.read()), 2)
+
+    def test_forward_signals(self):
+        directory = self.mktemp()
+        os.makedirs(directory)
+        script = (
+            "import os, signal, time\n"
+            f"path = os.path.join({directory!r}, os.environ[{WORKER_INDEX_ENV!r}])\n"
+            "signal.signal(signal.SIGUSR2, lambda *args: (open(path + '.signaled', 'w').close(), os._exit(0)))\n"
+            "open(path + '.ready', 'w').close()\n"
+            "time.sleep(30)\n"
+        )
+        supervisor = Supervisor(2, [sys.executable, "-c", script], respawn=False, forward_signals=(signal.SIGUSR2,))
+        for index in range(2):
+            supervisor.spawn(index)
+        deadline = time.monotonic() + 20
+        while len(os.listdir(directory)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        supervisor.forward(signal.SIGUSR2)
+        codes = [worker.wait(20) for worker in supervisor.workers.values()]
+        self.assertEqual(codes, [0, 0])
+        self.assertEqual(sorted(name for name in os.listdir(directory) if name.endswith(".signaled")), ["0.signaled", "1.signaled"])
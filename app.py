@@ -1,14 +1,27 @@
-from twisted.web.client import Agent
+from twisted.web.client import Agent, HTTPConnectionPool
 from twisted.internet import reactor, ssl
 from twisted.internet.defer import ensureDeferred
 from twisted.web.client import BrowserLikePolicyForHTTPS
 from twisted.web.iweb import IPolicyForHTTPS
 from urllib.parse import urlparse
+import signal
+import sys
 
 from config.config import load_config_from_env
+from logtools.logger import get_logger, setup_logging
+from admintools.admin import admin_site, listen_admin
+from admintools.metrics import ReactorLagMonitor, gateway_metrics
+from admintools.profiler import Profiler, timings
+from admintools.supervisor import Supervisor
 from distools.dis_communicator import DISCommunicator
+from distools.dead_reckoning import DeadReckoningFilter
+from distools.sharding import EntitySharding
+from distools.enrichment import EnrichmentExecutor, INLINE
 from httptools.http_poster import HttpPoster
+from httptools.conflator import EntityStateConflator
 from httptools.http_poller import HttpPoller
+from simtools.scheduler import SimulationScheduler
+from simtools.emission_policy import EmissionPolicy
 from treq.client import HTTPClient
 from zope.interface import implementer
 
@@ -31,29 +44,100 @@ def main():
         print(f"[ERROR] {e}")
         return
     # print(json.dumps(config, indent=3))
+    log_config = config["logging"]
+    log_writer = setup_logging(log_config["level"], log_config["format"], log_config["sampling"], log_config["rate_limit"])
+    workers = config["workers"]
+    if workers["count"] > 1 and workers["index"] is None:
+        # Supervisor: runs the workers, each one a new interpreter running this script
+        command = sys.argv if getattr(sys, "frozen", False) else [sys.executable, *sys.argv]
+        if config["receiver"]["mode"] == 0:
+            get_logger("admin.info").warning("Unicast receiver: the kernel assigns each source to a single worker, so the entities of a simulator sending from one socket are all handled by the same worker")
+        forward_signals = (signal.SIGUSR2,) if config["profiler"]["signal_duration"] else ()
+        Supervisor(workers["count"], command, forward_signals=forward_signals).run()
+        log_writer.stop()
+        return
+    worker_index = workers["index"] or 0
+    is_designated_worker = worker_index == 0 # the worker that polls the engagements and simulates the missiles
+    reactor.addSystemEventTrigger("after", "shutdown", log_writer.stop)
     poller_domain = urlparse(config["http_poller"]).hostname
     ack_domain = urlparse(config["http_ack_endpoint"]).hostname
-    whitelist_domains = [d.encode("utf-8") for d in {poller_domain, ack_domain}] # Has to be encoded because Twisted creatorForNetloc takes hostnames as byte arrays
-    # Setup treq with custom agent
-    agent = Agent(reactor, contextFactory=WhitelistContextFactory(whitelist_domains))
+    stream_domain = urlparse(config["poll_intake"]["endpoint"] or config["http_poller"]).hostname
+    whitelist_domains = [d.encode("utf-8") for d in {poller_domain, ack_domain, stream_domain}] # Has to be encoded because Twisted creatorForNetloc takes hostnames as byte arrays
+    # Setup treq with custom agent and a persistent connection pool shared by the poster and the poller
+    pool = HTTPConnectionPool(reactor, persistent=True)
+    pool.maxPersistentPerHost = config["http_pool"]["max_per_host"]
+    pool.cachedConnectionTimeout = config["http_pool"]["idle_timeout"]
+    agent = Agent(reactor, contextFactory=WhitelistContextFactory(whitelist_domains), pool=pool)
     shared_http_client = HTTPClient(agent)
     
-    http_poster = HttpPoster(shared_http_client, config["http_receiver"], config["http_ack_endpoint"],config["http_token_receiver"])
+    http_poster = HttpPoster(
+        shared_http_client,
+        config["http_receiver"],
+        config["http_ack_endpoint"],
+        config["http_token_receiver"],
+        config["http_receiver_batch_size"],
+        config["http_receiver_batch_max_age"],
+        max_in_flight=config["http_in_flight"]["max"],
+        in_flight_policy=config["http_in_flight"]["policy"],
+        max_pending=config["http_in_flight"]["max_pending"]
+    )
+
+    pdu_forwarder = http_poster
+    if config["http_receiver_conflation"]:
+        pdu_forwarder = EntityStateConflator(http_poster, config["http_receiver_conflation_in_flight"])
+
+    dead_reckoning_filter = None
+    if config["dead_reckoning_filter"]["enabled"]:
+        dr_config = config["dead_reckoning_filter"]
+        dead_reckoning_filter = DeadReckoningFilter(dr_config["position_threshold"], dr_config["orientation_threshold"], dr_config["heartbeat"])
 
-    communicator = DISCommunicator(http_poster, config["receiver"], config["emitter"], config["remote_dis_site"])
+    sharding = None
+    if workers["count"] > 1 and config["receiver"]["mode"] != 0:
+        # Every worker receives every multicast or broadcast datagram and keeps its own entities.
+        # In unicast, the kernel already spreads the datagrams over the workers, by source (SO_REUSEPORT).
+        sharding = EntitySharding(worker_index, workers["count"])
+    enrichment = None
+    if config["enrichment"]["executor"] != INLINE:
+        enrichment_config = config["enrichment"]
+        enrichment = EnrichmentExecutor(enrichment_config["executor"], enrichment_config["workers"], enrichment_config["batch_size"])
+        enrichment.start()
+        reactor.addSystemEventTrigger("before", "shutdown", enrichment.stop)
+    communicator = DISCommunicator(pdu_forwarder, config["receiver"], config["emitter"], config["remote_dis_site"], dead_reckoning_filter, config["ingest"], sharding, enrichment)
     reactor.listenMulticast(config["receiver"]["port"], communicator, listenMultiple=True)
 
-    poller = HttpPoller(
-        config["http_poller"],
-        config["http_token_poller"],
-        config["poll_interval"],
-        communicator,
-        http_poster,
-        config["http_ack_endpoint"],
-        config["is_debug_on"],
-        shared_http_client
-    )
-    reactor.callWhenRunning(lambda: ensureDeferred(poller.run()))
+    scheduler = poller = None
+    if is_designated_worker:
+        emission_policy = None
+        if config["emission_policy"]["enabled"]:
+            policy_config = config["emission_policy"]
+            emission_policy = EmissionPolicy(policy_config["position_threshold"], policy_config["orientation_threshold"], policy_config["heartbeat"])
+
+        scheduler = SimulationScheduler(config["simulation"]["tick"], config["simulation"]["slots"], on_retire=communicator.forget_entity, vectorized=config["simulation"]["vectorized"])
+        poller = HttpPoller(
+            config["http_poller"],
+            config["http_token_poller"],
+            config["poll_interval"],
+            communicator,
+            http_poster,
+            config["http_ack_endpoint"],
+            config["is_debug_on"],
+            shared_http_client,
+            scheduler,
+            emission_policy,
+            config["poll_intake"]
+        )
+        reactor.callWhenRunning(scheduler.start)
+        reactor.callWhenRunning(lambda: ensureDeferred(poller.run()))
+
+    profiler = Profiler(config["profiler"]["directory"], config["profiler"]["interval"])
+    if config["profiler"]["signal_duration"]:
+        profiler.install_signal_trigger(config["profiler"]["signal_duration"])
+
+    if config["admin"]["port"]:
+        lag_monitor = ReactorLagMonitor()
+        registry = gateway_metrics(communicator, http_poster, poller, scheduler, lag_monitor, timings)
+        listen_admin(config["admin"]["port"] + worker_index, config["admin"]["interface"], admin_site(registry, timings, profiler))
+        reactor.callWhenRunning(lag_monitor.start)
     reactor.run()
 
 if __name__ == "__main__":
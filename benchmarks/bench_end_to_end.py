@@ -0,0 +1,133 @@
+"""
+Pushes EntityStatePdus over UDP loopback into a DISCommunicator that forwards them to a local stub of the
+HTTP API, and measures the relayed throughput, the loss and the latency from sendto() to the stub.
+Every datagram carries a unique entity ID, so that its latency can be matched on the stub side.
+The HTTP pool and in-flight window use the gateway defaults. Runs the reactor, so once per process:
+the benchmark runner starts it in a subprocess for each scenario.
+
+    python -m benchmarks.bench_end_to_end [--count 20000] [--rate 5000] [--batch-size 0] [--json]
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+
+from opendis.dis7 import EntityID
+from treq.client import HTTPClient
+from twisted.internet import reactor
+from twisted.web.client import Agent, HTTPConnectionPool
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from distools.dis_communicator import DISCommunicator
+from distools.pdus.entity_state_template import EntityStateTemplate
+from httptools.http_poster import HttpPoster
+from benchmarks.bench_serialization import ENTITY_TYPE, POSITION, VELOCITY
+
+class StubApi(Resource):
+    """
+    Stands in for the API: accepts PDUs and batches of PDUs, and records when each one arrived.
+    """
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.arrivals = {} # sequence number -> perf_counter() at arrival
+
+    def render_POST(self, request):
+        now = time.perf_counter()
+        payload = json.loads(request.content.read())
+        for pdu in payload if isinstance(payload, list) else [payload]:
+            entity = pdu["entityID"]
+            self.arrivals[sequence_of(entity["applicationID"], entity["entityID"])] = now
+        return b"{}"
+
+def entity_of(sequence):
+    return EntityID(1, 1 + sequence // 65536, sequence % 65536)
+
+def sequence_of(application, entity):
+    return (application - 1) * 65536 + entity
+
+def datagrams(count):
+    return [bytes(EntityStateTemplate(entity_of(i), ENTITY_TYPE).pack(POSITION, VELOCITY)) for i in range(count)]
+
+def send(port, payloads, rate, sent_at):
+    """
+    Sends the datagrams at the given rate, in bursts of one millisecond.
+    """
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    burst = max(1, int(rate / 1000))
+    start = time.perf_counter()
+    for first in range(0, len(payloads), burst):
+        delay = start + first / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        for i in range(first, min(first + burst, len(payloads))):
+            sent_at[i] = time.perf_counter()
+            sender.sendto(payloads[i], ("127.0.0.1", port))
+    sender.close()
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def main(count=20000, rate=5000, batch_size=0, idle_timeout=2.0, verbose=True):
+    api = StubApi()
+    api_port = reactor.listenTCP(0, Site(api), interface="127.0.0.1").getHost().port
+    pool = HTTPConnectionPool(reactor, persistent=True)
+    pool.maxPersistentPerHost = 16
+    poster = HttpPoster(HTTPClient(Agent(reactor, pool=pool)), f"http://127.0.0.1:{api_port}/pdu", f"http://127.0.0.1:{api_port}/ack", "token",
+                        batch_size, max_in_flight=16)
+    communicator = DISCommunicator(poster, {"ip": "127.0.0.1", "port": 0, "mode": 0}, {"ip": "127.0.0.1", "port": 9, "mode": 0}, 1)
+    dis_port = reactor.listenUDP(0, communicator, interface="127.0.0.1").getHost().port
+
+    payloads = datagrams(count)
+    sent_at = [None] * count
+    sender = threading.Thread(target=send, args=(dis_port, payloads, rate, sent_at), daemon=True)
+    progress = {"arrived": 0, "idle_since": None}
+
+    def watch():
+        now = time.perf_counter()
+        if len(api.arrivals) != progress["arrived"]:
+            progress["arrived"] = len(api.arrivals)
+            progress["idle_since"] = now
+        if len(api.arrivals) >= count or (not sender.is_alive() and now - (progress["idle_since"] or now) > idle_timeout):
+            reactor.stop()
+        else:
+            reactor.callLater(0.05, watch)
+
+    def start():
+        progress["idle_since"] = time.perf_counter()
+        sender.start()
+        watch()
+
+    reactor.callWhenRunning(start)
+    reactor.run()
+    sender.join()
+
+    latencies = sorted(arrival - sent_at[i] for i, arrival in api.arrivals.items())
+    elapsed = max(api.arrivals.values()) - sent_at[0] if api.arrivals else float("inf")
+    results = {
+        "relayed PDUs/s": len(api.arrivals) / elapsed,
+        "loss ratio": 1 - len(api.arrivals) / count,
+        "latency p50 (s)": percentile(latencies, 0.5),
+        "latency p99 (s)": percentile(latencies, 0.99),
+        "latency max (s)": latencies[-1] if latencies else 0.0,
+    }
+    if verbose:
+        print(f"{count} EntityStatePdus sent at {rate}/s, {len(api.arrivals)} received by the API, "
+              f"{sum(communicator.received_by_type.counts)} received by the gateway")
+        for name, value in results.items():
+            print(f"{name:<20} {value:>12,.4f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=20000, help="number of EntityStatePdus to send")
+    parser.add_argument("--rate", type=int, default=5000, help="EntityStatePdus sent per second")
+    parser.add_argument("--batch-size", type=int, default=0, help="HTTP batch size, 0 for one POST per PDU")
+    parser.add_argument("--json", action="store_true", help="print the results as a single JSON object")
+    args = parser.parse_args()
+    results = main(args.count, args.rate, args.batch_size, verbose=not args.json)
+    if args.json:
+        print(json.dumps(results))
@@ -0,0 +1,41 @@
+"""
+Measures the reactor thread cost of the enrichment of one forwarded EntityStatePdu for each executor:
+enriching it inline, or pickling a batch to the process pool and unpickling the payloads it returns,
+the pool being sent either the decoded EntityStateRecords or the raw datagrams.
+Runs on a single core: durations are per PDU, in microseconds.
+
+    python -m benchmarks.bench_enrichment
+"""
+import pickle
+import timeit
+
+from opendis.dis7 import EntityID
+
+from distools.enrichment import enrich, enrich_datagrams
+from distools.pdus.entity_state_decoder import decode_entity_state
+from distools.pdus.entity_state_template import EntityStateTemplate
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+def datagrams(count):
+    return [bytes(EntityStateTemplate(EntityID(20, 100, entity), ENTITY_TYPE).pack((4596224.0 + entity, 483088.0, 4370446.0), (-120.5, 210.25, 80.0)))
+            for entity in range(count)]
+
+def duration(function, batch_size, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number / batch_size * 1e6
+
+def main(number=500, batch_size=16):
+    batch = datagrams(batch_size)
+    records = [decode_entity_state(data) for data in batch]
+    payloads = pickle.dumps(enrich_datagrams(batch))
+    results = {
+        "inline (us/PDU)": duration(lambda: [enrich(record, timed=False) for record in records], batch_size, number),
+        "process, records (us/PDU)": duration(lambda: (pickle.dumps(records), pickle.loads(payloads)), batch_size, number),
+        "process, datagrams (us/PDU)": duration(lambda: (pickle.dumps(batch), pickle.loads(payloads)), batch_size, number),
+    }
+    for name, microseconds in results.items():
+        print(f"{name:<30} {microseconds:>8.2f}")
+    return results
+
+if __name__ == "__main__":
+    main()
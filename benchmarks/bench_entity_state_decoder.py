@@ -0,0 +1,51 @@
+"""
+Compares opendis PduFactory decoding with the precompiled EntityStatePdu decoder.
+Runs on a single core: decodes per second are per core.
+
+    python -m benchmarks.bench_entity_state_decoder
+"""
+import timeit
+from io import BytesIO
+
+from opendis import PduFactory
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, EntityID, EntityType, Vector3Double, Vector3Float
+
+from distools.pdus.entity_state_decoder import decode_entity_state
+
+def entity_state_datagram():
+    pdu = EntityStatePdu()
+    pdu.pduStatus = 0
+    pdu.entityAppearance = 0
+    pdu.capabilities = 0
+    pdu.pduType = 1
+    pdu.protocolFamily = 1
+    pdu.exerciseID = 1
+    pdu.length = 144
+    pdu.entityID = EntityID(20, 100, 42)
+    pdu.entityType = EntityType(2, 6, 71, 1, 1, 4, 0)
+    pdu.entityLocation = Vector3Double(4596224.0, 483088.0, 4370446.0)
+    pdu.entityLinearVelocity = Vector3Float(-120.5, 210.25, 80.0)
+    pdu.marking.characterSet = 1
+    pdu.marking.setString("MISSILE")
+    memoryStream = BytesIO()
+    pdu.serialize(DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+def rate(function, data, number):
+    elapsed = min(timeit.repeat(lambda: function(data), number=number, repeat=5))
+    return number / elapsed
+
+def main(number=20000):
+    data = entity_state_datagram()
+    results = {
+        "opendis PduFactory.createPdu": rate(PduFactory.createPdu, data, number),
+        "decode_entity_state": rate(decode_entity_state, data, number),
+    }
+    for name, decodes_per_second in results.items():
+        print(f"{name:<30} {decodes_per_second:>12,.0f} decodes/s/core")
+    print(f"{'speedup':<30} {results['decode_entity_state'] / results['opendis PduFactory.createPdu']:>12.1f}x")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares the scalar geodetic conversions used per PDU and per missile with their NumPy batch versions.
+Batch rates are conversions per second, over batches of 1000 entities.
+
+    python -m benchmarks.bench_geotools
+"""
+import random
+import timeit
+
+import numpy as np
+from opendis.dis7 import Vector3Double, Vector3Float
+
+from distools.geotools.tools import (gps, ECEF_to_natural_velocity, ECEF_to_natural_velocity_at, natural_velocity_to_ECEF,
+                                     ECEF_to_natural_velocity_batch, natural_velocity_to_ECEF_batch)
+
+BATCH = 1000
+
+def rate(function, number):
+    elapsed = min(timeit.repeat(function, number=number, repeat=5))
+    return number / elapsed
+
+def states(count):
+    rng = random.Random(count)
+    lla = [(rng.uniform(-60, 60), rng.uniform(-180, 180), rng.uniform(0, 10000)) for _ in range(count)]
+    courses = [rng.uniform(0, 360) for _ in range(count)]
+    speeds = [rng.uniform(100, 700) for _ in range(count)]
+    positions = [tuple(gps.lla2ecef(list(point))) for point in lla]
+    velocities = [natural_velocity_to_ECEF(*point, course, speed) for point, course, speed in zip(lla, courses, speeds)]
+    return lla, courses, speeds, positions, velocities
+
+def main(number=5000):
+    lla, courses, speeds, positions, velocities = states(BATCH)
+    (latitude, longitude, altitude), course, speed = lla[0], courses[0], speeds[0]
+    position, velocity = Vector3Double(*positions[0]), Vector3Float(*velocities[0])
+    lla_array, course_array, speed_array = np.array(lla), np.array(courses), np.array(speeds)
+    position_array, velocity_array = np.array(positions), np.array(velocities)
+    batches = max(number // BATCH, 5)
+    results = {
+        "ECEF_to_natural_velocity": rate(lambda: ECEF_to_natural_velocity(position, velocity), number),
+        "ECEF_to_natural_velocity_at": rate(lambda: ECEF_to_natural_velocity_at(latitude, longitude, velocity), number),
+        "ECEF_to_natural_velocity_batch": BATCH * rate(lambda: ECEF_to_natural_velocity_batch(position_array, velocity_array), batches),
+        "natural_velocity_to_ECEF": rate(lambda: natural_velocity_to_ECEF(latitude, longitude, altitude, course, speed), number),
+        "natural_velocity_to_ECEF_batch": BATCH * rate(lambda: natural_velocity_to_ECEF_batch(lla_array[:, 0], lla_array[:, 1], lla_array[:, 2], course_array, speed_array), batches),
+    }
+    for name, conversions_per_second in results.items():
+        print(f"{name:<32} {conversions_per_second:>12,.0f} conversions/s/core")
+    return results
+
+if __name__ == "__main__":
+    main()
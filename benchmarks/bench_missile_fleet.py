@@ -0,0 +1,62 @@
+"""
+Compares one simulation tick of per-object Missile updates with the vectorized MissileFleet,
+up to 10k concurrent missiles. Emission is replaced by a no-op emitter so that only propagation,
+ECEF conversion, velocity and range checks are measured.
+
+    python -m benchmarks.bench_missile_fleet
+"""
+import logging
+import random
+import timeit
+
+from opendis.dis7 import EntityID
+
+from logtools.logger import get_logger
+from simtools.fleet import MissileFleet
+from simtools.objects import Missile
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+class NullEmitter:
+    def emit_entity_state(self, entity_id, entity_type, position, velocity):
+        pass
+
+    def emit_custom_pdu(self, STN, target_latitude, target_longitude):
+        pass
+
+def missiles(count, emitter):
+    rng = random.Random(count)
+    result = []
+    for i in range(count):
+        missile = Missile(EntityID(1, 20, i), ENTITY_TYPE, emitter, [rng.uniform(-60, 60), rng.uniform(-180, 180), 5],
+                          rng.uniform(0, 360), 318, 10000, 0, 0, 1e9, "00020", 44, "5.143")
+        missile.current_timestamp = 0.0
+        result.append(missile)
+    return result
+
+def tick_duration(update, repeat=3):
+    ticks = iter(range(1, 1000))
+    return min(timeit.repeat(lambda: update(5.0 * next(ticks)), number=1, repeat=repeat))
+
+def main(counts=(100, 1000, 10000)):
+    get_logger("sim.info").setLevel(logging.WARNING) # Missile.update logs its distance at every update
+    emitter = NullEmitter()
+    results = {}
+    for count in counts:
+        objects = missiles(count, emitter)
+        fleet = MissileFleet()
+        for i, missile in enumerate(missiles(count, emitter)):
+            fleet.add((1, 20, i), missile, 0.0)
+
+        def update_objects(now):
+            for missile in objects:
+                missile.update(now)
+        per_object, vectorized = tick_duration(update_objects), tick_duration(fleet.update)
+        results[f"Missile.update x{count}"] = per_object
+        results[f"MissileFleet.update x{count}"] = vectorized
+        print(f"{count:>6} missiles   Missile.update {per_object * 1000:>9.2f} ms/tick   "
+              f"MissileFleet.update {vectorized * 1000:>8.2f} ms/tick   speedup {per_object / vectorized:>6.1f}x")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Compares the dir()-based reference pdu_to_dict with the compiled per-class serializers.
+
+    python -m benchmarks.bench_pdu_to_dict
+"""
+import timeit
+
+from opendis import PduFactory
+
+from distools.pdus.entity_state_decoder import decode_entity_state
+from distools.pdus.tools import pdu_to_dict, _reflective_pdu_to_dict
+from benchmarks.bench_entity_state_decoder import entity_state_datagram
+
+def rate(function, pdu, number):
+    elapsed = min(timeit.repeat(lambda: function(pdu), number=number, repeat=5))
+    return number / elapsed
+
+def main(number=5000):
+    data = entity_state_datagram()
+    pdu = PduFactory.createPdu(data)
+    results = {
+        "reflective (dir)": rate(_reflective_pdu_to_dict, pdu, number),
+        "compiled (opendis PDU)": rate(pdu_to_dict, pdu, number),
+        "compiled (EntityStateRecord)": rate(pdu_to_dict, decode_entity_state(data), number),
+    }
+    for name, conversions_per_second in results.items():
+        print(f"{name:<30} {conversions_per_second:>12,.0f} conversions/s/core")
+    return results
+
+if __name__ == "__main__":
+    main()
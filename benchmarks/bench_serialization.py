@@ -0,0 +1,52 @@
+"""
+Compares the serialization of the PDUs emitted for each simulated missile: opendis EntityStatePdu against
+the EntityStateTemplate, and CustomPdu serialized on every emission against the cached datagram.
+
+    python -m benchmarks.bench_serialization
+"""
+import timeit
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityID
+
+from distools.pdus.custom_pdu import CustomPdu, set_timestamp
+from distools.pdus.entity_state_template import EntityStateTemplate, entity_state_pdu
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+POSITION = (4596224.0, 483088.0, 4370446.0)
+VELOCITY = (-120.5, 210.25, 80.0)
+
+def rate(function, number):
+    elapsed = min(timeit.repeat(function, number=number, repeat=5))
+    return number / elapsed
+
+def serialize_entity_state():
+    memoryStream = BytesIO()
+    entity_state_pdu(EntityID(1, 20, 1), ENTITY_TYPE, POSITION, VELOCITY).serialize(DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+def serialize_custom_pdu():
+    pdu = CustomPdu()
+    pdu.exerciseID = 1
+    pdu.protocolFamily = 150
+    pdu.pduStatus = 22
+    for message in ("00020", "44", "5.143"):
+        pdu.add_message(message)
+    return pdu.to_datagram()
+
+def main(number=20000):
+    template = EntityStateTemplate(EntityID(1, 20, 1), ENTITY_TYPE)
+    datagram = serialize_custom_pdu()
+    results = {
+        "EntityStatePdu opendis": rate(serialize_entity_state, number),
+        "EntityStateTemplate.pack": rate(lambda: template.pack(POSITION, VELOCITY, 12345), number),
+        "CustomPdu serialize": rate(serialize_custom_pdu, number),
+        "CustomPdu cached datagram": rate(lambda: set_timestamp(datagram, 12345), number),
+    }
+    for name, pdus_per_second in results.items():
+        print(f"{name:<30} {pdus_per_second:>12,.0f} PDUs/s/core")
+    return results
+
+if __name__ == "__main__":
+    main()
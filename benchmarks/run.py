@@ -0,0 +1,134 @@
+"""
+Runs the benchmark suite and writes the results as JSON, optionally comparing them with a previous run.
+Each end-to-end scenario runs the reactor, so it is started in its own subprocess.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --output results.json --compare baseline.json --tolerance 0.1
+    python -m benchmarks.run --quick --only serialization,geotools
+
+Exits with status 1 when a metric regressed by more than the tolerance, so that it can gate a deployment.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+from benchmarks import bench_enrichment, bench_entity_state_decoder, bench_geotools, bench_missile_fleet, bench_pdu_to_dict, bench_serialization
+
+HIGHER = True # higher is better: rates
+LOWER = False # lower is better: durations, latencies, loss
+
+def end_to_end(count, rate, batch_size):
+    def run():
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_end_to_end", "--json", "--count", str(count), "--rate", str(rate), "--batch-size", str(batch_size)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results = json.loads(output.splitlines()[-1])
+        for name, value in results.items():
+            print(f"{name:<20} {value:>12,.4f}")
+        return results
+    return run
+
+# name -> (function returning {metric: value}, quick function, unit, direction of each metric)
+SUITE = {
+    "entity_state_decoder": (bench_entity_state_decoder.main, lambda: bench_entity_state_decoder.main(2000), "decodes/s", lambda name: HIGHER),
+    "pdu_to_dict": (bench_pdu_to_dict.main, lambda: bench_pdu_to_dict.main(500), "conversions/s", lambda name: HIGHER),
+    "geotools": (bench_geotools.main, lambda: bench_geotools.main(1000), "conversions/s", lambda name: HIGHER),
+    "enrichment": (bench_enrichment.main, lambda: bench_enrichment.main(50), None, lambda name: LOWER),
+    "serialization": (bench_serialization.main, lambda: bench_serialization.main(2000), "PDUs/s", lambda name: HIGHER),
+    "missile_fleet": (bench_missile_fleet.main, lambda: bench_missile_fleet.main((100, 1000)), "s/tick", lambda name: LOWER),
+    "end_to_end": (end_to_end(20000, 5000, 0), end_to_end(2000, 1000, 0), None, lambda name: HIGHER if name.endswith("/s") else LOWER),
+    "end_to_end_batched": (end_to_end(20000, 5000, 50), end_to_end(2000, 1000, 50), None, lambda name: HIGHER if name.endswith("/s") else LOWER),
+}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(names, quick=False):
+    """
+    Runs the given benchmarks.
+
+    Returns:
+        the results: {"meta": {...}, "benchmarks": {benchmark: {metric: {"value", "unit", "higher_is_better"}}}}
+    """
+    benchmarks = {}
+    for name in names:
+        function, quick_function, unit, direction = SUITE[name]
+        print(f"== {name}")
+        results = (quick_function if quick else function)()
+        benchmarks[name] = {
+            metric: {"value": value, "unit": unit or metric.rpartition(" ")[2].strip("()"), "higher_is_better": direction(metric)}
+            for metric, value in results.items()
+        }
+    return {
+        "meta": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "quick": quick,
+        },
+        "benchmarks": benchmarks,
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the results with a baseline run.
+
+    Args:
+        tolerance: relative degradation accepted before a metric is reported as a regression, e.g. 0.1 for 10%
+
+    Returns:
+        the list of (benchmark, metric, baseline value, value) that regressed
+    """
+    regressions = []
+    for name, metrics in results["benchmarks"].items():
+        for metric, result in metrics.items():
+            previous = baseline.get("benchmarks", {}).get(name, {}).get(metric)
+            if previous is None:
+                continue
+            if previous["value"]:
+                change = result["value"] / previous["value"] - 1
+            else:
+                change = result["value"] # from zero, e.g. the loss ratio: compared in absolute terms
+            worse = -change if result["higher_is_better"] else change
+            status = "REGRESSION" if worse > tolerance else "ok"
+            print(f"{name:<20} {metric:<32} {previous['value']:>14,.4f} -> {result['value']:>14,.4f} {change:>+8.1%}  {status}")
+            if worse > tolerance:
+                regressions.append((name, metric, previous["value"], result["value"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the gateway benchmark suite.")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative degradation reported as a regression (default: 0.1)")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, to check that the suite runs")
+    parser.add_argument("--only", help=f"comma separated benchmarks among {', '.join(SUITE)}")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(SUITE)
+    unknown = [name for name in names if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    results = run(names, args.quick)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import ipaddress
+import math
 
 load_dotenv()
 
@@ -12,6 +13,22 @@ def is_multicast_address(ip_str):
     except ValueError:
         return False
 
+def parse_category_limits(limits_str, name):
+    """
+    Parses a "category:N,category:N" list, such as "dis.recv:10,http.info:100".
+
+    Returns:
+        a dictionary of logging category -> N
+    """
+    limits = {}
+    for entry in filter(None, (e.strip() for e in limits_str.split(","))):
+        try:
+            category, value = entry.split(":")
+            limits[category.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name}: '{entry}'. Expected category:N.")
+    return limits
+
 def load_config_from_env():
     # Tokens
     default_token = os.getenv("HTTP_BEARER_TOKEN", "")
@@ -23,9 +40,46 @@ def load_config_from_env():
     if (udp_receiver_mode == 1):
         if not is_multicast_address(udp_receiver_ip):
             raise ValueError(f"Invalid multicast IP address for receiver: '{udp_receiver_ip}'. Expected an address in the range 224.0.0.0 to 239.255.255.255.")
+    udp_receiver_exercise_id = os.getenv("DIS_RECEIVER_EXERCISE_ID", "")  # empty = relay every exercise
+    udp_receiver_exercise_id = int(udp_receiver_exercise_id) if udp_receiver_exercise_id else None
+
+    # Dead reckoning suppression of inbound EntityStatePdus already predicted by the last forwarded one
+    dr_filter = os.getenv("DIS_RECEIVER_DR_FILTER", "false") == "true"
+    dr_position_threshold = float(os.getenv("DIS_RECEIVER_DR_POSITION_THRESHOLD", "1.0"))  # meters
+    dr_orientation_threshold = math.radians(float(os.getenv("DIS_RECEIVER_DR_ORIENTATION_THRESHOLD", "3.0")))  # degrees
+    dr_heartbeat = float(os.getenv("DIS_RECEIVER_DR_HEARTBEAT", "5.0"))  # seconds
+
+    # Bounded ingest queue between the socket and PDU handling
+    ingest_queue_size = int(os.getenv("DIS_INGEST_QUEUE_SIZE", "10000"))
+    ingest_consumers = int(os.getenv("DIS_INGEST_CONSUMERS", "16"))
+    if ingest_queue_size < 1 or ingest_consumers < 1:
+        raise ValueError("Invalid ingest queue: DIS_INGEST_QUEUE_SIZE and DIS_INGEST_CONSUMERS must be at least 1.")
+    ingest_overflow_policy = os.getenv("DIS_INGEST_OVERFLOW_POLICY", "drop_newest")  # drop_newest | drop_oldest
+    if ingest_overflow_policy not in ("drop_newest", "drop_oldest"):
+        raise ValueError(f"Invalid DIS_INGEST_OVERFLOW_POLICY: '{ingest_overflow_policy}'. Expected drop_newest or drop_oldest.")
+
+    # Executor of the decoding and enrichment (pdu_to_dict, geodesy) of forwarded EntityStatePdus
+    enrichment_executor = os.getenv("DIS_ENRICHMENT_EXECUTOR", "none")  # none (reactor thread) | thread | process
+    if enrichment_executor not in ("none", "thread", "process"):
+        raise ValueError(f"Invalid DIS_ENRICHMENT_EXECUTOR: '{enrichment_executor}'. Expected none, thread or process.")
+    enrichment_workers = int(os.getenv("DIS_ENRICHMENT_WORKERS", "4"))
+    enrichment_batch_size = int(os.getenv("DIS_ENRICHMENT_BATCH_SIZE", str(max(1, ingest_consumers // enrichment_workers))))  # fills the pool with the DIS_INGEST_CONSUMERS records submitted at once
 
     http_endpoint_receiver = os.getenv("HTTP_ENDPOINT_RECEIVER", "http://example.com/api/receive")
     http_token_receiver = os.getenv("HTTP_BEARER_TOKEN_RECEIVER", default_token)
+    http_receiver_batch_size = int(os.getenv("HTTP_RECEIVER_BATCH_SIZE", "0"))  # 0 = one POST per PDU
+    http_receiver_batch_max_age = float(os.getenv("HTTP_RECEIVER_BATCH_MAX_AGE_MS", "50")) / 1000.0
+    http_receiver_conflation = os.getenv("HTTP_RECEIVER_CONFLATION", "false") == "true"  # keep only the latest unsent state per entity
+    http_receiver_conflation_in_flight = int(os.getenv("HTTP_RECEIVER_CONFLATION_IN_FLIGHT", "4"))
+
+    # HTTP connections, shared by the poster and the poller
+    http_pool_max_per_host = int(os.getenv("HTTP_POOL_MAX_PER_HOST", "16"))  # idle connections kept for reuse, not a bound on concurrent ones
+    http_pool_idle_timeout = float(os.getenv("HTTP_POOL_IDLE_TIMEOUT", "240"))  # seconds
+    http_max_in_flight = int(os.getenv("HTTP_MAX_IN_FLIGHT", "0"))  # 0 = unbounded
+    http_in_flight_policy = os.getenv("HTTP_IN_FLIGHT_POLICY", "wait")  # wait | drop_oldest
+    if http_in_flight_policy not in ("wait", "drop_oldest"):
+        raise ValueError(f"Invalid HTTP_IN_FLIGHT_POLICY: '{http_in_flight_policy}'. Expected wait or drop_oldest.")
+    http_max_pending = int(os.getenv("HTTP_MAX_PENDING", "1000"))  # drop_oldest queue length
     
     remote_dis_site = int(os.getenv("REMOTE_DIS_SITE", 1))
 
@@ -36,24 +90,91 @@ def load_config_from_env():
     if (udp_emitter_mode == 1):
         if not is_multicast_address(udp_emitter_ip):
             raise ValueError(f"Invalid multicast IP address for emitter: '{udp_emitter_ip}'. Expected an address in the range 224.0.0.0 to 239.255.255.255.")
+    # Send the PDUs emitted during one reactor turn together (sendmmsg on Linux)
+    udp_emitter_batching = os.getenv("DIS_EMITTER_BATCHING", "true") == "true"
         
     http_endpoint_poller = os.getenv("HTTP_ENDPOINT_POLLER", "http://example.com/api/poll")
     http_ack_endpoint = os.getenv('HTTP_ACK_ENDPOINT', "http://example.com/api/ack")
     poll_interval = float(os.getenv("POLL_INTERVAL", "5"))
     http_token_poller = os.getenv("HTTP_BEARER_TOKEN_POLLER", default_token)
+    # Engagement intake: poll every POLL_INTERVAL, or hold a long poll or Server-Sent Events stream
+    poll_mode = os.getenv("POLL_MODE", "poll")  # poll | long_poll | sse
+    if poll_mode not in ("poll", "long_poll", "sse"):
+        raise ValueError(f"Invalid POLL_MODE: '{poll_mode}'. Expected poll, long_poll or sse.")
+    poll_stream_endpoint = os.getenv("POLL_STREAM_ENDPOINT", "")  # defaults to HTTP_ENDPOINT_POLLER
+    poll_long_poll_wait = float(os.getenv("POLL_LONG_POLL_WAIT", "30"))  # seconds
+    poll_backoff_initial = float(os.getenv("POLL_BACKOFF_INITIAL", "1"))  # seconds
+    poll_backoff_max = float(os.getenv("POLL_BACKOFF_MAX", "60"))  # seconds
+    poll_stream_idle_timeout = float(os.getenv("POLL_STREAM_IDLE_TIMEOUT", "60"))  # seconds, 0 = none
+
+    # Simulation clock advancing the missiles created from engagements
+    sim_tick_interval = float(os.getenv("SIM_TICK_INTERVAL", "5"))
+    sim_tick_slots = int(os.getenv("SIM_TICK_SLOTS", "10"))
+    if sim_tick_interval <= 0 or sim_tick_slots < 1:
+        raise ValueError("Invalid simulation tick: SIM_TICK_INTERVAL must be positive and SIM_TICK_SLOTS at least 1.")
+    # Advance the missiles of each slot together, in NumPy arrays
+    sim_vectorized = os.getenv("SIM_VECTORIZED", "false") == "true"
+    # Emission policy of the simulated missiles: only emit when the receivers' dead reckoning would drift
+    emission_policy = os.getenv("MISSILE_EMISSION_POLICY", "false") == "true"
+    emission_position_threshold = float(os.getenv("MISSILE_EMISSION_POSITION_THRESHOLD", "1.0"))  # meters
+    emission_orientation_threshold = math.radians(float(os.getenv("MISSILE_EMISSION_ORIENTATION_THRESHOLD", "3.0")))  # degrees
+    emission_heartbeat = float(os.getenv("MISSILE_EMISSION_HEARTBEAT", "5.0"))  # seconds
     
+    # Logging
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    if log_level not in ("DEBUG", "INFO", "WARNING", "ERROR"):
+        raise ValueError(f"Invalid LOG_LEVEL: '{log_level}'. Expected DEBUG, INFO, WARNING or ERROR.")
+    log_format = os.getenv("LOG_FORMAT", "legacy")
+    if log_format not in ("legacy", "standard"):
+        raise ValueError(f"Invalid LOG_FORMAT: '{log_format}'. Expected legacy or standard.")
+    log_sampling = parse_category_limits(os.getenv("LOG_SAMPLING", ""), "LOG_SAMPLING")  # category -> keep 1 line in N
+    log_rate_limit = parse_category_limits(os.getenv("LOG_RATE_LIMIT", ""), "LOG_RATE_LIMIT")  # category -> lines per second
+
+    # Admin listener (metrics). A port of 0 disables it.
+    admin_port = int(os.getenv("ADMIN_PORT", "0"))
+    admin_interface = os.getenv("ADMIN_INTERFACE", "127.0.0.1")
+
+    # Profiler. SIGUSR2 starts a profile of PROFILE_SIGNAL_DURATION seconds, 0 disables the signal.
+    profile_dir = os.getenv("PROFILE_DIR", "profiles")
+    profile_signal_duration = float(os.getenv("PROFILE_SIGNAL_DURATION", "10"))  # seconds
+    profile_sampling_interval = float(os.getenv("PROFILE_SAMPLING_INTERVAL_MS", "5")) / 1000.0  # milliseconds of CPU time
+
+    # Worker processes. With more than 1, a supervisor starts them, each receiving on the DIS port; worker 0 also
+    # polls the engagements and simulates the missiles. GATEWAY_WORKER_INDEX is set by the supervisor.
+    workers = int(os.getenv("GATEWAY_WORKERS", "1"))
+    if workers < 1:
+        raise ValueError(f"Invalid GATEWAY_WORKERS: '{workers}'. Expected at least 1.")
+    worker_index = os.getenv("GATEWAY_WORKER_INDEX", "")
+    worker_index = int(worker_index) if worker_index else None
+
     # Debug mode. If true, use dummy data, else poll engagements from API
     is_debug_on = os.getenv("IS_DEBUG_ON", "false") == "true"
 
     return {
         "remote_dis_site" : remote_dis_site,
-        "receiver": {"ip": udp_receiver_ip, "port": udp_receiver_port, "mode": udp_receiver_mode},
-        "emitter": {"ip": udp_emitter_ip, "port": udp_emitter_port, "mode": udp_emitter_mode},
+        "receiver": {"ip": udp_receiver_ip, "port": udp_receiver_port, "mode": udp_receiver_mode, "exercise_id": udp_receiver_exercise_id},
+        "dead_reckoning_filter": {"enabled": dr_filter, "position_threshold": dr_position_threshold, "orientation_threshold": dr_orientation_threshold, "heartbeat": dr_heartbeat},
+        "ingest": {"capacity": ingest_queue_size, "consumers": ingest_consumers, "overflow_policy": ingest_overflow_policy},
+        "enrichment": {"executor": enrichment_executor, "workers": enrichment_workers, "batch_size": enrichment_batch_size},
+        "emitter": {"ip": udp_emitter_ip, "port": udp_emitter_port, "mode": udp_emitter_mode, "batching": udp_emitter_batching},
         "http_receiver": http_endpoint_receiver,
         "http_token_receiver": http_token_receiver,
+        "http_receiver_batch_size": http_receiver_batch_size,
+        "http_receiver_batch_max_age": http_receiver_batch_max_age,
+        "http_receiver_conflation": http_receiver_conflation,
+        "http_receiver_conflation_in_flight": http_receiver_conflation_in_flight,
+        "http_pool": {"max_per_host": http_pool_max_per_host, "idle_timeout": http_pool_idle_timeout},
+        "http_in_flight": {"max": http_max_in_flight, "policy": http_in_flight_policy, "max_pending": http_max_pending},
         "http_poller": http_endpoint_poller,
         "http_ack_endpoint" : http_ack_endpoint,
         "http_token_poller": http_token_poller,
         "poll_interval": poll_interval,
+        "poll_intake": {"mode": poll_mode, "endpoint": poll_stream_endpoint, "wait": poll_long_poll_wait, "backoff_initial": poll_backoff_initial, "backoff_max": poll_backoff_max, "idle_timeout": poll_stream_idle_timeout},
+        "simulation": {"tick": sim_tick_interval, "slots": sim_tick_slots, "vectorized": sim_vectorized},
+        "emission_policy": {"enabled": emission_policy, "position_threshold": emission_position_threshold, "orientation_threshold": emission_orientation_threshold, "heartbeat": emission_heartbeat},
         "is_debug_on": is_debug_on,
+        "workers": {"count": workers, "index": worker_index},
+        "admin": {"port": admin_port, "interface": admin_interface},
+        "profiler": {"directory": profile_dir, "signal_duration": profile_signal_duration, "interval": profile_sampling_interval},
+        "logging": {"level": log_level, "format": log_format, "sampling": log_sampling, "rate_limit": log_rate_limit},
     }
@@ -0,0 +1,143 @@
+# -*- test-case-name: distools.test.test_capture -*-
+import socket
+import struct
+
+from .pdus.header import PDU_HEADER_SIZE
+
+# Capture file: the magic, then one record per datagram: arrival time (seconds since the epoch),
+# IPv4 source address and port, datagram length, followed by the raw datagram.
+MAGIC = b"DISCAP\x00\x01"
+RECORD = struct.Struct(">d4sHH")
+
+EXERCISE_OFFSET = 1
+# Offsets of the simulation addresses (site, application) carried by each PDU type (IEEE 1278.1-2012, 7.x):
+# entity IDs and event IDs both start with one.
+SIMULATION_ADDRESS = struct.Struct(">HH")
+SIMULATION_ADDRESS_OFFSETS = {
+    1: (12,),                # Entity State: entity ID
+    2: (12, 18, 24, 30),     # Fire: firing, target, munition, event
+    3: (12, 18, 24, 30),     # Detonation: firing, target, munition, event
+    4: (12, 18, 24),         # Collision: issuing, colliding, event
+    23: (12, 18),            # Electromagnetic Emission: emitting entity, event
+    25: (12,),               # Transmitter: radio reference
+    26: (12,),               # Signal: radio reference
+    27: (12,),               # Receiver: radio reference
+    **{pdu_type: (12, 18) for pdu_type in range(11, 23)}, # Simulation management: originating, receiving
+}
+
+class CaptureWriter:
+    """
+    Appends datagrams to a capture file. Records are buffered in memory and written once the buffer
+    holds buffer_size bytes, so that recording does not issue a write per datagram.
+    """
+    def __init__(self, path, buffer_size=1 << 20):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.records = 0
+
+    def write(self, data, addr, timestamp):
+        """
+        Args:
+            data: raw datagram
+            addr: (host, port) of the source
+            timestamp: arrival time, in seconds since the epoch
+        """
+        self.buffer += RECORD.pack(timestamp, socket.inet_aton(addr[0]), addr[1], len(data))
+        self.buffer += data
+        self.records += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_capture(path):
+    """
+    Reads a capture file. A record truncated by an interrupted recording ends the capture.
+
+    Yields:
+        (timestamp, (host, port), datagram) for each recorded datagram
+    """
+    with open(path, "rb") as capture:
+        if capture.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a DIS capture file")
+        while True:
+            header = capture.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, host, port, length = RECORD.unpack(header)
+            data = capture.read(length)
+            if len(data) < length:
+                return
+            yield timestamp, (socket.inet_ntoa(host), port), data
+
+def parse_id_mapping(spec):
+    """
+    Parses an ID mapping option: "N" maps every ID to N, "old:new,old:new" maps the listed IDs only.
+
+    Returns:
+        a dictionary of old ID -> new ID, where None stands for any ID
+    """
+    mapping = {}
+    for item in spec.split(","):
+        old, separator, new = item.strip().partition(":")
+        if separator:
+            mapping[int(old)] = int(new)
+        else:
+            mapping[None] = int(old)
+    return mapping
+
+class IdRemapper:
+    """
+    Rewrites the exercise, site and application IDs of raw datagrams, without decoding them.
+    Site and application IDs are rewritten in the entity and event IDs of the PDU types listed in
+    SIMULATION_ADDRESS_OFFSETS; other PDU types only get their exercise rewritten.
+
+    Args:
+        exercises, sites, applications: old ID -> new ID dictionaries, see parse_id_mapping()
+    """
+    def __init__(self, exercises=None, sites=None, applications=None):
+        self.exercises = exercises or {}
+        self.sites = sites or {}
+        self.applications = applications or {}
+
+    def __bool__(self):
+        return bool(self.exercises or self.sites or self.applications)
+
+    @staticmethod
+    def lookup(mapping, value):
+        return mapping.get(value, mapping.get(None, value))
+
+    def remap(self, data):
+        """
+        Returns:
+            a remapped copy of the datagram
+        """
+        datagram = bytearray(data)
+        if len(datagram) < PDU_HEADER_SIZE:
+            return datagram
+        if self.exercises:
+            datagram[EXERCISE_OFFSET] = self.lookup(self.exercises, datagram[EXERCISE_OFFSET])
+        if self.sites or self.applications:
+            for offset in SIMULATION_ADDRESS_OFFSETS.get(datagram[2], ()):
+                if offset + SIMULATION_ADDRESS.size > len(datagram):
+                    break
+                site, application = SIMULATION_ADDRESS.unpack_from(datagram, offset)
+                SIMULATION_ADDRESS.pack_into(datagram, offset, self.lookup(self.sites, site), self.lookup(self.applications, application))
+        return datagram
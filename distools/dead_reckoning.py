@@ -0,0 +1,188 @@
+# -*- test-case-name: distools.test.test_dead_reckoning -*-
+import math
+
+from twisted.internet import reactor
+
+# Dead reckoning algorithms [UID 44]
+STATIC = 1
+CONSTANT_VELOCITY_ALGORITHMS = frozenset([2, 3, 6, 7])  # FPW, RPW, FPB, RPB
+ACCELERATED_ALGORITHMS = frozenset([4, 5, 8, 9])         # RVW, FVW, RVB, FVB
+ROTATING_ALGORITHMS = frozenset([3, 4, 7, 8])            # RPW, RVW, RPB, RVB
+
+# Heartbeats without any update after which an entity is considered gone and forgotten
+STALE_HEARTBEATS = 3
+
+def extrapolate_position(algorithm, location, velocity, acceleration, deltatime):
+    """
+    Extrapolates an entity location with the given dead reckoning algorithm.
+    Body axis algorithms (6 to 9) are extrapolated as their world axis counterparts, which is accurate
+    for the short intervals between two updates.
+
+    Args:
+        algorithm: dead reckoning algorithm [UID 44]
+        location: (x, y, z) ECEF location in meters
+        velocity: (x, y, z) linear velocity in m/s
+        acceleration: (x, y, z) linear acceleration in m/s²
+        deltatime: time elapsed since the update, in seconds
+
+    Returns:
+        the extrapolated (x, y, z) location
+    """
+    if algorithm in ACCELERATED_ALGORITHMS:
+        half_dt2 = 0.5 * deltatime * deltatime
+        return tuple(p + v * deltatime + a * half_dt2 for p, v, a in zip(location, velocity, acceleration))
+    if algorithm in CONSTANT_VELOCITY_ALGORITHMS:
+        return tuple(p + v * deltatime for p, v in zip(location, velocity))
+    return tuple(location)
+
+def euler_to_matrix(psi, theta, phi):
+    """
+    Converts DIS Euler angles (psi, theta, phi in radians, Z-Y-X order) to a body to world rotation matrix.
+    """
+    cpsi, spsi = math.cos(psi), math.sin(psi)
+    ctheta, stheta = math.cos(theta), math.sin(theta)
+    cphi, sphi = math.cos(phi), math.sin(phi)
+    return (
+        (cpsi * ctheta, cpsi * stheta * sphi - spsi * cphi, cpsi * stheta * cphi + spsi * sphi),
+        (spsi * ctheta, spsi * stheta * sphi + cpsi * cphi, spsi * stheta * cphi - cpsi * sphi),
+        (-stheta, ctheta * sphi, ctheta * cphi),
+    )
+
+def _multiply(a, b):
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+
+def extrapolate_orientation(algorithm, orientation, angular_velocity, deltatime):
+    """
+    Extrapolates an entity orientation with the given dead reckoning algorithm.
+
+    Args:
+        algorithm: dead reckoning algorithm [UID 44]
+        orientation: (psi, theta, phi) Euler angles in radians
+        angular_velocity: (x, y, z) body axis angular velocity in rad/s
+        deltatime: time elapsed since the update, in seconds
+
+    Returns:
+        the extrapolated orientation as a rotation matrix
+    """
+    matrix = euler_to_matrix(*orientation)
+    if algorithm not in ROTATING_ALGORITHMS:
+        return matrix
+    wx, wy, wz = angular_velocity
+    rate = math.sqrt(wx * wx + wy * wy + wz * wz)
+    angle = rate * deltatime
+    if angle < 1e-12:
+        return matrix
+    # Rodrigues rotation about the angular velocity axis, applied in the body frame
+    kx, ky, kz = wx / rate, wy / rate, wz / rate
+    s, c = math.sin(angle), 1.0 - math.cos(angle)
+    rotation = (
+        (1.0 - c * (ky * ky + kz * kz), -s * kz + c * kx * ky, s * ky + c * kx * kz),
+        (s * kz + c * kx * ky, 1.0 - c * (kx * kx + kz * kz), -s * kx + c * ky * kz),
+        (-s * ky + c * kx * kz, s * kx + c * ky * kz, 1.0 - c * (kx * kx + ky * ky)),
+    )
+    return _multiply(matrix, rotation)
+
+def orientation_error(a, b):
+    """
+    Gets the angle, in radians, of the rotation between two rotation matrices.
+    """
+    trace = sum(a[k][i] * b[k][i] for i in range(3) for k in range(3))  # trace(a^T b)
+    return math.acos(max(-1.0, min(1.0, (trace - 1.0) / 2.0)))
+
+class DeadReckoningFilter:
+    """
+    Suppresses inbound EntityStatePdus whose state was already predictable from the last forwarded one.
+    The last forwarded state of each entity is extrapolated with its dead reckoning parameters; an update is
+    forwarded only when the actual position or orientation departs from the prediction by more than a threshold,
+    when the appearance or the dead reckoning algorithm changes, or when the heartbeat interval has elapsed.
+    Entities not forwarded for STALE_HEARTBEATS heartbeats are forgotten: their next update would be forwarded
+    anyway, and departed entities would otherwise be kept forever.
+    """
+    def __init__(self, position_threshold=1.0, orientation_threshold=math.radians(3.0), heartbeat=5.0, clock=reactor):
+        self.position_threshold = position_threshold # meters
+        self.orientation_threshold = orientation_threshold # radians
+        self.heartbeat = heartbeat # seconds
+        self.clock = clock
+        self.forwarded_states = {} # (site, application, entity) -> (time, pdu), oldest forwarded first
+        self.forwarded = 0
+        self.suppressed = 0
+        self.evicted = 0
+
+    def should_forward(self, pdu):
+        """
+        Decides whether an EntityStatePdu has to be forwarded, and remembers it if so.
+
+        Args:
+            pdu: EntityStateRecord or opendis EntityStatePdu
+
+        Returns:
+            True if the update has to be forwarded, False if it can be suppressed
+        """
+        now = self.clock.seconds()
+        self.evict_stale(now)
+        EID = pdu.entityID
+        key = (EID.siteID, EID.applicationID, EID.entityID)
+        previous = self.forwarded_states.get(key)
+        if previous is None or self.has_diverged(previous[1], pdu, now - previous[0]):
+            if previous is not None:
+                del self.forwarded_states[key] # moved to the end, to keep the oldest forwarded first
+            self.forwarded_states[key] = (now, pdu)
+            self.forwarded += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def evict_stale(self, now):
+        """
+        Forgets the entities that were last forwarded more than STALE_HEARTBEATS heartbeats ago.
+        """
+        cutoff = now - STALE_HEARTBEATS * self.heartbeat
+        states = self.forwarded_states
+        while states:
+            key = next(iter(states))
+            if states[key][0] >= cutoff:
+                return
+            del states[key]
+            self.evicted += 1
+
+    def has_diverged(self, previous, pdu, deltatime):
+        """
+        Compares an update with the extrapolation of the previously forwarded one.
+
+        Args:
+            previous: last forwarded EntityStatePdu of the entity
+            pdu: new EntityStatePdu of the entity
+            deltatime: time elapsed since the previous one was forwarded, in seconds
+
+        Returns:
+            True if the new update cannot be predicted from the previous one
+        """
+        if deltatime >= self.heartbeat:
+            return True
+        dr = previous.deadReckoningParameters
+        algorithm = dr.deadReckoningAlgorithm
+        if algorithm != pdu.deadReckoningParameters.deadReckoningAlgorithm or previous.entityAppearance != pdu.entityAppearance:
+            return True
+
+        location = previous.entityLocation
+        velocity = previous.entityLinearVelocity
+        acceleration = dr.entityLinearAcceleration
+        predicted = extrapolate_position(algorithm,
+                                         (location.x, location.y, location.z),
+                                         (velocity.x, velocity.y, velocity.z),
+                                         (acceleration.x, acceleration.y, acceleration.z),
+                                         deltatime)
+        actual = pdu.entityLocation
+        error = math.sqrt((predicted[0] - actual.x) ** 2 + (predicted[1] - actual.y) ** 2 + (predicted[2] - actual.z) ** 2)
+        if error > self.position_threshold:
+            return True
+
+        orientation = previous.entityOrientation
+        angular_velocity = dr.entityAngularVelocity
+        predicted_orientation = extrapolate_orientation(algorithm,
+                                                        (orientation.psi, orientation.theta, orientation.phi),
+                                                        (angular_velocity.x, angular_velocity.y, angular_velocity.z),
+                                                        deltatime)
+        actual_orientation = pdu.entityOrientation
+        actual_matrix = euler_to_matrix(actual_orientation.psi, actual_orientation.theta, actual_orientation.phi)
+        return orientation_error(predicted_orientation, actual_matrix) > self.orientation_threshold
@@ -1,20 +1,32 @@
+from collections import Counter
 from io import BytesIO
 import time
 
-from twisted.internet.defer import ensureDeferred
 from twisted.internet.protocol import DatagramProtocol
 
 from opendis.DataOutputStream import DataOutputStream
-from opendis.RangeCoordinates import GPS
-from opendis.dis7 import EntityStatePdu, EntityType, Vector3Double, Vector3Float
+from opendis.dis7 import EntityStatePdu
 from opendis import PduFactory
-from .pdus.tools import pdu_to_dict
+from .pdus.header import peek_pdu_header
+from .pdus.entity_state_decoder import EntityStateRecord, decode_entity_state
+from .pdus.entity_state_template import EntityStateTemplate, dis_timestamp
+from .ingest_queue import IngestQueue, DROP_NEWEST
+from .outbound_buffer import OutboundBuffer
+from .enrichment import enrich
 from enum import IntEnum
-from distools.geotools.tools import ECEF_to_natural_velocity
-from distools.pdus.custom_pdu import CustomPdu
+from distools.pdus.custom_pdu import CustomPdu, set_timestamp
+from logtools.logger import get_logger
+from admintools.metrics import PduTypeCounter
+from admintools.profiler import timings
 # from pprint import pprint
 
-gps = GPS()
+info_log = get_logger("dis.info")
+recv_log = get_logger("dis.recv")
+send_log = get_logger("dis.send")
+error_log = get_logger("dis.error")
+
+decode_stage = timings.stage("dis.decode")
+dead_reckoning_stage = timings.stage("dis.dead_reckoning")
 
 ENTITY_TYPE_MAP = {
     (1, 2, 78, 22, 2, 0): "NH90",
@@ -22,13 +34,15 @@ ENTITY_TYPE_MAP = {
     (1, 3, 62, 6, 5, 1): "Normandie",
 }
 
+MAX_CACHED_CUSTOM_PDUS = 1024 # serialized Custom PDUs kept for reuse, one per (STN, target) in use
+
 class IPTransmissionType(IntEnum):
     UNICAST = 0
     MULTICAST = 1
     BROADCAST = 2
 
 class DISCommunicator(DatagramProtocol):
-    def __init__(self, http_poster, receiver, emitter, remote_dis_site):
+    def __init__(self, http_poster, receiver, emitter, remote_dis_site, dead_reckoning_filter=None, ingest=None, sharding=None, enrichment=None):
         self.pdu_factory = PduFactory
         self.http_poster = http_poster
         self.recv_addr = receiver["ip"]
@@ -36,29 +50,68 @@ class DISCommunicator(DatagramProtocol):
         self.send_mode = IPTransmissionType(emitter["mode"])
         self.send_addr = "<broadcast>" if self.send_mode == IPTransmissionType.BROADCAST else emitter["ip"]
         self.send_port = emitter["port"]
+        self.batch_emission = emitter.get("batching", True) # send the PDUs emitted in one reactor turn together
+        self.outbound = None # OutboundBuffer, created once the transport is available
         self.remote_dis_site = remote_dis_site
+        self.exercise_id = receiver.get("exercise_id")
+        self.relayed_pdu_types = frozenset([EntityStatePdu.pduType])
+        self.dropped_datagrams = Counter() # PDU type -> number of datagrams dropped by the header prefilter
+        self.malformed_datagrams = 0
+        self.received_by_type = PduTypeCounter()
+        self.decoded_by_type = PduTypeCounter()
+        self.decode_errors = 0
+        self.relayed_pdus = 0
+        self.pdus_emitted = 0
+        self.bytes_emitted = 0
+        self.dead_reckoning_filter = dead_reckoning_filter # None = forward every EntityStatePdu
+        self.sharding = sharding # EntitySharding of this worker, None = handle every entity
+        self.enrichment = enrichment # EnrichmentExecutor, None = enrich on the reactor thread
+        ingest = ingest or {"capacity": 10000, "consumers": 16, "overflow_policy": DROP_NEWEST}
+        self.ingest_queue = IngestQueue(self.handle_queued_datagram, ingest["capacity"], ingest["consumers"], ingest["overflow_policy"])
+        self.entity_state_templates = {} # (site, application, entity) -> (EntityStateTemplate, entity name) of the emitted entities
+        self.custom_pdu_datagrams = {} # (STN, target latitude, target longitude) -> serialized Custom PDU
         self.loop = None
 
     def startProtocol(self):
-        print(f"[DIS INFO] DISEmitter started in {self.send_mode.name} mode.")
+        info_log.info("DISEmitter started in %s mode.", self.send_mode.name)
         # RECEIVER setup
         if (self.recv_mode == IPTransmissionType.MULTICAST):
             self.transport.joinGroup(self.recv_addr)
-            print(f"[DIS INFO] Joined multicast group {self.recv_addr}")
+            info_log.info("Joined multicast group %s", self.recv_addr)
         elif (self.recv_mode == IPTransmissionType.BROADCAST):
             self.transport.setBroadcastAllowed(True)
 
         # EMITTER setup
-        print(f"[DIS INFO] DISReceiver started in {self.send_mode.name} mode.")
+        info_log.info("DISReceiver started in %s mode.", self.send_mode.name)
         if (self.send_mode == IPTransmissionType.MULTICAST):
             self.transport.joinGroup(self.send_group_ip)
-            print(f"[DIS INFO] Joined multicast group {self.send_addr}")
+            info_log.info("Joined multicast group %s", self.send_addr)
         elif (self.send_mode == IPTransmissionType.BROADCAST):
             self.transport.setBroadcastAllowed(True)
+        if self.batch_emission:
+            self.outbound = OutboundBuffer(self.transport)
+
+    def stopProtocol(self):
+        if self.outbound is not None:
+            self.outbound.flush()
 
     def datagramReceived(self, data, addr):
-        ensureDeferred(self.handle_pdu(data, addr))
-            
+        header = peek_pdu_header(data)
+        if header is None:
+            self.malformed_datagrams += 1
+            return
+        self.received_by_type.inc(header.pduType)
+        if not self.should_relay_header(header):
+            self.dropped_datagrams[header.pduType] += 1
+            return
+        if self.sharding is not None and not self.sharding.owns(data):
+            return
+        self.ingest_queue.put((data, addr))
+
+    def handle_queued_datagram(self, item):
+        data, addr = item
+        return self.handle_pdu(data, addr)
+
     async def handle_pdu(self, data, addr):
         """
         Upon reception of a datagram, creates a PDU from it and POST it to the API if its an EntityStatePDU
@@ -68,23 +121,45 @@ class DISCommunicator(DatagramProtocol):
             addr: Source address of the datagram
         """
         try:
-            pdu = self.pdu_factory.createPdu(data)
+            start = time.perf_counter()
+            pdu = self.decode_pdu(data)
+            decode_stage.add(time.perf_counter() - start)
             if pdu:
-                pdu_json = pdu_to_dict(pdu)            
+                self.decoded_by_type.inc(data[2])
                 if self.should_relay_pdu(pdu):
+                    if self.dead_reckoning_filter is not None:
+                        start = time.perf_counter()
+                        forward = self.dead_reckoning_filter.should_forward(pdu)
+                        dead_reckoning_stage.add(time.perf_counter() - start)
+                        if not forward:
+                            return
                     EID = pdu.entityID
-                    print(f"[DIS RECV] {self.get_entity_name(pdu):<10} Entity with SN={EID.siteID:<2}, AN={EID.applicationID:<3}, EN={EID.entityID:<3} from {addr[0]}")
-                    ecef = (pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z)
-                    real_world_location = gps.ecef2lla(ecef)
-                    course, velocity = ECEF_to_natural_velocity(pdu.entityLocation, pdu.entityLinearVelocity)
-                    pdu_json["real_world_location"] = real_world_location
-                    pdu_json["real_world_course"] = course
-                    pdu_json["real_world_velocity"] = velocity
+                    recv_log.info("%-10s Entity with SN=%-2s, AN=%-3s, EN=%-3s from %s", self.get_entity_name(pdu), EID.siteID, EID.applicationID, EID.entityID, addr[0])
+                    if self.enrichment is not None and isinstance(pdu, EntityStateRecord):
+                        pdu_json = await self.enrichment.submit(pdu, data)
+                    else:
+                        pdu_json = enrich(pdu)
                     # pprint(pdu_json)
+                    self.relayed_pdus += 1
                     await self.http_poster.post_to_api(pdu_json, is_ack=False)
         except Exception as e:
-            print(f"Error decoding PDU: {e}")
+            self.decode_errors += 1
+            error_log.error("Error decoding PDU: %s", e)
  
+    def decode_pdu(self, data):
+        """
+        Decodes a datagram. EntityStatePdus go through the precompiled struct decoder, other PDU types through opendis.
+
+        Args:
+            data: Datagram received from the socket
+
+        Returns:
+            an EntityStateRecord, an opendis PDU, or None if the PDU type is unknown
+        """
+        if data[2] == EntityStatePdu.pduType:
+            return decode_entity_state(data)
+        return self.pdu_factory.createPdu(data)
+
     def get_entity_name(self, pdu="Unkown"):
         entity_type = pdu.entityType
         return ENTITY_TYPE_MAP.get((entity_type.entityKind, entity_type.domain, entity_type.country, entity_type.category, entity_type.subcategory, entity_type.specific), "UnknownEntity")
@@ -100,16 +175,30 @@ class DISCommunicator(DatagramProtocol):
         outputStream = DataOutputStream(memoryStream)
         pdu.serialize(outputStream)
         data = memoryStream.getvalue()
-        self.transport.write(data, (self.send_addr, self.send_port))
+        self.write_datagram(data)
         if hasattr(pdu, "entityID"):
             EID = pdu.entityID
-            print(f"[DIS SEND] {self.get_entity_name(pdu)} Entity with SN={EID.siteID:<2}, AN={EID.applicationID:<3}, EN={EID.entityID:<3} sent to {self.send_addr}:{self.send_port}")
+            send_log.info("%s Entity with SN=%-2s, AN=%-3s, EN=%-3s sent to %s:%s", self.get_entity_name(pdu), EID.siteID, EID.applicationID, EID.entityID, self.send_addr, self.send_port)
         else:
-            print(f"[DIS SEND] Custom PDU: {pdu.pduType}")
+            send_log.info("Custom PDU: %s", pdu.pduType)
+
+    def write_datagram(self, data):
+        """
+        Sends a serialized PDU to the emitter destination, through the outbound buffer if batching is enabled.
+
+        Args:
+            data: bytes-like datagram, which may be reused by the caller once this returns
+        """
+        self.pdus_emitted += 1
+        self.bytes_emitted += len(data)
+        if self.outbound is not None:
+            self.outbound.write(data, (self.send_addr, self.send_port))
+        else:
+            self.transport.write(data, (self.send_addr, self.send_port))
 
     def should_relay_pdu(self, pdu):
         """
-        Verifies whether the given pdu is an EntityStatePDU or not.
+        Verifies whether the given pdu is an EntityStatePDU (opendis object or decoded record) or not.
         
         Args:
             pdu: PDU to verify
@@ -117,11 +206,26 @@ class DISCommunicator(DatagramProtocol):
         Returns:
             True if the given pdu is an EntityStatePDU, otherwise False
         """
-        return isinstance(pdu, EntityStatePdu)
+        return isinstance(pdu, (EntityStateRecord, EntityStatePdu))
+
+    def should_relay_header(self, header):
+        """
+        Verifies, from the raw PDU header only, whether the datagram may carry a PDU to relay.
+        Datagrams rejected here are dropped before any PDU object is built.
+
+        Args:
+            header: PduHeader peeked from the datagram
+
+        Returns:
+            True if the PDU type is relayed and the exercise matches the configured one (if any), otherwise False
+        """
+        if header.pduType not in self.relayed_pdu_types:
+            return False
+        return self.exercise_id is None or header.exerciseID == self.exercise_id
     
     def emit_entity_state(self, entity_id, entity_type, position, velocity):
         """
-        Creates and sends an EntityState PDU.
+        Sends an EntityState PDU, from the template of the entity serialized on its first emission.
         
         Args:
             entity_id: Entity ID of the PDU to send
@@ -129,50 +233,53 @@ class DISCommunicator(DatagramProtocol):
             position: Position of the PDU to send
             velocity: Velocity of the PDU to send
         """
-        pdu = EntityStatePdu()
-        # Les 4 lignes suivantes ne devraient pas être nécessaires, mais sans elles, on a un bug en struct.pack au moment de la serialisation.
-        pdu.pduStatus = 0
-        pdu.entityAppearance=0
-        pdu.capabilities=0
-        pdu.pduType=1
-
-        pdu.exerciseID = 1
-        pdu.protocolFamily = 1
-        pdu.length = 144
-        pdu.pduStatus = 6
-        pdu.entityID = entity_id
-        pdu.deadReckoningParameters.deadReckoningAlgorithm = 4 # DRM (RVW) - High Speed or Maneuvering Entity with Extrapolation of Orientation [UID 44]
-
-        pdu.forceId = 0 # 1: Friendly 2: Opposing [UID  6]
-
-        pdu.entityType = EntityType(entity_type["kind"], entity_type["domain"], entity_type["country"], entity_type["category"], entity_type["subcategory"], entity_type["specific"], entity_type["extra"])
-        pdu.entityLocation = Vector3Double(position[0], position[1], position[2])
-        pdu.entityLinearVelocity = Vector3Float(velocity[0], velocity[1], velocity[2])
-        pdu.marking.characterSet = 1  # ASCII [UID 45]
-        pdu.marking.setString("MISSILE")
-
-        self.send_pdu(pdu)
+        key = (entity_id.siteID, entity_id.applicationID, entity_id.entityID)
+        cached = self.entity_state_templates.get(key)
+        if cached is None:
+            name = ENTITY_TYPE_MAP.get(tuple(entity_type[k] for k in ("kind", "domain", "country", "category", "subcategory", "specific")), "UnknownEntity")
+            cached = self.entity_state_templates[key] = (EntityStateTemplate(entity_id, entity_type), name)
+        template, name = cached
+        self.write_datagram(template.pack(position, velocity, dis_timestamp(time.time())))
+        send_log.info("%s Entity with SN=%-2s, AN=%-3s, EN=%-3s sent to %s:%s", name, key[0], key[1], key[2], self.send_addr, self.send_port)
+
+    def forget_entity(self, entity_id):
+        """
+        Drops the EntityStatePdu template of an entity that is no longer emitted.
+
+        Args:
+            entity_id: (site, application, entity) key of the entity
+        """
+        self.entity_state_templates.pop(entity_id, None)
 
     def emit_custom_pdu(self, STN, target_latitude, target_longitude):
         """
-        Creates and sends an Custom PDU containing STN, target latitude and target longitude.
+        Sends a Custom PDU containing STN, target latitude and target longitude.
+        These do not change for the life of a missile: the PDU is serialized on the first emission and only
+        its timestamp is updated afterwards.
         
         Args:
             entity_id: STN of the attacking unit (string)
             target_latitude: Latitude of the target (string)
             target_longitude: Longitude of the target (string)
         """
-        pdu = CustomPdu()
-        pdu.exerciseID = 1
-        pdu.protocolFamily = 150
-        pdu.timestamp =int(time.time())
-        pdu.pduStatus = 22
-
-        pdu.add_message(str(STN))  # STN of the attacking unit"")
-        pdu.add_message(str(target_latitude))  # STN of the attacking unit"")
-        pdu.add_message(str(target_longitude))  # STN of the attacking unit"")
-
-        self.send_pdu(pdu)
+        key = (STN, target_latitude, target_longitude)
+        datagram = self.custom_pdu_datagrams.get(key)
+        if datagram is None:
+            pdu = CustomPdu()
+            pdu.exerciseID = 1
+            pdu.protocolFamily = 150
+            pdu.pduStatus = 22
+
+            pdu.add_message(str(STN))  # STN of the attacking unit
+            pdu.add_message(str(target_latitude))
+            pdu.add_message(str(target_longitude))
+            if len(self.custom_pdu_datagrams) >= MAX_CACHED_CUSTOM_PDUS:
+                del self.custom_pdu_datagrams[next(iter(self.custom_pdu_datagrams))]
+            datagram = self.custom_pdu_datagrams[key] = pdu.to_datagram()
+
+        set_timestamp(datagram, int(time.time()))
+        self.write_datagram(datagram)
+        send_log.info("Custom PDU: %s", datagram[2])
     
     def get_RemoteDISSite(self):
         """
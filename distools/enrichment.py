@@ -0,0 +1,191 @@
+# -*- test-case-name: distools.test.test_enrichment -*-
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from twisted.internet import reactor
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+from opendis.RangeCoordinates import GPS
+from .geotools.tools import ECEF_to_natural_velocity_at
+from .pdus.entity_state_decoder import decode_entity_state
+from .pdus.tools import pdu_to_dict
+from admintools.profiler import timings
+
+gps = GPS()
+
+pdu_to_dict_stage = timings.stage("dis.pdu_to_dict")
+geodesy_stage = timings.stage("dis.geodesy")
+
+# Where the enrichment of forwarded EntityStatePdus runs
+INLINE = "none"      # on the reactor thread
+THREAD = "thread"    # in a thread pool
+PROCESS = "process"  # in a pool of processes
+EXECUTORS = (INLINE, THREAD, PROCESS)
+
+def enrich(pdu, timed=True):
+    """
+    Converts a decoded EntityStatePdu to the JSON payload posted to the API, with its geodetic position,
+    course and speed.
+
+    Args:
+        pdu: an EntityStateRecord or opendis EntityStatePdu
+        timed: whether to add the durations to the dis.pdu_to_dict and dis.geodesy stages, which are
+            only updated from the reactor thread
+
+    Returns:
+        the payload, as a dictionary
+    """
+    start = time.perf_counter()
+    pdu_json = pdu_to_dict(pdu)
+    if timed:
+        pdu_to_dict_stage.add(time.perf_counter() - start)
+    start = time.perf_counter()
+    ecef = (pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z)
+    real_world_location = gps.ecef2lla(ecef)
+    course, velocity = ECEF_to_natural_velocity_at(real_world_location[0], real_world_location[1], pdu.entityLinearVelocity)
+    if timed:
+        geodesy_stage.add(time.perf_counter() - start)
+    pdu_json["real_world_location"] = real_world_location
+    pdu_json["real_world_course"] = course
+    pdu_json["real_world_velocity"] = velocity
+    return pdu_json
+
+def enrich_records(records):
+    """
+    Enriches EntityStateRecords already decoded on the reactor thread. Runs in the executor threads or
+    processes, out of the stage timings.
+
+    Returns:
+        the payload of each record, or the exception it raised
+    """
+    results = []
+    for record in records:
+        try:
+            results.append(enrich(record, timed=False))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def enrich_datagrams(datagrams):
+    """
+    Decodes and enriches raw EntityStatePdu datagrams. Runs in the executor processes, which receive the
+    datagrams rather than the decoded records: pickling an EntityStateRecord costs more than enriching it
+    on the reactor thread, while bytes are pickled for almost nothing.
+
+    Returns:
+        the payload of each datagram, or the exception it raised
+    """
+    results = []
+    for data in datagrams:
+        try:
+            results.append(enrich(decode_entity_state(data), timed=False))
+        except Exception as e:
+            results.append(e)
+    return results
+
+class EnrichmentExecutor:
+    """
+    Runs the enrichment of forwarded EntityStatePdus out of the reactor thread. The records submitted
+    during one reactor turn, up to batch_size, are sent together to a thread or process pool, and only
+    the finished payloads come back to the reactor. Threads share the decoded records, processes are sent
+    the raw datagrams and decode them again. Batches complete in submission order, so that the
+    states of an entity are still posted in the order they were received.
+    Only the ingest consumers submit records, so batch_size is best kept at most their number.
+    """
+    def __init__(self, kind=THREAD, workers=4, batch_size=16, clock=reactor):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Invalid executor: '{kind}'. Expected {THREAD} or {PROCESS}.")
+        self.kind = kind
+        self.workers = workers
+        self.batch_size = batch_size
+        self.clock = clock
+        self.pool = None
+        self.batch = [] # (record, datagram, Deferred) waiting to be sent to the pool
+        self.flush_call = None
+        self.in_flight = deque() # [Deferreds of the batch, results or None] sent to the pool, oldest first
+        self.batches = 0
+        self.pending = 0 # records submitted and not delivered yet
+
+    def start(self):
+        if self.kind == THREAD:
+            self.pool = ThreadPool(self.workers, self.workers, name="enrichment")
+            self.pool.start()
+        else:
+            # spawn: forking the reactor process, its threads and their locks is not safe
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self.pool is None:
+            return
+        if self.kind == THREAD:
+            self.pool.stop()
+        else:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = None
+
+    def submit(self, record, data):
+        """
+        Queues a decoded EntityStateRecord for enrichment.
+
+        Args:
+            record: the EntityStateRecord
+            data: the datagram it was decoded from
+
+        Returns:
+            a Deferred fired with the payload, or failed with the exception raised by its enrichment
+        """
+        d = Deferred()
+        self.batch.append((record, data, d))
+        self.pending += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.flush_call is None:
+            self.flush_call = self.clock.callLater(0, self.flush)
+        return d
+
+    def flush(self):
+        if self.flush_call is not None:
+            if self.flush_call.active():
+                self.flush_call.cancel()
+            self.flush_call = None
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        entry = [[d for _, _, d in batch], None]
+        self.in_flight.append(entry)
+        self.batches += 1
+        if self.kind == THREAD:
+            done = deferToThreadPool(self.clock, self.pool, enrich_records, [record for record, _, _ in batch])
+        else:
+            done = Deferred()
+            future = self.pool.submit(enrich_datagrams, [data for _, data, _ in batch])
+            future.add_done_callback(lambda future: self.clock.callFromThread(self.future_done, future, done))
+        done.addBoth(self.batch_done, entry)
+
+    @staticmethod
+    def future_done(future, done):
+        if future.cancelled(): # by stop()
+            done.errback(CancelledError())
+            return
+        exception = future.exception()
+        if exception is not None:
+            done.errback(exception)
+        else:
+            done.callback(future.result())
+
+    def batch_done(self, results, entry):
+        entry[1] = results
+        while self.in_flight and self.in_flight[0][1] is not None:
+            deferreds, results = self.in_flight.popleft()
+            self.pending -= len(deferreds)
+            for i, d in enumerate(deferreds):
+                result = results[i] if isinstance(results, list) else results # else a Failure of the whole batch
+                if isinstance(result, (Exception, Failure)):
+                    d.errback(result)
+                else:
+                    d.callback(result)
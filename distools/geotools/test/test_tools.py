@@ -1,5 +1,10 @@
+import math
+import random
+
+import numpy as np
 from twisted.trial import unittest
-from distools.geotools.tools import natural_velocity_to_ECEF, ECEF_to_natural_velocity
+from distools.geotools.tools import natural_velocity_to_ECEF, ECEF_to_natural_velocity, ECEF_to_natural_velocity_at
+from distools.geotools.tools import lla2ecef_batch, ecef2lla_batch, natural_velocity_to_ECEF_batch, ECEF_to_natural_velocity_batch
 from opendis.dis7 import Vector3Double, Vector3Float
 from opendis.RangeCoordinates import GPS
 
@@ -56,3 +61,75 @@ class velocityTestCase(unittest.TestCase):
         ]
         for lat, lon, alt, course, speed in test_cases:
             self._round_trip_test(lat, lon, alt, course, speed)
+
+class enuVelocityTestCase(unittest.TestCase):
+    def _enu_to_ecef(self, lat, lon, east, north, up=0.0):
+        lat, lon = math.radians(lat), math.radians(lon)
+        return Vector3Float(
+            -math.sin(lon) * east - math.sin(lat) * math.cos(lon) * north + math.cos(lat) * math.cos(lon) * up,
+            math.cos(lon) * east - math.sin(lat) * math.sin(lon) * north + math.cos(lat) * math.sin(lon) * up,
+            math.cos(lat) * north + math.sin(lat) * up,
+        )
+
+    def test_cardinal_directions(self):
+        for course, (east, north) in ((0, (0, 1)), (90, (1, 0)), (180, (0, -1)), (270, (-1, 0))):
+            actual_course, actual_speed = ECEF_to_natural_velocity_at(0, 0, self._enu_to_ecef(0, 0, east, north))
+            self.assertAlmostEqual(actual_course, course, places=5)
+            self.assertAlmostEqual(actual_speed, 1, places=5)
+
+    def test_high_latitude_high_speed(self):
+        # 600 m/s towards the North-East at 75°N: the finite difference in degrees overestimates the eastward part
+        east = north = 600 / math.sqrt(2)
+        course, speed = ECEF_to_natural_velocity_at(75, 20, self._enu_to_ecef(75, 20, east, north))
+        self.assertAlmostEqual(course, 45, places=4)
+        self.assertAlmostEqual(speed, 600, places=2)
+
+    def test_vertical_velocity_ignored(self):
+        course, speed = ECEF_to_natural_velocity_at(45, 5, self._enu_to_ecef(45, 5, 0, 0, up=30))
+        self.assertEqual(speed, 0.0)
+
+    def test_matches_finite_difference_at_equator(self):
+        pos = Vector3Double(6378137.0, 0, 0)
+        vel = Vector3Float(0, 1, 0)
+        for actual, expected in zip(ECEF_to_natural_velocity_at(0, 0, vel), ECEF_to_natural_velocity(pos, vel)):
+            self.assertAlmostEqual(actual, expected, places=2)
+
+class batchTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(84)
+        self.lla = [(rng.uniform(-89, 89), rng.uniform(-180, 180), rng.uniform(0, 12000)) for _ in range(200)]
+        self.ecef = [gps.lla2ecef(lla) for lla in self.lla]
+        self.velocities = [(rng.uniform(-350, 350), rng.uniform(-350, 350), rng.uniform(-50, 50)) for _ in range(200)]
+        self.courses = [rng.uniform(0, 360) for _ in range(200)]
+        self.speeds = [rng.uniform(0, 700) for _ in range(200)]
+
+    def test_lla2ecef(self):
+        expected = np.array(self.ecef)
+        self.assertLess(np.abs(lla2ecef_batch(self.lla) - expected).max(), 1e-6)
+
+    def test_ecef2lla(self):
+        actual = ecef2lla_batch(self.ecef)
+        expected = np.array([gps.ecef2lla(ecef) for ecef in self.ecef])
+        self.assertLess(np.abs(actual[:, :2] - expected[:, :2]).max(), 1e-7)
+        self.assertLess(np.abs(actual[:, 2] - expected[:, 2]).max(), 0.01)
+
+    def test_single_point(self):
+        lat, lon, alt = ecef2lla_batch((6378137.0, 0, 0))[0]
+        self.assertAlmostEqual(lat, 0)
+        self.assertAlmostEqual(lon, 0)
+        self.assertAlmostEqual(alt, 0, places=6)
+
+    def test_ecef_to_natural_velocity(self):
+        courses, speeds = ECEF_to_natural_velocity_batch(self.ecef, self.velocities)
+        for ecef, velocity, course, speed in zip(self.ecef, self.velocities, courses, speeds):
+            expected_course, expected_speed = ECEF_to_natural_velocity(Vector3Double(*ecef), Vector3Float(*velocity))
+            self.assertAlmostEqual((course - expected_course + 180) % 360 - 180, 0, places=2)
+            self.assertAlmostEqual(speed, expected_speed, places=2)
+
+    def test_natural_velocity_to_ecef(self):
+        lat, lon, alt = np.array(self.lla).T
+        actual = natural_velocity_to_ECEF_batch(lat, lon, alt, self.courses, self.speeds)
+        for row, args in zip(actual, zip(lat, lon, alt, self.courses, self.speeds)):
+            for a, e in zip(row, natural_velocity_to_ECEF(*args)):
+                self.assertAlmostEqual(a, e, places=6)
+
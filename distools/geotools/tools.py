@@ -1,8 +1,15 @@
 # -*- test-case-name: geotools.test.test_tools -*-
 from opendis.RangeCoordinates import GPS
 import math
+import numpy as np
 
 gps = GPS() # conversion helper
+
+# WGS84 constants, taken from opendis so that batch and scalar conversions use the same ellipsoid
+WGS84_A = gps.wgs84.a
+WGS84_B = gps.wgs84.b
+WGS84_E2 = gps.wgs84.e ** 2
+WGS84_EP2 = (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
     
 def ECEF_to_natural_velocity(position, velocity):
     """
@@ -44,6 +51,36 @@ def ECEF_to_natural_velocity(position, velocity):
 
     return displacement_course, displacement_speed
 
+def ECEF_to_natural_velocity_at(latitude, longitude, velocity):
+    """
+    Converts an ECEF velocity to course and speed at an already known geodetic position.
+
+    The velocity is rotated analytically into the local East-North-Up frame, so no geodetic conversion
+    is needed and the result stays accurate at high latitudes and high speeds. Speed is the horizontal
+    (ground) speed: the vertical component is ignored, as in ECEF_to_natural_velocity.
+
+    Args:
+        latitude: Latitude in degrees.
+        longitude: Longitude in degrees.
+        velocity: Object with .x, .y, .z (velocity in ECEF, m/s).
+
+    Returns:
+        (course, speed): Direction in degrees (0–360) and speed in m/s.
+    """
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+    sin_lon, cos_lon = math.sin(lon), math.cos(lon)
+
+    east = -sin_lon * velocity.x + cos_lon * velocity.y
+    north = -sin_lat * cos_lon * velocity.x - sin_lat * sin_lon * velocity.y + cos_lat * velocity.z
+
+    course = math.degrees(math.atan2(east, north)) % 360
+    speed = math.hypot(east, north)
+    if speed < 1e-6:
+        speed = 0.0
+    return course, speed
+
 def natural_velocity_to_ECEF(latitude, longitude, altitude, course, speed):
     """
     Converts natural velocity (course and speed) into ECEF (Earth-Centered, Earth-Fixed) velocity components.
@@ -91,4 +128,109 @@ def natural_velocity_to_ECEF(latitude, longitude, altitude, course, speed):
     # Returns velocity in ECEF frame
     # Each coordinate in meters per second
     #print()
-    return (Xvelocity, Yvelocity, Zvelocity)
\ No newline at end of file
+    return (Xvelocity, Yvelocity, Zvelocity)
+
+def lla2ecef_batch(lla):
+    """
+    Batch version of gps.lla2ecef.
+
+    Args:
+        lla: N×3 array of (latitude, longitude, altitude) in (degrees, degrees, meters)
+
+    Returns:
+        N×3 array of ECEF (x, y, z) coordinates in meters
+    """
+    lla = np.asarray(lla, dtype=float).reshape(-1, 3)
+    lat = np.radians(lla[:, 0])
+    lon = np.radians(lla[:, 1])
+    alt = lla[:, 2]
+    sin_lat = np.sin(lat)
+    N = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    cos_lat = np.cos(lat)
+    return np.column_stack((
+        (N + alt) * cos_lat * np.cos(lon),
+        (N + alt) * cos_lat * np.sin(lon),
+        (N * (1 - WGS84_E2) + alt) * sin_lat,
+    ))
+
+def ecef2lla_batch(ecef):
+    """
+    Batch version of gps.ecef2lla, using the closed-form conversion of Heikkinen (1982) instead of iterating.
+    Matches gps.ecef2lla within 1e-7 degrees and 1 cm for points near the Earth surface. Unlike gps.ecef2lla,
+    points on the polar axis get a longitude of 0.
+
+    Args:
+        ecef: N×3 array of ECEF (x, y, z) coordinates in meters
+
+    Returns:
+        N×3 array of (latitude, longitude, altitude) in (degrees, degrees, meters)
+    """
+    ecef = np.asarray(ecef, dtype=float).reshape(-1, 3)
+    x, y, z = ecef[:, 0], ecef[:, 1], ecef[:, 2]
+    a2, b2 = WGS84_A ** 2, WGS84_B ** 2
+    p2 = x * x + y * y
+    p = np.sqrt(p2)
+    z2 = z * z
+    F = 54 * b2 * z2
+    G = p2 + (1 - WGS84_E2) * z2 - WGS84_E2 * (a2 - b2)
+    c = WGS84_E2 ** 2 * F * p2 / G ** 3
+    s = np.cbrt(1 + c + np.sqrt(c * c + 2 * c))
+    k = s + 1 + 1 / s
+    P = F / (3 * k * k * G * G)
+    Q = np.sqrt(1 + 2 * WGS84_E2 ** 2 * P)
+    r0 = -P * WGS84_E2 * p / (1 + Q) + np.sqrt(np.maximum(a2 / 2 * (1 + 1 / Q) - P * (1 - WGS84_E2) * z2 / (Q * (1 + Q)) - P * p2 / 2, 0))
+    d = p - WGS84_E2 * r0
+    U = np.sqrt(d * d + z2)
+    V = np.sqrt(d * d + (1 - WGS84_E2) * z2)
+    z0 = b2 * z / (WGS84_A * V)
+    return np.column_stack((
+        np.degrees(np.arctan2(z + WGS84_EP2 * z0, p)),
+        np.degrees(np.arctan2(y, x)),
+        U * (1 - b2 / (WGS84_A * V)),
+    ))
+
+def ECEF_to_natural_velocity_batch(positions, velocities):
+    """
+    Batch version of ECEF_to_natural_velocity. Matches it within 0.01 m/s and 0.01 degrees.
+
+    Args:
+        positions: N×3 array of ECEF positions in meters
+        velocities: N×3 array of ECEF velocities in m/s
+
+    Returns:
+        (courses, speeds): arrays of N directions in degrees (0–360) and N speeds in m/s
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    velocities = np.asarray(velocities, dtype=float).reshape(-1, 3)
+    lla = ecef2lla_batch(positions)
+    new_lla = ecef2lla_batch(positions + velocities)
+    delta_lat = new_lla[:, 0] - lla[:, 0]
+    delta_lon = new_lla[:, 1] - lla[:, 1]
+    courses = np.degrees(np.arctan2(delta_lon, delta_lat)) % 360
+    speeds = np.hypot(delta_lat, delta_lon) * (1854.0 * 60.0)
+    speeds[speeds < 1e-6] = 0.0
+    return courses, speeds
+
+def natural_velocity_to_ECEF_batch(latitudes, longitudes, altitudes, courses, speeds):
+    """
+    Batch version of natural_velocity_to_ECEF. Matches it within 1e-6 m/s.
+
+    Args:
+        latitudes, longitudes: arrays of N positions in degrees
+        altitudes: array of N altitudes in meters
+        courses: array of N movement directions in degrees (0° is North, 90° is East)
+        speeds: array of N speeds in meters per second
+
+    Returns:
+        N×3 array of ECEF velocities in meters per second
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    altitudes = np.broadcast_to(np.asarray(altitudes, dtype=float), latitudes.shape)
+    courses = np.radians(np.asarray(courses, dtype=float))
+    speeds = np.asarray(speeds, dtype=float)
+    latitude_variation = np.cos(courses) * speeds / (1854.0 * 60.0)
+    longitude_variation = np.sin(courses) * speeds / (1854.0 * 60.0 * np.cos(np.radians(latitudes)))
+    initial_positions = lla2ecef_batch(np.column_stack((latitudes, longitudes, altitudes)))
+    positions_after_one_second = lla2ecef_batch(np.column_stack((latitudes + latitude_variation, longitudes + longitude_variation, altitudes)))
+    return positions_after_one_second - initial_positions
@@ -0,0 +1,98 @@
+# -*- test-case-name: distools.test.test_ingest_queue -*-
+from collections import deque
+
+from twisted.internet.defer import Deferred, ensureDeferred
+
+from logtools.logger import get_logger
+
+log = get_logger("dis.ingest")
+
+# What to shed when a datagram arrives and the queue is full
+DROP_NEWEST = "drop_newest"  # the incoming datagram
+DROP_OLDEST = "drop_oldest"  # the oldest queued datagram
+OVERFLOW_POLICIES = (DROP_NEWEST, DROP_OLDEST)
+
+class IngestQueue:
+    """
+    Bounded FIFO queue between the UDP socket and PDU handling, drained by a fixed number of consumers.
+    """
+    def __init__(self, handler, capacity=10000, consumers=16, overflow_policy=DROP_NEWEST):
+        self.handler = handler # coroutine function called with each item
+        self.capacity = capacity
+        self.overflow_policy = overflow_policy
+        self.items = deque()
+        self.idle_consumers = deque() # Deferreds of consumers waiting for an item
+        self.enqueued = 0
+        self.processed = 0
+        self.shed = 0
+        self.high_water = 0
+        for _ in range(consumers):
+            ensureDeferred(self.consume())
+
+    @property
+    def size(self):
+        return len(self.items)
+
+    def put(self, item):
+        """
+        Queues an item, shedding one according to the overflow policy if the queue is full.
+
+        Args:
+            item: the item to hand to the handler
+
+        Returns:
+            True if the item was queued, False if it was shed
+        """
+        if self.idle_consumers:
+            self.enqueued += 1
+            self.idle_consumers.popleft().callback(item)
+            return True
+        if self.size >= self.capacity and not self.shed_one():
+            self.shed += 1
+            return False
+        self.items.append(item)
+        self.enqueued += 1
+        if self.size > self.high_water:
+            self.high_water = self.size
+        return True
+
+    def shed_one(self):
+        """
+        Makes room for an incoming item.
+
+        Returns:
+            True if a queued item was shed, False if the incoming item has to be shed instead
+        """
+        if self.overflow_policy == DROP_NEWEST or not self.items:
+            return False
+        self.items.popleft()
+        self.shed += 1
+        return True
+
+    async def consume(self):
+        while True:
+            if self.items:
+                item = self.items.popleft()
+            else:
+                waiter = Deferred()
+                self.idle_consumers.append(waiter)
+                item = await waiter
+            try:
+                await self.handler(item)
+            except Exception as e:
+                log.error("Error handling queued datagram: %s", e)
+            self.processed += 1
+
+    def stats(self):
+        """
+        Returns:
+            a dictionary of the queue counters
+        """
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "shed": self.shed,
+            "high_water": self.high_water,
+        }
@@ -0,0 +1,159 @@
+# -*- test-case-name: distools.test.test_outbound_buffer -*-
+import ctypes
+import ctypes.util
+import socket
+import sys
+
+from twisted.internet import reactor
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_iovec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+class _sockaddr_in(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_uint32), ("sin_zero", ctypes.c_ubyte * 8)]
+
+def _load_sendmmsg():
+    """
+    Gets the libc sendmmsg() function, available on Linux only.
+
+    Returns:
+        the ctypes function, or None if the platform does not provide it
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+_sendmmsg = _load_sendmmsg()
+
+def _sockaddr(addr):
+    host, port = addr
+    if host == "<broadcast>":
+        host = "255.255.255.255"
+    # Port and address are in network byte order
+    return _sockaddr_in(socket.AF_INET, socket.htons(port), int.from_bytes(socket.inet_aton(host), sys.byteorder))
+
+class OutboundBuffer:
+    """
+    Collects the datagrams written during one reactor turn and sends them together once the turn is over.
+    On Linux, a flush is a single sendmmsg() system call (or a few, if the kernel sends them partially);
+    elsewhere, or when the transport does not expose its socket, the datagrams are written in a loop.
+    """
+    def __init__(self, transport=None, clock=reactor, use_sendmmsg=True):
+        self.transport = transport
+        self.clock = clock
+        self.use_sendmmsg = use_sendmmsg and _sendmmsg is not None
+        self.datagrams = [] # (data, addr) waiting for the next flush
+        self.flush_call = None
+        self.sockaddrs = {} # addr -> sockaddr_in, built once per destination
+        self.flushes = 0
+        self.pdus_sent = 0
+        self.bytes_sent = 0
+        self.last_flush_pdus = 0
+        self.last_flush_bytes = 0
+        self.max_flush_pdus = 0
+        self.syscalls = 0
+
+    def write(self, data, addr):
+        """
+        Queues a datagram until the end of the current reactor turn.
+        The data is copied: the caller may reuse its buffer right away.
+
+        Args:
+            data: bytes-like datagram
+            addr: (ip, port) destination
+        """
+        self.datagrams.append((bytes(data), addr))
+        if self.flush_call is None:
+            self.flush_call = self.clock.callLater(0, self.flush)
+
+    def flush(self):
+        """
+        Sends all the queued datagrams.
+        """
+        if self.flush_call is not None and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        if not self.datagrams:
+            return
+        datagrams, self.datagrams = self.datagrams, []
+        sent = self.send_batch(datagrams) if self.use_sendmmsg else 0
+        for data, addr in datagrams[sent:]:
+            self.transport.write(data, addr)
+            self.syscalls += 1
+
+        size = sum(len(data) for data, _ in datagrams)
+        self.flushes += 1
+        self.pdus_sent += len(datagrams)
+        self.bytes_sent += size
+        self.last_flush_pdus = len(datagrams)
+        self.last_flush_bytes = size
+        self.max_flush_pdus = max(self.max_flush_pdus, len(datagrams))
+
+    def send_batch(self, datagrams):
+        """
+        Sends datagrams with sendmmsg().
+
+        Returns:
+            the number of datagrams sent, the others are left to transport.write()
+        """
+        try:
+            fd = self.transport.fileno()
+            messages = (_mmsghdr * len(datagrams))()
+            iovecs = (_iovec * len(datagrams))()
+            addrs = [self.sockaddrs.get(addr) or self.sockaddrs.setdefault(addr, _sockaddr(addr)) for _, addr in datagrams]
+        except (AttributeError, OSError, ValueError):
+            return 0 # no socket to write to directly, or not an IPv4 destination
+        payload = ctypes.create_string_buffer(b"".join(data for data, _ in datagrams))
+        offset = ctypes.addressof(payload)
+        for i, (data, _) in enumerate(datagrams):
+            iovecs[i].iov_base = offset
+            iovecs[i].iov_len = len(data)
+            offset += len(data)
+            header = messages[i].msg_hdr
+            header.msg_name = ctypes.addressof(addrs[i])
+            header.msg_namelen = ctypes.sizeof(_sockaddr_in)
+            header.msg_iov = ctypes.pointer(iovecs[i])
+            header.msg_iovlen = 1
+
+        sent = 0
+        while sent < len(datagrams):
+            self.syscalls += 1
+            first = ctypes.cast(ctypes.addressof(messages) + sent * ctypes.sizeof(_mmsghdr), ctypes.POINTER(_mmsghdr))
+            count = _sendmmsg(fd, first, len(datagrams) - sent, 0)
+            if count <= 0:
+                break # let transport.write() report or handle the error
+            sent += count
+        return sent
+
+    def stats(self):
+        """
+        Returns:
+            a dictionary of the emission counters
+        """
+        return {
+            "flushes": self.flushes,
+            "pdus_sent": self.pdus_sent,
+            "bytes_sent": self.bytes_sent,
+            "last_flush_pdus": self.last_flush_pdus,
+            "last_flush_bytes": self.last_flush_bytes,
+            "max_flush_pdus": self.max_flush_pdus,
+            "syscalls": self.syscalls,
+            "sendmmsg": self.use_sendmmsg,
+        }
@@ -1,6 +1,19 @@
 from opendis.dis7 import Pdu
 from opendis.DataOutputStream import DataOutputStream
 from io import BytesIO
+import struct
+
+from .header import PDU_HEADER_SIZE
+
+RECORD_HEADER = struct.Struct(">II") # record ID, record length in bits
+TIMESTAMP = struct.Struct(">I")
+TIMESTAMP_OFFSET = 4
+
+def set_timestamp(datagram, timestamp):
+    """
+    Updates the header timestamp of a serialized PDU.
+    """
+    TIMESTAMP.pack_into(datagram, TIMESTAMP_OFFSET, timestamp)
 
 
 class CustomPdu(Pdu):
@@ -8,13 +21,30 @@ class CustomPdu(Pdu):
         super().__init__()
         self.pduType = 140  # Unique identifier for this PDU type
         self.messages = []
+        self.records = None # encoded record section, see encode_records()
 
     def add_message(self, message):
         """
         Add a message to the PDU.
         """
-        print(f"[CustomPDU] adding message: {message}")
         self.messages.append(message)
+        self.records = None
+
+    def encode_records(self):
+        """
+        Encodes the record section (ID, length in bits, UTF-16 message, for each message) and its padding
+        to 8 bytes. The result is cached until a message is added.
+        """
+        if self.records is None:
+            records = bytearray()
+            for i, message in enumerate(self.messages):
+                encoded = message.encode("utf-16-be")
+                records += RECORD_HEADER.pack(1000 + i, (len(encoded) + RECORD_HEADER.size) * 8) # ID, longueur en bits (8 = 4 pour ID + 4 pour length)
+                records += encoded
+            # Ajout du padding à 8 octets
+            records += b"\x00" * (-(PDU_HEADER_SIZE + len(records)) % 8)
+            self.records = bytes(records)
+        return self.records
 
     # def decode(self, data_stream):
     #     """
@@ -26,42 +56,20 @@ class CustomPdu(Pdu):
     def serialize(self, outputStream):
         """
         Encode this PDU into binary format.
+        The length is computed from the size of the record section, encoded once.
         """
-        memoryStream = BytesIO()
-        dummyoutputStream = DataOutputStream(memoryStream)
-
-        super(CustomPdu, self).serialize(dummyoutputStream)
-        for i, message in enumerate(self.messages):
-            record_id = 1000 + i
-            encoded = message.encode("utf-16-be")
-            total_bits = (len(encoded) + 8) * 8  # 8 = 4 pour ID + 4 pour length
-            dummyoutputStream.write_unsigned_int(record_id)  # Example: 4 bytes
-            dummyoutputStream.write_unsigned_int(total_bits)  # Example: 4 bytes
-            dummyoutputStream.stream.write(encoded)  # Write the encoded message
-
-
-        # Ajout du padding à 8 octets
-        if dummyoutputStream.stream.getbuffer().nbytes % 8 != 0:
-            padding = 8 - (dummyoutputStream.stream.getbuffer().nbytes % 8)
-            dummyoutputStream.stream.write(b"\x00" * padding) 
-
-        # 1ère passe: on connait désormais la longueur finale du PDU.
-
-        self.length = dummyoutputStream.stream.getbuffer().nbytes
-
-        # 2ème passe: on réencode pour avoir le PDU avec la bonne longueur.
+        records = self.encode_records()
+        self.length = PDU_HEADER_SIZE + len(records)
         super(CustomPdu, self).serialize(outputStream)
-        for i, message in enumerate(self.messages):
-            record_id = 1000 + i
-            encoded = message.encode("utf-16-be")
-            total_bits = (len(encoded) + 8) * 8  # 8 = 4 pour ID + 4 pour length
-            outputStream.write_unsigned_int(record_id)  # Example: 4 bytes
-            outputStream.write_unsigned_int(total_bits)  # Example: 4 bytes
-            outputStream.stream.write(encoded)  # Write the encoded message
+        outputStream.stream.write(records)
 
-
-        # Ajout du padding à 8 octets
-        outputStream.stream.write(b"\x00" * padding) 
+    def to_datagram(self):
+        """
+        Serializes the PDU into a bytearray, whose timestamp can then be updated in place with set_timestamp().
+        """
+        memoryStream = BytesIO()
+        self.serialize(DataOutputStream(memoryStream))
+        return bytearray(memoryStream.getvalue())
 
     # def to_dict(self):
     #     """
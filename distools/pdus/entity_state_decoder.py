@@ -0,0 +1,119 @@
+import struct
+from collections import namedtuple
+
+# Fixed part of an EntityStatePdu (IEEE 1278.1-2012, 7.2.2), 144 bytes, followed by the variable parameters.
+ENTITY_STATE = struct.Struct(
+    ">BBBBIHBB"  # PDU header
+    "HHH"        # entityID
+    "BB"         # forceId, numberOfVariableParameters
+    "BBHBBBB"    # entityType
+    "BBHBBBB"    # alternativeEntityType
+    "fff"        # entityLinearVelocity
+    "ddd"        # entityLocation
+    "fff"        # entityOrientation
+    "I"          # entityAppearance
+    "B15s"       # deadReckoningParameters: algorithm, parameters
+    "fff"        #   entityLinearAcceleration
+    "fff"        #   entityAngularVelocity
+    "B11s"       # marking
+    "I"          # capabilities
+)
+VARIABLE_PARAMETER = struct.Struct(">BdIHB")
+
+EntityIDRecord = namedtuple("EntityIDRecord", ["siteID", "applicationID", "entityID"])
+EntityTypeRecord = namedtuple("EntityTypeRecord", ["entityKind", "domain", "country", "category", "subcategory", "specific", "extra"])
+Vector3Record = namedtuple("Vector3Record", ["x", "y", "z"])
+EulerAnglesRecord = namedtuple("EulerAnglesRecord", ["psi", "theta", "phi"])
+DeadReckoningRecord = namedtuple("DeadReckoningRecord", ["deadReckoningAlgorithm", "parameters", "entityLinearAcceleration", "entityAngularVelocity"])
+VariableParameterRecord = namedtuple("VariableParameterRecord", ["recordType", "variableParameterFields1", "variableParameterFields2", "variableParameterFields3", "variableParameterFields4"])
+
+class EntityStateRecord:
+    """
+    Compact record of a decoded EntityStatePdu, used in place of the opendis object on the receive path.
+    Exposes the same attribute names as opendis EntityStatePdu for the fields used by the gateway.
+    """
+    __slots__ = ("protocolVersion", "exerciseID", "pduType", "protocolFamily", "timestamp", "length", "pduStatus", "padding",
+                 "entityID", "forceId", "entityType", "alternativeEntityType", "entityLinearVelocity", "entityLocation",
+                 "entityOrientation", "entityAppearance", "deadReckoningParameters", "marking", "capabilities", "variableParameters")
+
+    @property
+    def numberOfVariableParameters(self):
+        return len(self.variableParameters)
+
+    def to_dict(self):
+        """
+        Converts the record to the dictionary produced by pdu_to_dict on the equivalent opendis EntityStatePdu.
+
+        Returns:
+            a JSON-serializable dictionary
+        """
+        entity_type = self.entityType
+        alternative_type = self.alternativeEntityType
+        dr = self.deadReckoningParameters
+        orientation = self.entityOrientation
+        return {
+            "alternativeEntityType": {"category": alternative_type[3], "country": alternative_type[2], "domain": alternative_type[1], "entityKind": alternative_type[0], "extra": alternative_type[6], "specific": alternative_type[5], "subcategory": alternative_type[4]},
+            "capabilities": self.capabilities,
+            "deadReckoningParameters": {
+                "deadReckoningAlgorithm": dr[0],
+                "entityAngularVelocity": dict(zip("xyz", dr[3])),
+                "entityLinearAcceleration": dict(zip("xyz", dr[2])),
+                "parameters": list(dr[1]),
+            },
+            "entityAppearance": self.entityAppearance,
+            "entityID": {"applicationID": self.entityID[1], "entityID": self.entityID[2], "siteID": self.entityID[0]},
+            "entityLinearVelocity": dict(zip("xyz", self.entityLinearVelocity)),
+            "entityLocation": dict(zip("xyz", self.entityLocation)),
+            "entityOrientation": {"phi": orientation[2], "psi": orientation[0], "theta": orientation[1]},
+            "entityType": {"category": entity_type[3], "country": entity_type[2], "domain": entity_type[1], "entityKind": entity_type[0], "extra": entity_type[6], "specific": entity_type[5], "subcategory": entity_type[4]},
+            "exerciseID": self.exerciseID,
+            "forceId": self.forceId,
+            "length": self.length,
+            "marking": self.marking,
+            "numberOfVariableParameters": len(self.variableParameters),
+            "padding": self.padding,
+            "pduStatus": self.pduStatus,
+            "pduType": self.pduType,
+            "protocolFamily": self.protocolFamily,
+            "protocolVersion": self.protocolVersion,
+            "timestamp": self.timestamp,
+            "variableParameters": [vp._asdict() for vp in self.variableParameters],
+        }
+
+def decode_entity_state(data):
+    """
+    Decodes an EntityStatePdu with precompiled struct layouts, without going through opendis DataInputStream.
+
+    Args:
+        data: Datagram received from the socket (bytes, bytearray or memoryview)
+
+    Returns:
+        an EntityStateRecord
+
+    Raises:
+        struct.error if the datagram is shorter than the PDU it announces
+    """
+    view = memoryview(data)
+    fields = ENTITY_STATE.unpack_from(view)
+    record = EntityStateRecord()
+    (record.protocolVersion, record.exerciseID, record.pduType, record.protocolFamily,
+     record.timestamp, record.length, record.pduStatus, record.padding) = fields[0:8]
+    record.entityID = EntityIDRecord._make(fields[8:11])
+    record.forceId = fields[11]
+    record.entityType = EntityTypeRecord._make(fields[13:20])
+    record.alternativeEntityType = EntityTypeRecord._make(fields[20:27])
+    record.entityLinearVelocity = Vector3Record._make(fields[27:30])
+    record.entityLocation = Vector3Record._make(fields[30:33])
+    record.entityOrientation = EulerAnglesRecord._make(fields[33:36])
+    record.entityAppearance = fields[36]
+    record.deadReckoningParameters = DeadReckoningRecord(fields[37], fields[38], Vector3Record._make(fields[39:42]), Vector3Record._make(fields[42:45]))
+    record.marking = fields[46].replace(b"\x00", b"").decode("utf-8")
+    record.capabilities = fields[47]
+
+    offset = ENTITY_STATE.size
+    variable_parameters = []
+    for _ in range(fields[12]):
+        variable_parameters.append(VariableParameterRecord._make(VARIABLE_PARAMETER.unpack_from(view, offset)))
+        offset += VARIABLE_PARAMETER.size
+    record.variableParameters = variable_parameters
+    return record
@@ -0,0 +1,92 @@
+import struct
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, EntityType, Vector3Double, Vector3Float
+
+# Offsets of the fields that change between two emissions of the same entity (IEEE 1278.1-2012, 7.2.2)
+TIMESTAMP = struct.Struct(">I")
+TIMESTAMP_OFFSET = 4
+LINEAR_VELOCITY = struct.Struct(">fff")
+LINEAR_VELOCITY_OFFSET = 36
+LOCATION = struct.Struct(">ddd")
+LOCATION_OFFSET = 48
+
+def dis_timestamp(now):
+    """
+    Relative DIS timestamp (IEEE 1278.1-2012, 6.2.88): units of 3600/2^31 s past the hour, with the low
+    bit cleared.
+
+    Args:
+        now: UNIX time in seconds
+    """
+    return (int((now % 3600) * (2 ** 31 / 3600)) << 1) & 0xFFFFFFFF
+
+def entity_state_pdu(entity_id, entity_type, position=(0.0, 0.0, 0.0), velocity=(0.0, 0.0, 0.0), marking="MISSILE"):
+    """
+    Creates the EntityState PDU emitted for a simulated missile.
+
+    Args:
+        entity_id: Entity ID of the PDU
+        entity_type: Entity Type of the PDU, as a dictionary
+        position: ECEF position in meters
+        velocity: ECEF velocity in m/s
+        marking: entity marking, up to 11 ASCII characters
+
+    Returns:
+        an opendis EntityStatePdu
+    """
+    pdu = EntityStatePdu()
+    # Les 4 lignes suivantes ne devraient pas être nécessaires, mais sans elles, on a un bug en struct.pack au moment de la serialisation.
+    pdu.pduStatus = 0
+    pdu.entityAppearance=0
+    pdu.capabilities=0
+    pdu.pduType=1
+
+    pdu.exerciseID = 1
+    pdu.protocolFamily = 1
+    pdu.length = 144
+    pdu.pduStatus = 6
+    pdu.entityID = entity_id
+    pdu.deadReckoningParameters.deadReckoningAlgorithm = 4 # DRM (RVW) - High Speed or Maneuvering Entity with Extrapolation of Orientation [UID 44]
+
+    pdu.forceId = 0 # 1: Friendly 2: Opposing [UID  6]
+
+    pdu.entityType = EntityType(entity_type["kind"], entity_type["domain"], entity_type["country"], entity_type["category"], entity_type["subcategory"], entity_type["specific"], entity_type["extra"])
+    pdu.entityLocation = Vector3Double(position[0], position[1], position[2])
+    pdu.entityLinearVelocity = Vector3Float(velocity[0], velocity[1], velocity[2])
+    pdu.marking.characterSet = 1  # ASCII [UID 45]
+    pdu.marking.setString(marking)
+    return pdu
+
+class EntityStateTemplate:
+    """
+    EntityStatePdu of one entity, serialized once. Each emission only writes the timestamp, location
+    and velocity in place, without building the opendis object graph again.
+    """
+    __slots__ = ("entity_id", "entity_type", "buffer")
+
+    def __init__(self, entity_id, entity_type, marking="MISSILE"):
+        self.entity_id = entity_id
+        self.entity_type = entity_type
+        memoryStream = BytesIO()
+        entity_state_pdu(entity_id, entity_type, marking=marking).serialize(DataOutputStream(memoryStream))
+        self.buffer = bytearray(memoryStream.getvalue())
+
+    def pack(self, position, velocity, timestamp=0):
+        """
+        Writes the changing fields into the template.
+
+        Args:
+            position: ECEF position in meters
+            velocity: ECEF velocity in m/s
+            timestamp: DIS timestamp of the PDU
+
+        Returns:
+            the template buffer, valid until the next call
+        """
+        buffer = self.buffer
+        TIMESTAMP.pack_into(buffer, TIMESTAMP_OFFSET, timestamp)
+        LINEAR_VELOCITY.pack_into(buffer, LINEAR_VELOCITY_OFFSET, velocity[0], velocity[1], velocity[2])
+        LOCATION.pack_into(buffer, LOCATION_OFFSET, position[0], position[1], position[2])
+        return buffer
@@ -0,0 +1,25 @@
+import struct
+from collections import namedtuple
+
+# PDU header record (IEEE 1278.1-2012, 6.2.66): version, exercise, type, family, timestamp, length
+PDU_HEADER = struct.Struct(">BBBBIH")
+PDU_HEADER_SIZE = 12 # 10 bytes above + PDU status + padding
+
+PduHeader = namedtuple("PduHeader", ["protocolVersion", "exerciseID", "pduType", "protocolFamily", "timestamp", "length"])
+
+def peek_pdu_header(data):
+    """
+    Reads the DIS PDU header straight from a raw datagram, without building any opendis object.
+
+    Args:
+        data: Datagram received from the socket
+
+    Returns:
+        a PduHeader, or None if the datagram is too short or its length field does not fit in it
+    """
+    if len(data) < PDU_HEADER_SIZE:
+        return None
+    header = PduHeader._make(PDU_HEADER.unpack_from(data))
+    if header.length > len(data):
+        return None
+    return header
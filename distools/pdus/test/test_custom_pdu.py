@@ -0,0 +1,81 @@
+from io import BytesIO
+
+from twisted.trial import unittest
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import Pdu
+
+from distools.pdus.custom_pdu import CustomPdu, set_timestamp
+
+def legacy_serialize(pdu, outputStream):
+    """
+    Two-pass serializer that CustomPdu.serialize used to implement, kept as the reference for the wire format.
+    """
+    memoryStream = BytesIO()
+    dummyoutputStream = DataOutputStream(memoryStream)
+
+    Pdu.serialize(pdu, dummyoutputStream)
+    for i, message in enumerate(pdu.messages):
+        record_id = 1000 + i
+        encoded = message.encode("utf-16-be")
+        total_bits = (len(encoded) + 8) * 8
+        dummyoutputStream.write_unsigned_int(record_id)
+        dummyoutputStream.write_unsigned_int(total_bits)
+        dummyoutputStream.stream.write(encoded)
+
+    if dummyoutputStream.stream.getbuffer().nbytes % 8 != 0:
+        padding = 8 - (dummyoutputStream.stream.getbuffer().nbytes % 8)
+        dummyoutputStream.stream.write(b"\x00" * padding)
+
+    pdu.length = dummyoutputStream.stream.getbuffer().nbytes
+
+    Pdu.serialize(pdu, outputStream)
+    for i, message in enumerate(pdu.messages):
+        record_id = 1000 + i
+        encoded = message.encode("utf-16-be")
+        total_bits = (len(encoded) + 8) * 8
+        outputStream.write_unsigned_int(record_id)
+        outputStream.write_unsigned_int(total_bits)
+        outputStream.stream.write(encoded)
+
+    outputStream.stream.write(b"\x00" * padding)
+
+def custom_pdu(messages, timestamp=1747084972):
+    pdu = CustomPdu()
+    pdu.exerciseID = 1
+    pdu.protocolFamily = 150
+    pdu.timestamp = timestamp
+    pdu.pduStatus = 22
+    for message in messages:
+        pdu.add_message(message)
+    return pdu
+
+def serialize(pdu, serializer):
+    memoryStream = BytesIO()
+    serializer(pdu, DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+class customPduTestCase(unittest.TestCase):
+    def test_matches_legacy_serializer(self):
+        for messages in (["00020", "44", "5.143"], ["00020", "43.296", "5.3699"], ["é", "", "ABCDEFGHIJ"], ["abc"]):
+            new = serialize(custom_pdu(messages), CustomPdu.serialize)
+            legacy = serialize(custom_pdu(messages), legacy_serialize)
+            self.assertEqual(new, legacy)
+            self.assertEqual(len(new) % 8, 0)
+
+    def test_length_without_padding(self):
+        # The legacy serializer failed on PDUs already aligned on 8 bytes
+        data = serialize(custom_pdu(["ab"]), CustomPdu.serialize)
+        self.assertEqual(len(data), 24)
+        self.assertEqual(int.from_bytes(data[8:10], "big"), 24)
+
+    def test_records_cached_until_message_added(self):
+        pdu = custom_pdu(["00020"])
+        records = pdu.encode_records()
+        self.assertIs(pdu.encode_records(), records)
+        pdu.add_message("44")
+        self.assertEqual(serialize(pdu, CustomPdu.serialize), serialize(custom_pdu(["00020", "44"]), legacy_serialize))
+
+    def test_set_timestamp(self):
+        datagram = custom_pdu(["00020", "44", "5.143"], timestamp=0).to_datagram()
+        set_timestamp(datagram, 1747085000)
+        self.assertEqual(bytes(datagram), serialize(custom_pdu(["00020", "44", "5.143"], timestamp=1747085000), legacy_serialize))
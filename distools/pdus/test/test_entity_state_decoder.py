@@ -0,0 +1,66 @@
+import random
+import struct
+from io import BytesIO
+
+from twisted.trial import unittest
+from opendis import PduFactory
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, EntityID, EntityType, Vector3Double, Vector3Float, EulerAngles, VariableParameter
+
+from distools.pdus.entity_state_decoder import decode_entity_state
+from distools.pdus.tools import pdu_to_dict
+
+def sample_entity_state_datagram(rng, variable_parameters=0):
+    pdu = EntityStatePdu()
+    pdu.pduType = 1
+    pdu.protocolFamily = 1
+    pdu.pduStatus = rng.randrange(256)
+    pdu.exerciseID = rng.randrange(256)
+    pdu.timestamp = rng.randrange(2**32)
+    pdu.length = 144 + 16 * variable_parameters
+    pdu.entityID = EntityID(rng.randrange(65536), rng.randrange(65536), rng.randrange(65536))
+    pdu.forceId = rng.randrange(4)
+    pdu.entityType = EntityType(2, 6, 71, 1, 1, 4, 0)
+    pdu.alternativeEntityType = EntityType(1, 3, 62, 6, 5, 1, 2)
+    pdu.entityLinearVelocity = Vector3Float(rng.uniform(-300, 300), rng.uniform(-300, 300), rng.uniform(-300, 300))
+    pdu.entityLocation = Vector3Double(rng.uniform(-7e6, 7e6), rng.uniform(-7e6, 7e6), rng.uniform(-7e6, 7e6))
+    pdu.entityOrientation = EulerAngles(rng.uniform(-3, 3), rng.uniform(-1.5, 1.5), rng.uniform(-3, 3))
+    pdu.entityAppearance = rng.randrange(2**32)
+    pdu.capabilities = rng.randrange(2**32)
+    pdu.deadReckoningParameters.deadReckoningAlgorithm = rng.randrange(1, 10)
+    pdu.deadReckoningParameters.parameters = [rng.randrange(256) for _ in range(15)]
+    pdu.deadReckoningParameters.entityLinearAcceleration = Vector3Float(rng.uniform(-10, 10), 0.5, -0.25)
+    pdu.deadReckoningParameters.entityAngularVelocity = Vector3Float(0.125, rng.uniform(-1, 1), 0.0)
+    pdu.marking.characterSet = 1
+    pdu.marking.setString(rng.choice(["MISSILE", "C2N", "00043", "", "ABCDEFGHIJK"]))
+    pdu.variableParameters = [VariableParameter(rng.randrange(256), rng.uniform(-1e3, 1e3), rng.randrange(2**32), rng.randrange(65536), rng.randrange(256)) for _ in range(variable_parameters)]
+    memoryStream = BytesIO()
+    pdu.serialize(DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+class entityStateDecoderTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(1278)
+        self.datagrams = [sample_entity_state_datagram(rng, variable_parameters=i % 3) for i in range(50)]
+
+    def test_same_dict_as_opendis(self):
+        for data in self.datagrams:
+            self.assertEqual(decode_entity_state(data).to_dict(), pdu_to_dict(PduFactory.createPdu(data)))
+
+    def test_attributes_match_opendis(self):
+        for data in self.datagrams:
+            record = decode_entity_state(data)
+            pdu = PduFactory.createPdu(data)
+            self.assertEqual(record.entityID.siteID, pdu.entityID.siteID)
+            self.assertEqual(record.entityID.entityID, pdu.entityID.entityID)
+            self.assertEqual(record.entityType.country, pdu.entityType.country)
+            self.assertEqual(record.entityLocation.x, pdu.entityLocation.x)
+            self.assertEqual(record.entityLinearVelocity.z, pdu.entityLinearVelocity.z)
+            self.assertEqual(record.numberOfVariableParameters, pdu.numberOfVariableParameters)
+
+    def test_decode_from_memoryview(self):
+        data = self.datagrams[0]
+        self.assertEqual(decode_entity_state(memoryview(data)).to_dict(), decode_entity_state(data).to_dict())
+
+    def test_truncated_datagram(self):
+        self.assertRaises(struct.error, decode_entity_state, self.datagrams[0][:100])
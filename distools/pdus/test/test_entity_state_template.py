@@ -0,0 +1,67 @@
+from io import BytesIO
+
+from twisted.trial import unittest
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityID
+
+from distools import dis_communicator
+from distools.dis_communicator import DISCommunicator
+from distools.pdus.entity_state_template import EntityStateTemplate, dis_timestamp, entity_state_pdu
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+def serialize(pdu, timestamp=0):
+    pdu.timestamp = timestamp
+    memoryStream = BytesIO()
+    pdu.serialize(DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+class FakeTransport:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data, addr):
+        self.written.append((bytes(data), addr))
+
+class entityStateTemplateTestCase(unittest.TestCase):
+    def test_matches_opendis_serialization(self):
+        entity_id = EntityID(1, 20, 300)
+        template = EntityStateTemplate(entity_id, ENTITY_TYPE)
+        for position, velocity in [((4596224.5, 483088.25, 4370446.0), (-120.5, 210.25, 80.0)),
+                                   ((-1.0e6, 6.1e6, -3.3e5), (0.1, -0.2, 305.7))]:
+            expected = serialize(entity_state_pdu(entity_id, ENTITY_TYPE, position, velocity))
+            self.assertEqual(bytes(template.pack(position, velocity)), expected)
+
+    def test_timestamp(self):
+        entity_id = EntityID(1, 20, 300)
+        pdu = entity_state_pdu(entity_id, ENTITY_TYPE, (1.0, 2.0, 3.0), (4.0, 5.0, 6.0))
+        template = EntityStateTemplate(entity_id, ENTITY_TYPE)
+        self.assertEqual(bytes(template.pack((1.0, 2.0, 3.0), (4.0, 5.0, 6.0), 123456789)), serialize(pdu, 123456789))
+
+    def test_dis_timestamp(self):
+        self.assertEqual(dis_timestamp(7200.0), 0)
+        self.assertEqual(dis_timestamp(7200.0 + 1800), 2 ** 31)
+        self.assertEqual(dis_timestamp(3599.9999999) & 1, 0) # relative timestamp
+        self.assertLessEqual(dis_timestamp(3599.9999999), 0xFFFFFFFF)
+
+class emitEntityStateTestCase(unittest.TestCase):
+    def setUp(self):
+        receiver = {"ip": "127.0.0.1", "port": 3000, "mode": 0}
+        emitter = {"ip": "127.0.0.1", "port": 3001, "mode": 0}
+        self.communicator = DISCommunicator(None, receiver, emitter, 1)
+        self.communicator.transport = FakeTransport()
+        self.patch(dis_communicator, "dis_timestamp", lambda now: 2 ** 30)
+
+    def test_template_cached_per_entity(self):
+        first, second = EntityID(1, 20, 1), EntityID(1, 20, 2)
+        self.communicator.emit_entity_state(first, ENTITY_TYPE, (1.0, 2.0, 3.0), (4.0, 5.0, 6.0))
+        self.communicator.emit_entity_state(first, ENTITY_TYPE, (7.0, 8.0, 9.0), (1.0, 1.0, 1.0))
+        self.communicator.emit_entity_state(second, ENTITY_TYPE, (7.0, 8.0, 9.0), (1.0, 1.0, 1.0))
+        self.assertEqual(len(self.communicator.entity_state_templates), 2)
+        written = [data for data, addr in self.communicator.transport.written]
+        self.assertEqual(written[0], serialize(entity_state_pdu(first, ENTITY_TYPE, (1.0, 2.0, 3.0), (4.0, 5.0, 6.0)), 2 ** 30))
+        self.assertEqual(written[1], serialize(entity_state_pdu(first, ENTITY_TYPE, (7.0, 8.0, 9.0), (1.0, 1.0, 1.0)), 2 ** 30))
+        self.assertEqual(written[2], serialize(entity_state_pdu(second, ENTITY_TYPE, (7.0, 8.0, 9.0), (1.0, 1.0, 1.0)), 2 ** 30))
+
+        self.communicator.forget_entity((1, 20, 1))
+        self.assertEqual(list(self.communicator.entity_state_templates), [(1, 20, 2)])
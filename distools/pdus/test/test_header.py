@@ -0,0 +1,74 @@
+from io import BytesIO
+
+from twisted.trial import unittest
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, FirePdu
+
+from distools.dis_communicator import DISCommunicator
+from distools.pdus.header import peek_pdu_header
+
+def serialize(pdu):
+    memoryStream = BytesIO()
+    pdu.serialize(DataOutputStream(memoryStream))
+    return memoryStream.getvalue()
+
+def entity_state_datagram(exercise_id=1):
+    pdu = EntityStatePdu()
+    pdu.pduStatus = 0
+    pdu.entityAppearance = 0
+    pdu.capabilities = 0
+    pdu.pduType = 1
+    pdu.protocolFamily = 1
+    pdu.exerciseID = exercise_id
+    pdu.length = 144
+    return serialize(pdu)
+
+def fire_datagram():
+    pdu = FirePdu()
+    pdu.pduStatus = 0
+    pdu.pduType = 2
+    pdu.protocolFamily = 2
+    pdu.length = 96
+    return serialize(pdu)
+
+class peekHeaderTestCase(unittest.TestCase):
+    def test_entity_state_header(self):
+        header = peek_pdu_header(entity_state_datagram(exercise_id=3))
+        self.assertEqual(header.protocolVersion, 7)
+        self.assertEqual(header.exerciseID, 3)
+        self.assertEqual(header.pduType, 1)
+        self.assertEqual(header.protocolFamily, 1)
+        self.assertEqual(header.length, 144)
+
+    def test_too_short(self):
+        self.assertIsNone(peek_pdu_header(b"\x07\x01\x01"))
+
+    def test_truncated(self):
+        self.assertIsNone(peek_pdu_header(entity_state_datagram()[:100]))
+
+class prefilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.communicator = DISCommunicator(None, {"ip": "127.0.0.1", "port": 3000, "mode": 0}, {"ip": "127.0.0.1", "port": 4000, "mode": 0}, 1)
+        self.handled = []
+
+        async def handle_pdu(data, addr):
+            self.handled.append(data)
+        self.communicator.handle_pdu = handle_pdu
+
+    def test_drop_other_pdu_types(self):
+        self.communicator.datagramReceived(fire_datagram(), ("127.0.0.1", 3000))
+        self.communicator.datagramReceived(fire_datagram(), ("127.0.0.1", 3000))
+        self.communicator.datagramReceived(b"garbage", ("127.0.0.1", 3000))
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.communicator.dropped_datagrams[2], 2)
+        self.assertEqual(self.communicator.malformed_datagrams, 1)
+
+    def test_relay_entity_state(self):
+        self.communicator.datagramReceived(entity_state_datagram(), ("127.0.0.1", 3000))
+        self.assertEqual(len(self.handled), 1)
+
+    def test_drop_other_exercise(self):
+        self.communicator.exercise_id = 2
+        self.communicator.datagramReceived(entity_state_datagram(exercise_id=1), ("127.0.0.1", 3000))
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.communicator.dropped_datagrams[1], 1)
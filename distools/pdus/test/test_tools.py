@@ -0,0 +1,43 @@
+import random
+from io import BytesIO
+
+from twisted.trial import unittest
+from opendis import PduFactory
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import FirePdu, DetonationPdu, VariableParameter
+
+from distools.pdus.entity_state_decoder import decode_entity_state
+from distools.pdus.tools import pdu_to_dict, _reflective_pdu_to_dict
+from distools.pdus.test.test_entity_state_decoder import sample_entity_state_datagram
+
+class pduToDictTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(6)
+        self.datagrams = [sample_entity_state_datagram(rng, variable_parameters=i % 3) for i in range(20)]
+
+    def test_same_dict_as_reflection(self):
+        for data in self.datagrams:
+            pdu = PduFactory.createPdu(data)
+            self.assertEqual(pdu_to_dict(pdu), _reflective_pdu_to_dict(pdu))
+
+    def test_serializer_reused_across_instances(self):
+        # The first instance has no variable parameter, later ones must still be converted
+        for data in self.datagrams:
+            pdu = PduFactory.createPdu(data)
+            self.assertEqual(pdu_to_dict(pdu)["variableParameters"], _reflective_pdu_to_dict(pdu)["variableParameters"])
+
+    def test_other_pdu_types(self):
+        for pdu_class, pdu_type in ((FirePdu, 2), (DetonationPdu, 3)):
+            pdu = pdu_class()
+            pdu.pduStatus = 0
+            pdu.pduType = pdu_type
+            if pdu_class is DetonationPdu:
+                pdu.variableParameters = [VariableParameter(1, 2.0, 3, 4, 5)]
+            memoryStream = BytesIO()
+            pdu.serialize(DataOutputStream(memoryStream))
+            decoded = PduFactory.createPdu(memoryStream.getvalue())
+            self.assertEqual(pdu_to_dict(decoded), _reflective_pdu_to_dict(decoded))
+
+    def test_entity_state_record(self):
+        data = self.datagrams[1]
+        self.assertEqual(pdu_to_dict(decode_entity_state(data)), _reflective_pdu_to_dict(PduFactory.createPdu(data)))
@@ -1,20 +1,73 @@
-def pdu_to_dict(pdu_object):
-    """
-    Transforme un objet PDU en dictionnaire Python.
-    Parcourt récursivement les attributs de l'objet.
-    """
-    result = {}
-    for attribute in dir(pdu_object):
-        if not attribute.startswith("_") and not callable(getattr(pdu_object, attribute)):
-            value = getattr(pdu_object, attribute)
-            if isinstance(value, list):
-                # Si c'est une liste, applique la conversion à chaque élément
-                result[attribute] = [pdu_to_dict(item) if hasattr(item, "__dict__") else item for item in value]
-            elif attribute == "marking":
-                result[attribute] = getattr(pdu_object, attribute).charactersString()
-            elif hasattr(value, "__dict__"):
-                # Si c'est un objet complexe, appelle récursivement
-                result[attribute] = pdu_to_dict(value)
-            else:
-                result[attribute] = value
-    return result
\ No newline at end of file
+from .entity_state_decoder import EntityStateRecord
+
+# PDU class -> flat field-access function, compiled on the first instance of each class
+_SERIALIZERS = {EntityStateRecord: EntityStateRecord.to_dict}
+
+def pdu_to_dict(pdu_object):
+    """
+    Transforme un objet PDU en dictionnaire Python.
+    La première instance de chaque classe est parcourue une seule fois pour générer une fonction d'accès
+    aux attributs, mise en cache par classe et réutilisée pour les instances suivantes.
+    """
+    try:
+        serializer = _SERIALIZERS[type(pdu_object)]
+    except KeyError:
+        serializer = _SERIALIZERS[type(pdu_object)] = _compile_serializer(pdu_object)
+    return serializer(pdu_object)
+
+def _compile_serializer(pdu_object):
+    """
+    Generates the serializer of the class of pdu_object.
+    Attributes are classified the same way as _reflective_pdu_to_dict does: the class is assumed to always
+    hold the same kind of value (list, marking, nested object or scalar) in a given attribute.
+
+    Args:
+        pdu_object: an instance of the class to compile
+
+    Returns:
+        a function converting an instance of that class to a dictionary
+    """
+    fields = []
+    for attribute in dir(pdu_object):
+        if attribute.startswith("_") or callable(getattr(pdu_object, attribute)):
+            continue
+        value = getattr(pdu_object, attribute)
+        if isinstance(value, list):
+            fields.append(f"{attribute!r}: _list_to_dict(o.{attribute})")
+        elif attribute == "marking":
+            fields.append(f"{attribute!r}: o.{attribute}.charactersString()")
+        elif hasattr(value, "__dict__"):
+            fields.append(f"{attribute!r}: _pdu_to_dict(o.{attribute})")
+        else:
+            fields.append(f"{attribute!r}: o.{attribute}")
+    source = "def serializer(o):\n    return {" + ", ".join(fields) + "}\n"
+    namespace = {"_list_to_dict": _list_to_dict, "_pdu_to_dict": pdu_to_dict}
+    exec(source, namespace)
+    return namespace["serializer"]
+
+def _list_to_dict(values):
+    # Lists are homogeneous in opendis: only the first element needs to be inspected
+    if not values or not hasattr(values[0], "__dict__"):
+        return list(values)
+    return [pdu_to_dict(item) for item in values]
+
+def _reflective_pdu_to_dict(pdu_object):
+    """
+    Reference implementation of pdu_to_dict, walking the attributes of every object with dir().
+    Kept to check the compiled serializers against it.
+    """
+    result = {}
+    for attribute in dir(pdu_object):
+        if not attribute.startswith("_") and not callable(getattr(pdu_object, attribute)):
+            value = getattr(pdu_object, attribute)
+            if isinstance(value, list):
+                # Si c'est une liste, applique la conversion à chaque élément
+                result[attribute] = [_reflective_pdu_to_dict(item) if hasattr(item, "__dict__") else item for item in value]
+            elif attribute == "marking":
+                result[attribute] = getattr(pdu_object, attribute).charactersString()
+            elif hasattr(value, "__dict__"):
+                # Si c'est un objet complexe, appelle récursivement
+                result[attribute] = _reflective_pdu_to_dict(value)
+            else:
+                result[attribute] = value
+    return result
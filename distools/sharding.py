@@ -0,0 +1,35 @@
+# -*- test-case-name: distools.test.test_sharding -*-
+import zlib
+
+from .pdus.header import PDU_HEADER_SIZE
+
+ENTITY_ID_SIZE = 6 # site, application, entity: 3 unsigned shorts
+
+def entity_shard(data, count):
+    """
+    Shard of the entity a datagram is about, computed from the raw entity ID that follows the PDU header
+    (the entity ID of an EntityStatePdu). The same entity always gets the same shard, in every process.
+
+    Args:
+        data: raw datagram, at least PDU_HEADER_SIZE + ENTITY_ID_SIZE bytes long
+        count: number of shards
+    """
+    return zlib.crc32(data[PDU_HEADER_SIZE:PDU_HEADER_SIZE + ENTITY_ID_SIZE]) % count
+
+class EntitySharding:
+    """
+    Entity ownership of one worker among several workers that all receive the same datagrams
+    (multicast or broadcast): a worker only handles the entities hashed to its index.
+    """
+    def __init__(self, index, count):
+        if not 0 <= index < count:
+            raise ValueError(f"Invalid worker index {index} for {count} workers")
+        self.index = index
+        self.count = count
+        self.foreign = 0 # datagrams left to the other workers
+
+    def owns(self, data):
+        if entity_shard(data, self.count) == self.index:
+            return True
+        self.foreign += 1
+        return False
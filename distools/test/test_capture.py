@@ -0,0 +1,83 @@
+from io import BytesIO
+
+from opendis import PduFactory
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityID, FirePdu
+from twisted.trial import unittest
+
+from distools.capture import MAGIC, CaptureWriter, IdRemapper, parse_id_mapping, read_capture
+from distools.pdus.entity_state_template import EntityStateTemplate
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+def entity_state(site, application, entity):
+    return bytes(EntityStateTemplate(EntityID(site, application, entity), ENTITY_TYPE).pack((1.0, 2.0, 3.0), (4.0, 5.0, 6.0)))
+
+class captureTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = self.mktemp()
+
+    def test_round_trip(self):
+        with CaptureWriter(self.path, buffer_size=200) as writer:
+            writer.write(entity_state(20, 100, 1), ("10.0.0.1", 3000), 1000.0)
+            writer.write(b"short", ("10.0.0.2", 3001), 1000.25)
+        with CaptureWriter(self.path) as writer: # appends
+            writer.write(b"more", ("10.0.0.3", 3002), 1001.0)
+        records = list(read_capture(self.path))
+        self.assertEqual(records, [
+            (1000.0, ("10.0.0.1", 3000), entity_state(20, 100, 1)),
+            (1000.25, ("10.0.0.2", 3001), b"short"),
+            (1001.0, ("10.0.0.3", 3002), b"more"),
+        ])
+
+    def test_writes_are_buffered(self):
+        writer = CaptureWriter(self.path, buffer_size=1000)
+        writer.write(b"x" * 100, ("10.0.0.1", 3000), 1.0)
+        with open(self.path, "rb") as capture:
+            self.assertEqual(capture.read(), MAGIC)
+        writer.close()
+        self.assertEqual(len(list(read_capture(self.path))), 1)
+
+    def test_truncated_record_ends_capture(self):
+        with CaptureWriter(self.path) as writer:
+            writer.write(b"complete", ("10.0.0.1", 3000), 1.0)
+            writer.write(b"truncated", ("10.0.0.1", 3000), 2.0)
+        with open(self.path, "r+b") as capture:
+            capture.truncate(capture.seek(0, 2) - 3)
+        self.assertEqual([data for _, _, data in read_capture(self.path)], [b"complete"])
+
+    def test_not_a_capture(self):
+        with open(self.path, "wb") as capture:
+            capture.write(b"garbage!")
+        self.assertRaises(ValueError, list, read_capture(self.path))
+
+class remapTestCase(unittest.TestCase):
+    def test_parse_id_mapping(self):
+        self.assertEqual(parse_id_mapping("30"), {None: 30})
+        self.assertEqual(parse_id_mapping("20:21, 10:11"), {20: 21, 10: 11})
+
+    def test_entity_state(self):
+        remapper = IdRemapper(exercises={None: 7}, sites={20: 21}, applications={100: 101})
+        pdu = PduFactory.createPdu(bytes(remapper.remap(entity_state(20, 100, 5))))
+        self.assertEqual(pdu.exerciseID, 7)
+        self.assertEqual((pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID), (21, 101, 5))
+        pdu = PduFactory.createPdu(bytes(remapper.remap(entity_state(10, 200, 5))))
+        self.assertEqual((pdu.entityID.siteID, pdu.entityID.applicationID), (10, 200))
+
+    def test_fire(self):
+        pdu = FirePdu()
+        pdu.pduStatus = 0
+        pdu.pduType = 2 # not set by opendis
+        pdu.exerciseID = 1
+        pdu.firingEntityID = EntityID(20, 100, 1)
+        pdu.targetEntityID = EntityID(10, 100, 2)
+        pdu.munitionExpendableID = EntityID(20, 100, 3)
+        pdu.eventID.simulationAddress.site = 20
+        pdu.eventID.simulationAddress.application = 100
+        memoryStream = BytesIO()
+        pdu.serialize(DataOutputStream(memoryStream))
+        remapped = PduFactory.createPdu(bytes(IdRemapper(sites={None: 30}).remap(memoryStream.getvalue())))
+        self.assertEqual([remapped.firingEntityID.siteID, remapped.targetEntityID.siteID, remapped.munitionExpendableID.siteID,
+                          remapped.eventID.simulationAddress.site], [30, 30, 30, 30])
+        self.assertEqual(remapped.targetEntityID.entityID, 2)
+        self.assertEqual(remapped.exerciseID, 1)
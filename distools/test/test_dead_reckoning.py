@@ -0,0 +1,83 @@
+import math
+
+from twisted.internet import task
+from twisted.trial import unittest
+from opendis.dis7 import EntityStatePdu, EntityID, Vector3Double, Vector3Float, EulerAngles
+
+from distools.dead_reckoning import DeadReckoningFilter, extrapolate_position, extrapolate_orientation, euler_to_matrix, orientation_error
+
+def entity_state(location, velocity=(0, 0, 0), psi=0.0, algorithm=2, angular_velocity=(0, 0, 0), appearance=0):
+    pdu = EntityStatePdu()
+    pdu.entityID = EntityID(1, 2, 3)
+    pdu.entityLocation = Vector3Double(*location)
+    pdu.entityLinearVelocity = Vector3Float(*velocity)
+    pdu.entityOrientation = EulerAngles(psi, 0.0, 0.0)
+    pdu.entityAppearance = appearance
+    pdu.deadReckoningParameters.deadReckoningAlgorithm = algorithm
+    pdu.deadReckoningParameters.entityAngularVelocity = Vector3Float(*angular_velocity)
+    return pdu
+
+class extrapolationTestCase(unittest.TestCase):
+    def test_static(self):
+        self.assertEqual(extrapolate_position(1, (1, 2, 3), (10, 0, 0), (1, 0, 0), 5), (1, 2, 3))
+
+    def test_constant_velocity(self):
+        self.assertEqual(extrapolate_position(2, (1, 2, 3), (10, 0, -1), (1, 0, 0), 2), (21, 2, 1))
+
+    def test_accelerated(self):
+        self.assertEqual(extrapolate_position(4, (0, 0, 0), (10, 0, 0), (2, 0, 0), 2), (24, 0, 0))
+
+    def test_rotating_orientation(self):
+        # Yaw rate of 0.1 rad/s during 2 s from a level attitude
+        predicted = extrapolate_orientation(3, (0.0, 0.0, 0.0), (0.0, 0.0, 0.1), 2.0)
+        self.assertAlmostEqual(orientation_error(predicted, euler_to_matrix(0.2, 0.0, 0.0)), 0.0, places=6)
+
+    def test_fixed_orientation(self):
+        predicted = extrapolate_orientation(2, (0.5, 0.0, 0.0), (0.0, 0.0, 0.1), 2.0)
+        self.assertAlmostEqual(orientation_error(predicted, euler_to_matrix(0.5, 0.0, 0.0)), 0.0, places=6)
+
+class deadReckoningFilterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.filter = DeadReckoningFilter(position_threshold=1.0, orientation_threshold=math.radians(3.0), heartbeat=5.0, clock=self.clock)
+        self.assertTrue(self.filter.should_forward(entity_state((6378137.0, 0, 0), velocity=(0, 100, 0))))
+
+    def test_predicted_update_suppressed(self):
+        self.clock.advance(1.0)
+        self.assertFalse(self.filter.should_forward(entity_state((6378137.0, 100.5, 0), velocity=(0, 100, 0))))
+        self.assertEqual(self.filter.suppressed, 1)
+
+    def test_position_divergence_forwarded(self):
+        self.clock.advance(1.0)
+        self.assertTrue(self.filter.should_forward(entity_state((6378137.0, 102, 0), velocity=(0, 100, 0))))
+
+    def test_orientation_divergence_forwarded(self):
+        self.clock.advance(1.0)
+        self.assertTrue(self.filter.should_forward(entity_state((6378137.0, 100, 0), velocity=(0, 100, 0), psi=math.radians(5))))
+
+    def test_heartbeat(self):
+        for _ in range(4):
+            self.clock.advance(1.0)
+            self.assertFalse(self.filter.should_forward(entity_state((6378137.0, 100 * self.clock.seconds(), 0), velocity=(0, 100, 0))))
+        self.clock.advance(1.0)
+        self.assertTrue(self.filter.should_forward(entity_state((6378137.0, 500, 0), velocity=(0, 100, 0))))
+
+    def test_appearance_change_forwarded(self):
+        self.clock.advance(0.5)
+        self.assertTrue(self.filter.should_forward(entity_state((6378137.0, 50, 0), velocity=(0, 100, 0), appearance=1)))
+
+    def test_stale_entities_evicted(self):
+        other = entity_state((6378137.0, 0, 0), velocity=(0, 100, 0))
+        other.entityID = EntityID(1, 2, 4)
+        self.clock.advance(10.0)
+        self.assertTrue(self.filter.should_forward(other))
+        self.assertEqual(list(self.filter.forwarded_states), [(1, 2, 3), (1, 2, 4)])
+        self.clock.advance(5.5) # 3 heartbeats since (1, 2, 3) was forwarded
+        self.assertTrue(self.filter.should_forward(other))
+        self.assertEqual(list(self.filter.forwarded_states), [(1, 2, 4)])
+        self.assertEqual(self.filter.evicted, 1)
+
+    def test_entities_tracked_separately(self):
+        other = entity_state((6378137.0, 0, 0), velocity=(0, 100, 0))
+        other.entityID = EntityID(1, 2, 4)
+        self.assertTrue(self.filter.should_forward(other))
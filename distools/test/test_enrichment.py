@@ -0,0 +1,104 @@
+from concurrent.futures import Future
+
+from opendis.dis7 import EntityID
+from twisted.internet import reactor, task
+from twisted.internet.defer import CancelledError, Deferred, ensureDeferred, gatherResults
+from twisted.trial import unittest
+
+from distools import enrichment
+from distools.dis_communicator import DISCommunicator
+from distools.enrichment import PROCESS, THREAD, EnrichmentExecutor, enrich, enrich_datagrams, enrich_records
+from distools.pdus.entity_state_decoder import decode_entity_state
+from distools.pdus.entity_state_template import EntityStateTemplate
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+def entity_state(entity):
+    return bytes(EntityStateTemplate(EntityID(20, 100, entity), ENTITY_TYPE).pack((4596224.0, 483088.0, 4370446.0), (-120.5, 210.25, 80.0)))
+
+def record(entity):
+    return decode_entity_state(entity_state(entity))
+
+class enrichTestCase(unittest.TestCase):
+    def test_enrich_records_matches_enrich(self):
+        results = enrich_records([record(1), None])
+        self.assertEqual(results[0], enrich(record(1)))
+        self.assertIsInstance(results[1], Exception)
+
+    def test_enrich_datagrams_matches_enrich(self):
+        results = enrich_datagrams([entity_state(1), b"\x07\x01"])
+        self.assertEqual(results[0], enrich(record(1)))
+        self.assertIsInstance(results[1], Exception)
+
+    def test_untimed(self):
+        stage = enrichment.pdu_to_dict_stage
+        calls = stage.calls
+        enrich_records([record(1)])
+        self.assertEqual(stage.calls, calls)
+        enrich(record(1))
+        self.assertEqual(stage.calls, calls + 1)
+
+class executorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+
+    def test_batches_per_turn_and_in_order(self):
+        executor = EnrichmentExecutor(THREAD, batch_size=2, clock=self.clock)
+        sent = []
+
+        def defer_to_thread_pool(clock, pool, function, records):
+            done = Deferred()
+            sent.append((records, done))
+            return done
+        self.patch(enrichment, "deferToThreadPool", defer_to_thread_pool)
+        results = []
+        for entity in range(3):
+            executor.submit(record(entity), entity_state(entity)).addCallback(results.append)
+        self.assertEqual([len(records) for records, _ in sent], [2]) # full batch sent at once
+        self.clock.advance(0)
+        self.assertEqual([len(records) for records, _ in sent], [2, 1]) # the rest at the end of the turn
+        sent[1][1].callback(enrich_records(sent[1][0]))
+        self.assertEqual(results, []) # waits for the older batch
+        sent[0][1].callback(enrich_records(sent[0][0]))
+        self.assertEqual([pdu["entityID"]["entityID"] for pdu in results], [0, 1, 2])
+        self.assertEqual(executor.pending, 0)
+
+    def test_thread_pool(self):
+        executor = EnrichmentExecutor(THREAD, workers=2, batch_size=4, clock=reactor)
+        executor.start()
+        self.addCleanup(executor.stop)
+        d = gatherResults([executor.submit(record(entity), entity_state(entity)) for entity in range(10)])
+        d.addCallback(lambda results: self.assertEqual([pdu["entityID"]["entityID"] for pdu in results], list(range(10))))
+        return d
+
+    def test_process_pool(self):
+        executor = EnrichmentExecutor(PROCESS, workers=1, batch_size=4, clock=reactor)
+        executor.start()
+        self.addCleanup(executor.stop)
+        d = gatherResults([executor.submit(record(entity), entity_state(entity)) for entity in range(6)])
+        d.addCallback(lambda results: self.assertEqual(results[5], enrich(record(5))))
+        return d
+
+    def test_communicator_posts_enriched_payload(self):
+        posted = []
+
+        class Poster:
+            async def post_to_api(self, pdu_json, is_ack):
+                posted.append(pdu_json)
+        executor = EnrichmentExecutor(THREAD, workers=1, clock=reactor)
+        executor.start()
+        self.addCleanup(executor.stop)
+        communicator = DISCommunicator(Poster(), {"ip": "127.0.0.1", "port": 3000, "mode": 0}, {"ip": "127.0.0.1", "port": 3001, "mode": 0}, 1,
+                                       enrichment=executor)
+        data = entity_state(7)
+        d = ensureDeferred(communicator.handle_pdu(data, ("127.0.0.1", 3000)))
+        d.addCallback(lambda _: self.assertEqual(posted, [enrich(decode_entity_state(data))]))
+        return d
+
+    def test_cancelled_future(self):
+        executor = EnrichmentExecutor(PROCESS, clock=self.clock)
+        future = Future()
+        future.cancel()
+        done = Deferred()
+        executor.future_done(future, done)
+        self.failureResultOf(done, CancelledError)
@@ -0,0 +1,60 @@
+from twisted.internet.defer import Deferred
+from twisted.trial import unittest
+
+from distools.ingest_queue import IngestQueue, DROP_NEWEST, DROP_OLDEST
+
+class ingestQueueTestCase(unittest.TestCase):
+    def queue(self, policy, consumers=1, capacity=3):
+        self.handled = []
+        self.blocked = []
+
+        def handler(item):
+            self.handled.append(item)
+            d = Deferred()
+            self.blocked.append(d)
+            return d
+        return IngestQueue(handler, capacity=capacity, consumers=consumers, overflow_policy=policy)
+
+    def release_all(self):
+        while self.blocked:
+            self.blocked.pop(0).callback(None)
+
+    def test_fifo(self):
+        queue = self.queue(DROP_NEWEST)
+        for i in range(4):
+            queue.put(i)
+        self.assertEqual(self.handled, [0])
+        self.release_all()
+        self.assertEqual(self.handled, [0, 1, 2, 3])
+        self.assertEqual(queue.stats()["processed"], 4)
+        self.assertEqual(queue.stats()["high_water"], 3)
+
+    def test_drop_newest(self):
+        queue = self.queue(DROP_NEWEST)
+        results = [queue.put(i) for i in range(6)]
+        self.assertEqual(results, [True, True, True, True, False, False])
+        self.release_all()
+        self.assertEqual(self.handled, [0, 1, 2, 3])
+        self.assertEqual(queue.shed, 2)
+
+    def test_drop_oldest(self):
+        queue = self.queue(DROP_OLDEST)
+        for i in range(6):
+            queue.put(i)
+        self.release_all()
+        self.assertEqual(self.handled, [0, 3, 4, 5])
+        self.assertEqual(queue.shed, 2)
+
+    def test_zero_capacity(self):
+        for policy in (DROP_NEWEST, DROP_OLDEST):
+            queue = self.queue(policy, capacity=0)
+            self.assertTrue(queue.put("busy"))
+            self.assertFalse(queue.put("shed"))
+            self.assertEqual(queue.shed, 1)
+
+    def test_consumers(self):
+        queue = self.queue(DROP_NEWEST, consumers=2)
+        for i in range(3):
+            queue.put(i)
+        self.assertEqual(self.handled, [0, 1])
+        self.assertEqual(queue.stats()["size"], 1)
@@ -0,0 +1,80 @@
+import socket
+
+from twisted.internet import task
+from twisted.trial import unittest
+
+from distools.outbound_buffer import OutboundBuffer, _sendmmsg
+
+class FakeTransport:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data, addr):
+        self.written.append((data, addr))
+
+class SocketTransport(FakeTransport):
+    def __init__(self, sock):
+        super().__init__()
+        self.socket = sock
+
+    def fileno(self):
+        return self.socket.fileno()
+
+class outboundBufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+
+    def test_flush_at_end_of_turn(self):
+        transport = FakeTransport()
+        buffer = OutboundBuffer(transport, clock=self.clock)
+        datagram = bytearray(b"first")
+        buffer.write(datagram, ("127.0.0.1", 3001))
+        datagram[:] = b"reuse" # the caller may reuse its buffer
+        buffer.write(b"second", ("127.0.0.1", 3001))
+        self.assertEqual(transport.written, [])
+        self.clock.advance(0)
+        self.assertEqual(transport.written, [(b"first", ("127.0.0.1", 3001)), (b"second", ("127.0.0.1", 3001))])
+        stats = buffer.stats()
+        self.assertEqual((stats["flushes"], stats["pdus_sent"], stats["bytes_sent"]), (1, 2, 11))
+        self.assertEqual((stats["last_flush_pdus"], stats["last_flush_bytes"]), (2, 11))
+
+    def test_one_flush_per_turn(self):
+        transport = FakeTransport()
+        buffer = OutboundBuffer(transport, clock=self.clock)
+        for turn in range(3):
+            for i in range(turn + 1):
+                buffer.write(b"x" * 10, ("127.0.0.1", 3001))
+            self.clock.advance(0)
+        self.assertEqual(buffer.flushes, 3)
+        self.assertEqual(buffer.pdus_sent, 6)
+        self.assertEqual(buffer.max_flush_pdus, 3)
+
+    def test_loop_without_socket(self):
+        transport = FakeTransport()
+        buffer = OutboundBuffer(transport, clock=self.clock, use_sendmmsg=True)
+        buffer.write(b"a", ("127.0.0.1", 3001))
+        buffer.flush()
+        self.assertEqual(transport.written, [(b"a", ("127.0.0.1", 3001))])
+        self.assertEqual(buffer.syscalls, 1)
+
+    def test_sendmmsg(self):
+        if _sendmmsg is None:
+            raise unittest.SkipTest("sendmmsg is not available on this platform")
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        self.addCleanup(sender.close)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1.0)
+        addr = receiver.getsockname()
+
+        transport = SocketTransport(sender)
+        buffer = OutboundBuffer(transport, clock=self.clock)
+        datagrams = [bytes([i]) * (i + 1) for i in range(20)]
+        for datagram in datagrams:
+            buffer.write(datagram, addr)
+        self.clock.advance(0)
+        self.assertEqual(transport.written, [])
+        self.assertEqual([receiver.recv(100) for _ in datagrams], datagrams)
+        self.assertEqual(buffer.syscalls, 1)
+        self.assertEqual(buffer.pdus_sent, 20)
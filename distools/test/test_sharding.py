@@ -0,0 +1,43 @@
+from collections import Counter
+
+from opendis.dis7 import EntityID
+from twisted.trial import unittest
+
+from distools.dis_communicator import DISCommunicator
+from distools.pdus.entity_state_template import EntityStateTemplate
+from distools.sharding import EntitySharding, entity_shard
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+def entity_state(site, application, entity, x=0.0):
+    return bytes(EntityStateTemplate(EntityID(site, application, entity), ENTITY_TYPE).pack((x, 0.0, 0.0), (0.0, 0.0, 0.0)))
+
+class shardingTestCase(unittest.TestCase):
+    def test_same_entity_same_shard(self):
+        self.assertEqual(entity_shard(entity_state(20, 100, 7, x=1.0), 4), entity_shard(entity_state(20, 100, 7, x=2.0), 4))
+
+    def test_each_entity_has_one_owner(self):
+        workers = [EntitySharding(index, 3) for index in range(3)]
+        owners = Counter()
+        for entity in range(300):
+            data = entity_state(20, 100 + entity % 3, entity)
+            owned = [worker.index for worker in workers if worker.owns(data)]
+            self.assertEqual(len(owned), 1)
+            owners[owned[0]] += 1
+        self.assertEqual(sorted(owners), [0, 1, 2])
+        self.assertTrue(all(count > 60 for count in owners.values()))
+        self.assertEqual(sum(worker.foreign for worker in workers), 600)
+
+    def test_invalid_index(self):
+        self.assertRaises(ValueError, EntitySharding, 2, 2)
+
+    def test_communicator_drops_foreign_entities(self):
+        data = entity_state(20, 100, 7)
+        owner = entity_shard(data, 2)
+        queued = []
+        for index in range(2):
+            communicator = DISCommunicator(None, {"ip": "127.0.0.1", "port": 3000, "mode": 0}, {"ip": "127.0.0.1", "port": 3001, "mode": 0}, 1,
+                                           sharding=EntitySharding(index, 2))
+            communicator.ingest_queue.put = lambda item, index=index: queued.append(index)
+            communicator.datagramReceived(data, ("127.0.0.1", 3000))
+        self.assertEqual(queued, [owner])
@@ -0,0 +1,62 @@
+from twisted.internet.defer import ensureDeferred
+
+def entity_key(json_payload):
+    """
+    Gets the (site, application, entity) key of a forwarded EntityStatePdu payload.
+
+    Args:
+        json_payload: PDU converted to a dictionary by pdu_to_dict
+
+    Returns:
+        a (siteID, applicationID, entityID) tuple
+    """
+    EID = json_payload["entityID"]
+    return (EID["siteID"], EID["applicationID"], EID["entityID"])
+
+class EntityStateConflator:
+    """
+    Sits between DISCommunicator and HttpPoster and keeps only the most recent pending state of each entity.
+    A newer update replaces the older unsent one in place, so memory scales with the number of entities
+    and no backlog builds up behind a slow endpoint.
+    It exposes the same post_to_api() interface as HttpPoster.
+    """
+    def __init__(self, http_poster, max_in_flight=4):
+        self.http_poster = http_poster
+        self.max_in_flight = max_in_flight
+        self.pending = {} # entity key -> latest unsent payload, in order of first arrival
+        self.in_flight = 0
+        self.conflated = 0 # updates replaced by a newer one before being sent
+
+    async def post_to_api(self, json_payload, is_ack):
+        """
+        Queues a PDU payload for forwarding, replacing the pending one of the same entity if any.
+        Acks are passed straight to the HttpPoster.
+
+        Args:
+            json_payload: the data to post
+            is_ack: whether the data to post is an engagement ack or not
+
+        Returns:
+            for an ack, whether the API accepted it
+        """
+        if is_ack:
+            return await self.http_poster.post_to_api(json_payload, is_ack=True)
+        key = entity_key(json_payload)
+        if key in self.pending:
+            self.conflated += 1
+        self.pending[key] = json_payload
+        if self.in_flight < self.max_in_flight:
+            ensureDeferred(self.drain())
+
+    async def drain(self):
+        """
+        Forwards pending states, oldest entity first, until none is left.
+        """
+        self.in_flight += 1
+        try:
+            while self.pending:
+                key = next(iter(self.pending))
+                json_payload = self.pending.pop(key)
+                await self.http_poster.post_to_api(json_payload, is_ack=False)
+        finally:
+            self.in_flight -= 1
@@ -1,14 +1,89 @@
 
+# -*- test-case-name: httptools.test.test_http_poller -*-
+import json
+import time
+
 from twisted.internet import reactor, task
 from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.protocol import Protocol
 from twisted.web import http
 
 from simtools.objects import Missile
+from simtools.scheduler import SimulationScheduler
 from opendis.dis7 import EntityID
 from twisted.internet.defer import ensureDeferred
+from logtools.logger import get_logger
+from admintools.metrics import Histogram
+from .sse import EventStreamParser
+
+log = get_logger("http.poll")
+
+# How engagements are received
+POLL = "poll"           # a GET every interval
+LONG_POLL = "long_poll" # a GET held by the server until engagements are available, issued again at once
+SSE = "sse"             # a Server-Sent Events stream, one event per engagement or list of engagements
+INTAKE_MODES = (POLL, LONG_POLL, SSE)
+
+# Responses telling that the endpoint does not stream (or not at the moment, e.g. during a deployment):
+# the poller falls back to polling for the longest backoff before trying again
+UNSUPPORTED_STREAM_CODES = (http.NOT_FOUND, http.NOT_ALLOWED, http.NOT_ACCEPTABLE, http.NOT_IMPLEMENTED)
+
+class StreamUnsupported(Exception):
+    pass
+
+class StreamReader(Protocol):
+    """
+    Hands the chunks of a streamed response body to a callback as they arrive. The connection is
+    aborted when nothing, not even a keep-alive comment, was received for idle_timeout seconds.
+    """
+    def __init__(self, chunk_received, idle_timeout, clock):
+        self.chunk_received = chunk_received
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.done = Deferred() # failed with the reason the stream ended, ResponseDone included
+        self.idle_call = None
+
+    def connectionMade(self):
+        self.reset_idle_timer()
+
+    def reset_idle_timer(self):
+        if not self.idle_timeout:
+            return
+        if self.idle_call is not None and self.idle_call.active():
+            self.idle_call.reset(self.idle_timeout)
+        else:
+            self.idle_call = self.clock.callLater(self.idle_timeout, self.idle)
+
+    def idle(self):
+        log.warning("No data on the engagement stream for %s s, reconnecting", self.idle_timeout)
+        self.transport.stopProducing()
+
+    def dataReceived(self, data):
+        self.reset_idle_timer()
+        self.chunk_received(data)
+
+    def connectionLost(self, reason):
+        if self.idle_call is not None and self.idle_call.active():
+            self.idle_call.cancel()
+        self.done.errback(reason)
 
 class HttpPoller:
-    def __init__(self, endpoint, token, interval, emitter, http_poster, ack_endpoint, is_debug_on, http_client):
+    """
+    Receives the engagements from the API and creates their missiles.
+
+    In POLL mode the endpoint is requested every interval, conditionally once all the engagements of a
+    response with an ETag were acknowledged, so that an unchanged list of engagements costs a 304 and no
+    parsing. In LONG_POLL and SSE modes, engagements are handled as soon as the server sends them. When
+    the stream fails, it is opened again after an exponential backoff, during which the endpoint is polled
+    every interval; an endpoint answering that it does not stream is retried after backoff_max. As a stream
+    resumes after the last event received, the acknowledgements that failed on its events are retried every
+    interval instead.
+
+    Args:
+        intake: {"mode", "endpoint", "wait", "backoff_initial", "backoff_max", "idle_timeout"}, None = POLL
+    """
+    def __init__(self, endpoint, token, interval, emitter, http_poster, ack_endpoint, is_debug_on, http_client, scheduler=None, emission_policy=None, intake=None, clock=reactor):
         self.endpoint = endpoint
         self.token = token
         self.interval = interval
@@ -16,22 +91,202 @@ class HttpPoller:
         self.http_poster = http_poster
         self.ack_endpoint = ack_endpoint
         self.is_debug_on = is_debug_on
-        self.created_missiles = dict()
         self.http_client = http_client
+        self.scheduler = scheduler if scheduler is not None else SimulationScheduler() # advances the created missiles
+        self.emission_policy = emission_policy # shared by the created missiles, None = emit on every update
+        self.poll_duration = Histogram() # whole polls, failed ones and acknowledgements included
+        self.fetch_duration = Histogram() # GET of the engagements only
+        intake = intake or {}
+        self.mode = intake.get("mode", POLL)
+        if self.mode not in INTAKE_MODES:
+            raise ValueError(f"Invalid intake mode: '{self.mode}'. Expected one of {', '.join(INTAKE_MODES)}.")
+        self.stream_endpoint = intake.get("endpoint") or endpoint
+        self.wait = intake.get("wait", 30.0) # seconds a long poll may be held by the server
+        self.backoff_initial = intake.get("backoff_initial", 1.0)
+        self.backoff_max = intake.get("backoff_max", 60.0)
+        self.idle_timeout = intake.get("idle_timeout", 60.0)
+        self.clock = clock
+        self.etag = None # of the last engagements received and all acknowledged, sent in If-None-Match
+        self.received_etag = None # of the last response, until its engagements are acknowledged
+        self.server_retry = None # reconnection delay requested by the SSE stream, in place of backoff_initial
+        self.last_event_id = None
+        self.unacknowledged = set() # ids of the engagements whose last acknowledgement failed
+        self.ack_retry = None # DelayedCall of retry_acks()
+        self.failures = 0 # consecutive stream failures
+        self.not_modified = 0
+        self.reconnects = 0
 
     async def run(self):
         """
         Runs the HTTP poller loop.
         Fetches data from the configured HTTP endpoint and process the engagements, with a configured interval between each. 
+        In streaming modes, holds the stream open instead and polls only while it is down.
+        """
+        if self.mode == POLL or self.is_debug_on:
+            await self.poll_loop()
+        else:
+            await self.stream_loop()
+
+    async def poll_loop(self, until=None):
+        """
+        Polls every interval, until the given clock time if any.
         """
+        while True:
+            await self.poll()
+            delay = self.interval if until is None else min(self.interval, until - self.clock.seconds())
+            if delay <= 0:
+                return
+            await task.deferLater(self.clock, delay, lambda: None)
+            if until is not None and self.clock.seconds() >= until:
+                return
+
+    async def poll(self):
+        start = time.perf_counter()
+        try:
+            log.info("=============================================================")
+            data = await self.fetch_data()
+            self.fetch_duration.observe(time.perf_counter() - start)
+            await self.handle_engagements(data)
+        except Exception as e:
+            self.etag = None
+            log.error("%s", e, extra={"tag": "HTTP POLL ERROR"})
+        finally:
+            self.poll_duration.observe(time.perf_counter() - start)
+
+    async def stream_loop(self):
+        connect = self.long_poll if self.mode == LONG_POLL else self.stream
         while True:
             try:
-                print("=============================================================")
-                data = await self.fetch_data()
-                await self.process_engagements(data)
+                await connect()
+                self.failures = 0
+                continue # long poll answered, issue the next one
+            except StreamUnsupported as e:
+                delay = self.backoff_max
+                log.warning("%s, polling every %s s until retrying in %s s", e, self.interval, delay)
             except Exception as e:
-                print(f"[HTTP POLL ERROR] {e}")
-            await task.deferLater(reactor, self.interval, lambda: None)
+                self.etag = None
+                self.failures += 1
+                initial = self.server_retry if self.server_retry is not None else self.backoff_initial
+                delay = min(self.backoff_max, initial * 2 ** (self.failures - 1))
+                log.error("Engagement stream failed: %s. Polling until reconnecting in %s s", str(e) or type(e).__name__, delay, extra={"tag": "HTTP POLL ERROR"})
+            await self.poll_loop(until=self.clock.seconds() + delay)
+            self.reconnects += 1
+
+    def request_headers(self):
+        return {
+            "User-Agent" : [ f"Mozilla/5.0 (platform; rv:gecko-version) Gecko/gecko-trail Firefox/firefox-version"],
+            "Authorization": f"Bearer {self.token}"
+        }
+
+    async def read_engagements(self, response, endpoint):
+        """
+        Returns:
+            the engagements of a response, or an empty list if they did not change
+        """
+        if response.code in (http.NOT_MODIFIED, http.NO_CONTENT):
+            await response.content()
+            self.received_etag = self.etag if response.code == http.NOT_MODIFIED else None
+            self.not_modified += response.code == http.NOT_MODIFIED
+            log.info("No new engagement from %s", endpoint)
+            return []
+        if response.code == http.OK:
+            log.info("Polled engagement from %s", endpoint)
+            etag = response.headers.getRawHeaders("ETag")
+            self.received_etag = etag[0] if etag else None
+            return await response.json()
+        self.etag = None
+        await response.content() # read the body so that the connection goes back to the pool
+        # message = await response.text() # full error
+        # raise Exception(f"Got an error from the server: {message}")
+        raise Exception(f"Got an error from the server: {response.code}")
+
+    async def handle_engagements(self, data):
+        """
+        Processes the engagements of a response. Its ETag is only sent in the next If-None-Match once every
+        engagement was acknowledged, so that a failed ack gets the engagements again, to acknowledge them again.
+        """
+        self.etag = None
+        acknowledged = await self.process_engagements(data)
+        if acknowledged:
+            self.etag = self.received_etag
+        return acknowledged
+
+    async def long_poll(self):
+        """
+        Issues one long poll, which the server holds for up to wait seconds, and processes its engagements.
+        Long polls are at least interval apart, whatever the answer, so that a server ignoring the wait
+        preference is polled at the same rate as in POLL mode.
+        """
+        headers = self.request_headers()
+        headers["Prefer"] = [f"wait={self.wait:g}"]
+        if self.etag is not None:
+            headers["If-None-Match"] = [self.etag]
+        start = self.clock.seconds()
+        response = await self.http_client.get(self.stream_endpoint, headers=headers, timeout=self.wait + self.interval)
+        if response.code in UNSUPPORTED_STREAM_CODES:
+            await response.content()
+            raise StreamUnsupported(f"{self.stream_endpoint} does not support long polling ({response.code})")
+        data = await self.read_engagements(response, self.stream_endpoint)
+        await self.handle_engagements(data)
+        elapsed = self.clock.seconds() - start
+        if elapsed < self.interval:
+            await task.deferLater(self.clock, self.interval - elapsed, lambda: None)
+
+    async def stream(self):
+        """
+        Opens the Server-Sent Events stream and processes the engagements of each event until it ends.
+        """
+        headers = self.request_headers()
+        headers["Accept"] = ["text/event-stream"]
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = [self.last_event_id]
+        response = await self.http_client.get(self.stream_endpoint, headers=headers, unbuffered=True)
+        content_type = (response.headers.getRawHeaders("Content-Type") or [""])[0]
+        if response.code in UNSUPPORTED_STREAM_CODES or (response.code == http.OK and not content_type.startswith("text/event-stream")):
+            await response.content()
+            raise StreamUnsupported(f"{self.stream_endpoint} does not stream events ({response.code} {content_type})")
+        if response.code != http.OK:
+            await response.content()
+            raise Exception(f"Got an error from the server: {response.code}")
+        log.info("Engagement stream open on %s", self.stream_endpoint)
+        self.failures = 0
+        parser = EventStreamParser()
+        reader = StreamReader(lambda chunk: self.events_received(parser.feed(chunk)), self.idle_timeout, self.clock)
+        response.deliverBody(reader)
+        try:
+            await reader.done # raises once the stream ends, which makes stream_loop() reconnect
+        finally:
+            if parser.retry is not None:
+                self.server_retry = parser.retry
+
+    def events_received(self, events):
+        for event in events:
+            self.last_event_id = event.id
+            if event.type not in ("message", "engagement"):
+                continue
+            try:
+                data = json.loads(event.data)
+            except ValueError as e:
+                log.error("Invalid engagement event: %s", e, extra={"tag": "HTTP POLL ERROR"})
+                continue
+            d = ensureDeferred(self.process_engagements(data if isinstance(data, list) else [data]))
+            d.addCallback(lambda acknowledged: acknowledged or self.schedule_ack_retry())
+            d.addErrback(lambda failure: log.error("%s", failure.getErrorMessage(), extra={"tag": "HTTP POLL ERROR"}))
+
+    def schedule_ack_retry(self):
+        if self.ack_retry is None and self.unacknowledged:
+            self.ack_retry = self.clock.callLater(self.interval, lambda: ensureDeferred(self.retry_acks()))
+
+    async def retry_acks(self):
+        """
+        Acknowledges again the engagements whose acknowledgement failed, until every one succeeds.
+        """
+        self.ack_retry = None
+        for engagement_id in list(self.unacknowledged):
+            log.info("Acknowledging engagement ID=%s again", engagement_id)
+            if await self.http_poster.post_to_api({"engagement" : engagement_id}, is_ack=True):
+                self.unacknowledged.discard(engagement_id)
+        self.schedule_ack_retry()
 
     async def fetch_data(self):
         """
@@ -65,17 +320,11 @@ class HttpPoller:
                 "weapon_flight_time": 125.78616352201257 # Maximum flight time
             }]
         else:
-            response = await self.http_client.get(self.endpoint, headers={
-                "User-Agent" : [ f"Mozilla/5.0 (platform; rv:gecko-version) Gecko/gecko-trail Firefox/firefox-version"],
-                "Authorization": f"Bearer {self.token}"
-            })
-            if response.code == http.OK:
-                print(f"[HTTP POLL] Polled engagement from {self.endpoint}")
-                return await response.json()
-            else:
-                # message = await response.text() # full error
-                # raise Exception(f"Got an error from the server: {message}")
-                raise Exception(f"Got an error from the server: {response.code}")
+            headers = self.request_headers()
+            if self.etag is not None:
+                headers["If-None-Match"] = [self.etag] # unchanged engagements cost a 304 without body
+            response = await self.http_client.get(self.endpoint, headers=headers)
+            return await self.read_engagements(response, self.endpoint)
 
     async def create_missiles(self, enga):
         """
@@ -89,7 +338,7 @@ class HttpPoller:
         
         for i, entity_number in enumerate(enga["EN"]):
             entity_id = (self.emitter.get_RemoteDISSite(), enga["AN"], entity_number)
-            if entity_id not in self.created_missiles:
+            if entity_id not in self.scheduler:
                 missile = Missile(
                     EntityID(self.emitter.get_RemoteDISSite(), enga["AN"], entity_number),
                     entity_type,
@@ -103,32 +352,35 @@ class HttpPoller:
                     enga["weapon_flight_time"],
                     enga["STN"],
                     enga['target_latitude'],
-                    enga['target_longitude']
+                    enga['target_longitude'],
+                    self.emission_policy
                 )
                 if missile.is_out_of_range is True:
-                    print("[HTTP POLL] Received engagement missile (ID={0}, EN={1}) is out of range already. Acknowleding it without sending a DIS EntityStatePDU.".format(enga["id"], entity_number))
+                    log.info("Received engagement missile (ID=%s, EN=%s) is out of range already. Acknowleding it without sending a DIS EntityStatePDU.", enga["id"], entity_number)
                 else:
-                    self.created_missiles[entity_id] = missile
-                    loop = task.LoopingCall(missile.update)
-                    missile.setLoop(loop)
-                    loop.start(5.0)
-                await task.deferLater(reactor, 1.0, lambda: None)
+                    self.scheduler.add(entity_id, missile)
+                await task.deferLater(self.clock, 1.0, lambda: None)
 
     async def process_engagements(self, data):
         """
-        Processes engagements by creating missiles, acknowleding the engagement and handling missile lifecycle
+        Processes engagements by creating missiles and acknowleding the engagement.
+        The missile lifecycle is handled by the simulation scheduler.
         
         Args:
             data: a list of JSON dictionnaries of one or more engagements
+
+        Returns:
+            True if every valid engagement was acknowledged
         """
-        self.created_missiles = { # Remove missiles that reached their max range
-            entity_id: missile
-            for entity_id, missile in self.created_missiles.items()
-            if not missile.is_out_of_range
-        }
+        acknowledged = True
         for enga in data:
             if all(k in enga for k in ("latitude", "longitude", "course", "speed")):
-                print(f"[HTTP POLL] Valid engagement data received.")
+                log.info("Valid engagement data received.")
                 ensureDeferred(self.create_missiles(enga))
-                print("[HTTP POLL] Acknowledging engagement ID={0}".format(enga["id"]))
-                await self.http_poster.post_to_api({"engagement" : enga["id"]}, is_ack=True)
\ No newline at end of file
+                log.info("Acknowledging engagement ID=%s", enga["id"])
+                if await self.http_poster.post_to_api({"engagement" : enga["id"]}, is_ack=True):
+                    self.unacknowledged.discard(enga["id"])
+                else:
+                    self.unacknowledged.add(enga["id"])
+                    acknowledged = False
+        return acknowledged
\ No newline at end of file
@@ -1,29 +1,159 @@
+from collections import deque
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, ensureDeferred
+
+from logtools.logger import get_logger
+from admintools.metrics import Histogram
+from admintools.profiler import timings
+
+log = get_logger("http.info")
+
+request_stage = timings.stage("http.request")
+
+# What to do with a forwarded PDU (or batch) when the in-flight window is full
+WAIT = "wait"                # wait for a free slot
+DROP_OLDEST = "drop_oldest"  # queue it, dropping the oldest queued one when max_pending is reached
+IN_FLIGHT_POLICIES = (WAIT, DROP_OLDEST)
+
 class HttpPoster:
-    def __init__(self, http_client, endpoint_receiver, ack_endpoint, http_token):
+    def __init__(self, http_client, endpoint_receiver, ack_endpoint, http_token, batch_size=0, batch_max_age=0.05, clock=reactor,
+                 max_in_flight=0, in_flight_policy=WAIT, max_pending=1000):
         self.http_client = http_client
         self.endpoint_receiver = endpoint_receiver
         self.ack_endpoint = ack_endpoint
         self.http_token = http_token
+        self.headers = {
+            "User-Agent" : [ f"Mozilla/5.0 (platform; rv:gecko-version) Gecko/gecko-trail Firefox/firefox-version"],
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.http_token}"
+        }
+        # Micro-batching of forwarded PDUs. A batch_size of 0 disables it: each PDU is posted on its own.
+        self.batch_size = batch_size
+        self.batch_max_age = batch_max_age
+        self.clock = clock
+        self.batch = []
+        self.batch_timer = None
+        # In-flight window on forwarded PDU posts. A max_in_flight of 0 leaves it unbounded. Acks are not limited.
+        # Conflation per entity is done ahead of the poster, by EntityStateConflator.
+        self.max_in_flight = max_in_flight
+        self.in_flight_policy = in_flight_policy
+        self.in_flight = 0
+        self.waiting = deque() # Deferreds of posts waiting for a slot (WAIT policy)
+        self.pending = deque(maxlen=max_pending) # (payload, label) waiting for a slot (DROP_OLDEST policy)
+        self.dropped = 0 # posts dropped because the window was full
+        self.active_posts = 0 # posts waiting for a response, acks included
+        self.post_latency = {"pdu": Histogram(), "ack": Histogram()}
 
     async def post_to_api(self, json_payload, is_ack):
         """
         Posts JSON data to API.
-        It can be an engagement ack, or the forward of a DIS packet in JSON format
-        
+        It can be an engagement ack, or the forward of a DIS packet in JSON format.
+        When batching is enabled, forwarded PDUs are buffered and posted as a JSON array once the batch
+        is full or old enough. Acks are always posted on their own.
+
         Args:
+            json_payload: the data to post
             is_ack: whether the data to post is an engagement ack or not
+
+        Returns:
+            for an ack, whether the API accepted it
         """
-        headers = {
-            "User-Agent" : [ f"Mozilla/5.0 (platform; rv:gecko-version) Gecko/gecko-trail Firefox/firefox-version"],
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.http_token}"
-        }
+        if is_ack:
+            return await self.post(self.ack_endpoint, json_payload, "ACK")
+        elif not self.batch_size:
+            await self.forward(json_payload, "PDU")
+        else:
+            self.batch.append(json_payload)
+            if len(self.batch) >= self.batch_size:
+                await self.flush_batch()
+            elif self.batch_timer is None:
+                self.batch_timer = self.clock.callLater(self.batch_max_age, self.flush_batch_on_timer)
+
+    async def flush_batch(self):
+        """
+        Posts the buffered PDUs, if any, as a single JSON array.
+        """
+        if self.batch_timer is not None and self.batch_timer.active():
+            self.batch_timer.cancel()
+        self.batch_timer = None
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        await self.forward(batch, f"BATCH:{len(batch)}")
+
+    def flush_batch_on_timer(self):
+        self.batch_timer = None
+        ensureDeferred(self.flush_batch())
+
+    async def forward(self, json_payload, label):
+        """
+        Posts a PDU payload or batch to the receiver endpoint within the in-flight window.
+        When the window is full, the in-flight policy decides whether to wait or queue with drop-oldest.
+
+        Args:
+            json_payload: the PDU or batch of PDUs to post
+            label: tag identifying the kind of payload in the logs
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            if self.in_flight_policy == WAIT:
+                waiter = Deferred()
+                self.waiting.append(waiter)
+                await waiter
+            else:
+                self.enqueue(json_payload, label)
+                return
+        self.in_flight += 1
+        try:
+            await self.post(self.endpoint_receiver, json_payload, label)
+        finally:
+            self.in_flight -= 1
+            self.release()
+
+    def enqueue(self, json_payload, label):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append((json_payload, label))
+
+    def release(self):
+        """
+        Hands a freed slot of the in-flight window to the next waiting or queued post.
+        """
+        if self.waiting:
+            self.waiting.popleft().callback(None)
+        elif self.pending:
+            json_payload, label = self.pending.popleft()
+            ensureDeferred(self.forward(json_payload, label))
+
+    async def post(self, url, json_payload, label):
+        """
+        Posts a JSON payload and reports the response.
+
+        Args:
+            url: the endpoint to post to
+            json_payload: the data to post
+            label: tag identifying the kind of payload in the logs (ACK, PDU, BATCH:<size>)
+
+        Returns:
+            True if the endpoint answered with a success status
+        """
+        start = time.perf_counter()
+        self.active_posts += 1
         try:
-            response = await self.http_client.post(
-                self.ack_endpoint if is_ack else self.endpoint_receiver,
-                headers=headers,
+            posting = self.http_client.post(
+                url,
+                headers=self.headers,
                 json=json_payload
             )
-            print(f"[HTTP INFO:{'ACK' if is_ack else 'PDU'}] HTTP POST response: {response.code}")
+            request_stage.add(time.perf_counter() - start) # reactor time spent encoding and issuing the request
+            response = await posting
+            await response.content() # read the body so that the connection goes back to the pool
+            log.info("HTTP POST response: %s", response.code, extra={"tag": f"HTTP INFO:{label}"})
+            return 200 <= response.code < 300
         except Exception as e:
-            print(f"[HTTP INFO:{'ACK' if is_ack else 'PDU'}] HTTP POST failed: {e}")
+            log.error("HTTP POST failed: %s", e, extra={"tag": f"HTTP INFO:{label}"})
+            return False
+        finally:
+            self.active_posts -= 1
+            self.post_latency["ack" if url == self.ack_endpoint else "pdu"].observe(time.perf_counter() - start)
@@ -0,0 +1,62 @@
+# -*- test-case-name: httptools.test.test_sse -*-
+from collections import namedtuple
+
+# A dispatched Server-Sent Event. id is None when the event did not set one.
+Event = namedtuple("Event", ("type", "data", "id"))
+
+class EventStreamParser:
+    """
+    Incremental parser of a text/event-stream body (HTML Living Standard, 9.2.6): chunks are fed as
+    they arrive and complete events are returned as soon as their terminating blank line is received.
+    Comment lines (keep-alives) are ignored; a "retry" field updates the reconnection delay.
+    """
+    def __init__(self):
+        self.buffer = b""
+        self.type = ""
+        self.data = []
+        self.id = None
+        self.retry = None # reconnection delay requested by the server, in seconds
+
+    def feed(self, chunk):
+        """
+        Returns:
+            the list of the events completed by the chunk
+        """
+        self.buffer += chunk
+        events = []
+        while True:
+            end = min((i for i in (self.buffer.find(b"\n"), self.buffer.find(b"\r")) if i >= 0), default=-1)
+            if end < 0:
+                return events
+            line = self.buffer[:end]
+            if self.buffer[end:end + 2] == b"\r\n":
+                end += 1
+            elif self.buffer[end:end + 1] == b"\r" and end + 1 == len(self.buffer):
+                return events # the \n of a \r\n may still be on its way
+            self.buffer = self.buffer[end + 1:]
+            event = self.line_received(line.decode("utf-8", "replace"))
+            if event is not None:
+                events.append(event)
+
+    def line_received(self, line):
+        if not line:
+            if not self.data:
+                self.type = ""
+                return None
+            event = Event(self.type or "message", "\n".join(self.data), self.id)
+            self.type, self.data = "", []
+            return event
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self.data.append(value)
+        elif field == "event":
+            self.type = value
+        elif field == "id" and "\0" not in value:
+            self.id = value
+        elif field == "retry" and value.isdigit():
+            self.retry = int(value) / 1000
+        return None
@@ -0,0 +1,51 @@
+from twisted.internet.defer import Deferred, ensureDeferred
+from twisted.trial import unittest
+
+from httptools.conflator import EntityStateConflator
+
+def entity_state(entity, sequence):
+    return {"entityID": {"siteID": 1, "applicationID": 2, "entityID": entity}, "sequence": sequence}
+
+class SlowPoster:
+    """HttpPoster stand-in whose requests complete only when told to."""
+    def __init__(self):
+        self.posted = []
+        self.waiting = []
+
+    def post_to_api(self, json_payload, is_ack):
+        self.posted.append(json_payload)
+        d = Deferred()
+        self.waiting.append(d)
+        return d
+
+    def complete_all(self):
+        while self.waiting:
+            self.waiting.pop(0).callback(None)
+
+class conflatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.poster = SlowPoster()
+        self.conflator = EntityStateConflator(self.poster, max_in_flight=1)
+
+    def submit(self, payload, is_ack=False):
+        self.successResultOf(ensureDeferred(self.conflator.post_to_api(payload, is_ack=is_ack)))
+
+    def test_latest_state_only(self):
+        self.submit(entity_state(1, 0))  # sent right away
+        for sequence in range(1, 10):
+            self.submit(entity_state(1, sequence))
+        self.submit(entity_state(2, 0))
+        self.assertEqual(len(self.conflator.pending), 2)
+        self.assertEqual(self.conflator.conflated, 8)
+        self.poster.complete_all()
+        self.poster.complete_all()
+        self.assertEqual([p["sequence"] for p in self.poster.posted], [0, 9, 0])
+        self.assertEqual(self.conflator.pending, {})
+        self.assertEqual(self.conflator.in_flight, 0)
+
+    def test_ack_bypasses_conflation(self):
+        d = ensureDeferred(self.conflator.post_to_api({"engagement": 4}, is_ack=True))
+        self.assertEqual(self.poster.posted, [{"engagement": 4}])
+        self.assertEqual(self.conflator.pending, {})
+        self.poster.complete_all()
+        self.successResultOf(d)
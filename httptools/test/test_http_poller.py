@@ -0,0 +1,258 @@
+import json
+
+from twisted.internet import task
+from twisted.internet.defer import CancelledError, Deferred, ensureDeferred, fail, succeed
+from twisted.python.failure import Failure
+from twisted.trial import unittest
+from twisted.web.http_headers import Headers
+
+from httptools.http_poller import HttpPoller, LONG_POLL, SSE
+
+class FakeResponse:
+    def __init__(self, code=200, body=b"", headers=None):
+        self.code = code
+        self.body = body
+        self.headers = Headers(headers or {})
+        self.protocol = None
+
+    def content(self):
+        return succeed(self.body)
+
+    def json(self):
+        return succeed(json.loads(self.body))
+
+    def deliverBody(self, protocol):
+        self.protocol = protocol
+        protocol.makeConnection(FakeTransport(protocol))
+
+class FakeTransport:
+    def __init__(self, protocol):
+        self.protocol = protocol
+
+    def stopProducing(self):
+        self.protocol.connectionLost(Failure(Exception("aborted")))
+
+class FakeHttpClient:
+    """Answers GETs with the queued responses, or keeps them waiting when the queue is empty."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.waiting = []
+
+    def get(self, url, headers, **kwargs):
+        self.requests.append((url, headers, kwargs))
+        if self.responses:
+            response = self.responses.pop(0)
+            return fail(response) if isinstance(response, Exception) else succeed(response)
+        d = Deferred()
+        self.waiting.append(d)
+        return d
+
+class FakePoster:
+    def __init__(self, accept=True):
+        self.acks = []
+        self.accept = accept
+
+    async def post_to_api(self, json_payload, is_ack):
+        self.acks.append(json_payload)
+        return self.accept
+
+def engagements(*ids):
+    return json.dumps([{"id": i} for i in ids]).encode()
+
+class pollerTestCase(unittest.TestCase):
+    def make_poller(self, client, **intake):
+        self.clock = task.Clock()
+        self.processed = []
+        poller = HttpPoller("http://api/poll", "token", 5, None, FakePoster(), "http://api/ack", False, client, scheduler=object(), intake=intake, clock=self.clock)
+        async def process_engagements(data):
+            self.processed.append([enga["id"] for enga in data])
+            return self.acknowledged
+        self.acknowledged = True
+        poller.process_engagements = process_engagements
+        return poller
+
+class etagTestCase(pollerTestCase):
+    def test_conditional_poll(self):
+        client = FakeHttpClient(FakeResponse(200, engagements(4), {"ETag": ['"v1"']}), FakeResponse(304))
+        poller = self.make_poller(client)
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertNotIn("If-None-Match", client.requests[0][1])
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertEqual(client.requests[1][1]["If-None-Match"], ['"v1"'])
+        self.assertEqual(self.processed, [[4], []])
+        self.assertEqual(poller.not_modified, 1)
+
+    def test_failed_ack_polls_unconditionally(self):
+        body = json.dumps([{"id": 4, "latitude": 43.0, "longitude": 5.0, "course": 230, "speed": 318}]).encode()
+        client = FakeHttpClient(*[FakeResponse(200, body, {"ETag": ['"v1"']}) for _ in range(3)], FakeResponse(304))
+        poster = FakePoster(accept=False)
+        poller = HttpPoller("http://api/poll", "token", 5, None, poster, "http://api/ack", False, client, scheduler=object(), clock=task.Clock())
+        poller.create_missiles = lambda enga: succeed(None)
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertNotIn("If-None-Match", client.requests[1][1])
+        poster.accept = True
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertEqual(poster.acks, [{"engagement": 4}] * 3)
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertEqual(client.requests[3][1]["If-None-Match"], ['"v1"'])
+
+    def test_error(self):
+        poller = self.make_poller(FakeHttpClient(FakeResponse(500)))
+        self.failureResultOf(ensureDeferred(poller.fetch_data()), Exception)
+
+    def test_durations(self):
+        poller = self.make_poller(FakeHttpClient(FakeResponse(200, engagements(4)), FakeResponse(500)))
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.successResultOf(ensureDeferred(poller.poll()))
+        self.assertEqual(poller.poll_duration.count, 2) # failed polls included
+        self.assertEqual(poller.fetch_duration.count, 1)
+
+    def test_invalid_mode(self):
+        self.assertRaises(ValueError, self.make_poller, FakeHttpClient(), mode="push")
+
+class longPollTestCase(pollerTestCase):
+    def test_engagements_handled_on_arrival(self):
+        client = FakeHttpClient()
+        poller = self.make_poller(client, mode=LONG_POLL, wait=30)
+        ensureDeferred(poller.run())
+        self.assertEqual(client.requests[0][0], "http://api/poll")
+        self.assertEqual(client.requests[0][1]["Prefer"], ["wait=30"])
+        self.clock.advance(12)
+        client.waiting.pop().callback(FakeResponse(200, engagements(4), {"ETag": ['"v2"']}))
+        self.assertEqual(self.processed, [[4]])
+        # the next long poll is issued at once, conditionally
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(client.requests[1][1]["If-None-Match"], ['"v2"'])
+
+    def test_immediate_empty_answer_waits_interval(self):
+        client = FakeHttpClient(FakeResponse(304))
+        poller = self.make_poller(client, mode=LONG_POLL)
+        ensureDeferred(poller.run())
+        self.assertEqual(len(client.requests), 1)
+        self.clock.advance(5)
+        self.assertEqual(len(client.requests), 2)
+
+    def test_immediate_answer_waits_interval(self):
+        client = FakeHttpClient(FakeResponse(200, engagements(4)), FakeResponse(200, engagements(4)))
+        poller = self.make_poller(client, mode=LONG_POLL)
+        ensureDeferred(poller.run())
+        self.assertEqual(len(client.requests), 1) # a server ignoring Prefer: wait is not polled in a loop
+        self.clock.advance(5)
+        self.assertEqual(len(client.requests), 2)
+
+    def test_backoff_with_polling(self):
+        client = FakeHttpClient(CancelledError(), FakeResponse(200, engagements(1)))
+        poller = self.make_poller(client, mode=LONG_POLL, endpoint="http://api/wait", backoff_initial=8, backoff_max=10)
+        ensureDeferred(poller.run())
+        # failed long poll: immediate poll of the polling endpoint, another after the interval
+        self.assertEqual([url for url, _, _ in client.requests], ["http://api/wait", "http://api/poll"])
+        self.assertEqual(self.processed, [[1]])
+        client.responses.append(FakeResponse(304))
+        self.clock.advance(5)
+        self.assertEqual(len(client.requests), 3)
+        # reconnection after the backoff delay
+        client.responses.append(CancelledError())
+        client.responses.append(FakeResponse(304))
+        self.clock.advance(3)
+        self.assertEqual([url for url, _, _ in client.requests[3:]], ["http://api/wait", "http://api/poll"])
+        self.assertEqual(poller.failures, 2)
+        self.assertEqual(poller.reconnects, 1)
+        # the backoff doubles, up to its maximum
+        client.responses.append(FakeResponse(304))
+        client.responses.append(FakeResponse(304))
+        self.clock.advance(5)
+        self.clock.advance(5)
+        self.assertEqual(client.requests[-1][0], "http://api/wait")
+
+    def test_unsupported_polls_until_backoff_max(self):
+        client = FakeHttpClient(FakeResponse(404), FakeResponse(304), FakeResponse(304), FakeResponse(304))
+        poller = self.make_poller(client, mode=LONG_POLL, backoff_initial=1, backoff_max=10)
+        ensureDeferred(poller.run())
+        self.clock.advance(5)
+        self.assertEqual(len(client.requests), 3)
+        self.assertNotIn("Prefer", client.requests[2][1])
+        self.clock.advance(5)
+        self.assertEqual(client.requests[3][1]["Prefer"], ["wait=30"])
+        self.assertEqual(poller.reconnects, 1)
+
+class sseTestCase(pollerTestCase):
+    def test_events(self):
+        response = FakeResponse(200, headers={"Content-Type": ["text/event-stream"]})
+        client = FakeHttpClient(response)
+        poller = self.make_poller(client, mode=SSE, idle_timeout=0)
+        ensureDeferred(poller.run())
+        self.assertEqual(client.requests[0][1]["Accept"], ["text/event-stream"])
+        self.assertTrue(client.requests[0][2]["unbuffered"])
+        response.protocol.dataReceived(b": hello\n\nid: 1\nevent: engagement\ndata: {\"id\": 4}\n\n")
+        response.protocol.dataReceived(b"id: 2\ndata: [{\"id\": 5}, {\"id\": 6}]\n\n")
+        self.assertEqual(self.processed, [[4], [5, 6]])
+
+    def test_failed_ack_retried(self):
+        response = FakeResponse(200, headers={"Content-Type": ["text/event-stream"]})
+        poster = FakePoster(accept=False)
+        poller = HttpPoller("http://api/poll", "token", 5, None, poster, "http://api/ack", False, FakeHttpClient(response), scheduler=object(),
+                            intake={"mode": SSE, "idle_timeout": 0}, clock=task.Clock())
+        poller.create_missiles = lambda enga: succeed(None)
+        ensureDeferred(poller.run())
+        response.protocol.dataReceived(b"id: 1\ndata: {\"id\": 4, \"latitude\": 43.0, \"longitude\": 5.0, \"course\": 230, \"speed\": 318}\n\n")
+        self.assertEqual(poller.unacknowledged, {4})
+        poller.clock.advance(5)
+        self.assertEqual(poster.acks, [{"engagement": 4}] * 2)
+        poster.accept = True
+        poller.clock.advance(5)
+        self.assertEqual(poster.acks, [{"engagement": 4}] * 3)
+        self.assertEqual(poller.unacknowledged, set())
+        poller.clock.advance(5)
+        self.assertEqual(len(poster.acks), 3)
+        self.assertIsNone(poller.ack_retry)
+
+    def test_reconnect_with_last_event_id(self):
+        response = FakeResponse(200, headers={"Content-Type": ["text/event-stream"]})
+        client = FakeHttpClient(response, FakeResponse(304))
+        poller = self.make_poller(client, mode=SSE, backoff_initial=2, idle_timeout=0)
+        ensureDeferred(poller.run())
+        response.protocol.dataReceived(b"id: 9\ndata: []\n\n")
+        response.protocol.connectionLost(Failure(Exception("closed")))
+        self.assertEqual(client.requests[1][0], "http://api/poll")
+        client.responses.append(FakeResponse(200, headers={"Content-Type": ["text/event-stream"]}))
+        self.clock.advance(2)
+        self.assertEqual(client.requests[2][1]["Last-Event-ID"], ["9"])
+
+    def test_idle_stream_aborted(self):
+        response = FakeResponse(200, headers={"Content-Type": ["text/event-stream"]})
+        client = FakeHttpClient(response, FakeResponse(304))
+        poller = self.make_poller(client, mode=SSE, idle_timeout=30)
+        ensureDeferred(poller.run())
+        self.clock.advance(20)
+        response.protocol.dataReceived(b": keep-alive\n\n")
+        self.clock.advance(20)
+        self.assertEqual(len(client.requests), 1)
+        self.clock.advance(10)
+        self.assertEqual(client.requests[1][0], "http://api/poll")
+
+    def test_not_an_event_stream(self):
+        client = FakeHttpClient(FakeResponse(200, engagements(), {"Content-Type": ["application/json"]}), FakeResponse(304))
+        poller = self.make_poller(client, mode=SSE, backoff_max=5)
+        ensureDeferred(poller.run())
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(poller.reconnects, 0)
+        self.clock.advance(5)
+        self.assertEqual(client.requests[2][1]["Accept"], ["text/event-stream"])
+
+    def test_retry_field(self):
+        response = FakeResponse(200, headers={"Content-Type": ["text/event-stream"]})
+        client = FakeHttpClient(response, FakeResponse(304))
+        poller = self.make_poller(client, mode=SSE, backoff_initial=2, idle_timeout=0)
+        ensureDeferred(poller.run())
+        response.protocol.dataReceived(b"retry: 7000\n\n")
+        response.protocol.connectionLost(Failure(Exception("closed")))
+        self.assertEqual(poller.backoff_initial, 2)
+        self.assertEqual(poller.server_retry, 7.0)
+        client.responses.append(FakeResponse(304))
+        self.clock.advance(5)
+        self.assertEqual(len(client.requests), 3) # still polling
+        client.responses.append(FakeResponse(200, headers={"Content-Type": ["text/event-stream"]}))
+        self.clock.advance(2)
+        self.assertEqual(client.requests[3][1]["Accept"], ["text/event-stream"])
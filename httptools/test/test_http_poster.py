@@ -0,0 +1,111 @@
+from twisted.internet import task
+from twisted.internet.defer import Deferred, ensureDeferred, succeed
+from twisted.trial import unittest
+
+from httptools.http_poster import HttpPoster, WAIT, DROP_OLDEST
+
+class FakeResponse:
+    code = 200
+
+    def content(self):
+        return succeed(b"")
+
+class FakeHttpClient:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, headers, json):
+        self.posts.append((url, json))
+        return succeed(FakeResponse())
+
+class batchingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.client = FakeHttpClient()
+        self.poster = HttpPoster(self.client, "http://api/receive", "http://api/ack", "token", batch_size=3, batch_max_age=0.05, clock=self.clock)
+
+    def post(self, payload, is_ack=False):
+        return self.successResultOf(ensureDeferred(self.poster.post_to_api(payload, is_ack=is_ack)))
+
+    def test_flush_when_full(self):
+        for i in range(3):
+            self.post({"n": i})
+        self.assertEqual(self.client.posts, [("http://api/receive", [{"n": 0}, {"n": 1}, {"n": 2}])])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_flush_when_old(self):
+        self.post({"n": 0})
+        self.clock.advance(0.04)
+        self.assertEqual(self.client.posts, [])
+        self.clock.advance(0.01)
+        self.assertEqual(self.client.posts, [("http://api/receive", [{"n": 0}])])
+
+    def test_ack_not_batched(self):
+        self.post({"n": 0})
+        self.post({"engagement": 4}, is_ack=True)
+        self.assertEqual(self.client.posts, [("http://api/ack", {"engagement": 4})])
+
+    def test_ack_result(self):
+        self.assertTrue(self.post({"engagement": 4}, is_ack=True))
+        FakeResponse.code = 503
+        self.addCleanup(setattr, FakeResponse, "code", 200)
+        self.assertFalse(self.post({"engagement": 4}, is_ack=True))
+
+    def test_batching_disabled(self):
+        self.poster.batch_size = 0
+        self.post({"n": 0})
+        self.assertEqual(self.client.posts, [("http://api/receive", {"n": 0})])
+
+class SlowHttpClient(FakeHttpClient):
+    """Client whose requests complete only when told to."""
+    def __init__(self):
+        super().__init__()
+        self.waiting = []
+
+    def post(self, url, headers, json):
+        self.posts.append((url, json))
+        d = Deferred()
+        self.waiting.append(d)
+        return d
+
+    def complete_one(self):
+        self.waiting.pop(0).callback(FakeResponse())
+
+def entity_state(entity, sequence):
+    return {"entityID": {"siteID": 1, "applicationID": 2, "entityID": entity}, "sequence": sequence}
+
+class inFlightWindowTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = SlowHttpClient()
+
+    def poster(self, policy, max_pending=1000):
+        return HttpPoster(self.client, "http://api/receive", "http://api/ack", "token", clock=task.Clock(),
+                          max_in_flight=2, in_flight_policy=policy, max_pending=max_pending)
+
+    def sent(self):
+        return [payload["sequence"] for _, payload in self.client.posts]
+
+    def test_wait(self):
+        poster = self.poster(WAIT)
+        posts = [ensureDeferred(poster.post_to_api(entity_state(1, i), is_ack=False)) for i in range(4)]
+        self.assertEqual(self.sent(), [0, 1])
+        self.assertNoResult(posts[2])
+        self.client.complete_one()
+        self.assertEqual(self.sent(), [0, 1, 2])
+        self.assertEqual(poster.in_flight, 2)
+
+    def test_drop_oldest(self):
+        poster = self.poster(DROP_OLDEST, max_pending=2)
+        for i in range(6):
+            ensureDeferred(poster.post_to_api(entity_state(i, i), is_ack=False))
+        self.assertEqual(poster.dropped, 2)
+        self.client.complete_one()
+        self.client.complete_one()
+        self.assertEqual(self.sent(), [0, 1, 4, 5])
+
+    def test_ack_not_limited(self):
+        poster = self.poster(WAIT)
+        for i in range(2):
+            ensureDeferred(poster.post_to_api(entity_state(1, i), is_ack=False))
+        ensureDeferred(poster.post_to_api({"engagement": 4, "sequence": "ack"}, is_ack=True))
+        self.assertEqual(self.sent(), [0, 1, "ack"])
@@ -0,0 +1,31 @@
+from twisted.trial import unittest
+
+from httptools.sse import Event, EventStreamParser
+
+class eventStreamParserTestCase(unittest.TestCase):
+    def setUp(self):
+        self.parser = EventStreamParser()
+
+    def test_event(self):
+        events = self.parser.feed(b"event: engagement\nid: 7\ndata: {\"id\": 4}\n\n")
+        self.assertEqual(events, [Event("engagement", '{"id": 4}', "7")])
+
+    def test_split_chunks(self):
+        self.assertEqual(self.parser.feed(b"data: [1,"), [])
+        self.assertEqual(self.parser.feed(b" 2]\r"), [])
+        self.assertEqual(self.parser.feed(b"\n\r\n"), [Event("message", "[1, 2]", None)])
+
+    def test_multiline_data(self):
+        self.assertEqual(self.parser.feed(b"data:a\ndata:b\n\n"), [Event("message", "a\nb", None)])
+
+    def test_comments_and_empty_events(self):
+        self.assertEqual(self.parser.feed(b": keep-alive\n\nevent: ping\n\n"), [])
+        self.assertEqual(self.parser.feed(b"data: x\n\n"), [Event("message", "x", None)])
+
+    def test_id_persists(self):
+        events = self.parser.feed(b"id: 3\ndata: a\n\ndata: b\n\n")
+        self.assertEqual([event.id for event in events], ["3", "3"])
+
+    def test_retry(self):
+        self.parser.feed(b"retry: 2500\n\n")
+        self.assertEqual(self.parser.retry, 2.5)
@@ -0,0 +1,146 @@
+# -*- test-case-name: logtools.test.test_logger -*-
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Root of the gateway loggers. Categories are its children, e.g. "gateway.dis.recv".
+ROOT = "gateway"
+
+# Tag printed by the legacy formatter for each category, as the gateway printed them before
+LEGACY_TAGS = {
+    "dis.recv": "DIS RECV",
+    "dis.send": "DIS SEND",
+    "dis.info": "DIS INFO",
+    "dis.error": "DIS ERROR",
+    "dis.ingest": "DIS INGEST",
+    "http.info": "HTTP INFO",
+    "http.poll": "HTTP POLL",
+    "sim.info": "DIS INFO",
+    "sim.error": "SIM ERROR",
+    "admin.info": "ADMIN INFO",
+}
+
+def get_logger(category):
+    """
+    Gets the logger of a category, e.g. get_logger("dis.recv").
+    """
+    return logging.getLogger(f"{ROOT}.{category}")
+
+class LegacyFormatter(logging.Formatter):
+    """
+    Formats records as "[TAG] message", the way the gateway used to print them.
+    A record can override the tag of its category with extra={"tag": ...}.
+    """
+    def format(self, record):
+        tag = getattr(record, "tag", None)
+        if tag is None:
+            category = record.name[len(ROOT) + 1:]
+            tag = LEGACY_TAGS.get(category, category.upper().replace(".", " "))
+        message = f"[{tag}] {record.getMessage()}"
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        return message
+
+class CategoryFilter(logging.Filter):
+    """
+    Samples and rate limits records per category, before they are queued.
+    A category setting also applies to its sub-categories ("dis" covers "dis.recv").
+
+    Args:
+        sampling: category -> N, to keep 1 record in N
+        rate_limit: category -> maximum number of records per second
+    """
+    def __init__(self, sampling=None, rate_limit=None, clock=time.monotonic):
+        super().__init__()
+        self.sampling = sampling or {}
+        self.rate_limit = rate_limit or {}
+        self.clock = clock
+        self.categories = {} # logger name -> [sampling, rate limit, seen, window start, count in window], resolved once
+        self.dropped = 0
+
+    def resolve(self, name):
+        category = name[len(ROOT) + 1:] if name.startswith(ROOT + ".") else name
+        sampling = rate_limit = None
+        while category:
+            if sampling is None:
+                sampling = self.sampling.get(category)
+            if rate_limit is None:
+                rate_limit = self.rate_limit.get(category)
+            category = category.rpartition(".")[0]
+        state = self.categories[name] = [sampling or 1, rate_limit, 0, 0.0, 0]
+        return state
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True # errors are never dropped
+        state = self.categories.get(record.name) or self.resolve(record.name)
+        state[2] += 1
+        if state[0] > 1 and state[2] % state[0] != 1:
+            self.dropped += 1
+            return False
+        if state[1] is not None:
+            now = self.clock()
+            if now - state[3] >= 1.0:
+                state[3] = now
+                state[4] = 0
+            if state[4] >= state[1]:
+                self.dropped += 1
+                return False
+            state[4] += 1
+        return True
+
+class BackgroundHandler(QueueHandler):
+    """
+    Queues records for the background writer thread without formatting them on the caller's thread.
+    When the queue is full, records are dropped instead of blocking the reactor.
+    """
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(level="INFO", format="legacy", sampling=None, rate_limit=None, stream=None, queue_size=10000):
+    """
+    Configures the gateway loggers: records below the level are discarded, the others are sampled and
+    rate limited per category, then written to the stream by a background thread.
+
+    Args:
+        level: minimum level name (DEBUG, INFO, WARNING, ERROR)
+        format: "legacy" for the "[DIS RECV] ..." style, "standard" for timestamp, level and category
+        sampling: category -> N, to keep 1 record in N
+        rate_limit: category -> maximum number of records per second
+        stream: where to write, defaults to stdout
+        queue_size: maximum number of records waiting to be written
+
+    Returns:
+        the QueueListener running the background writer, to stop on shutdown
+    """
+    writer = logging.StreamHandler(stream or sys.stdout)
+    if format == "legacy":
+        writer.setFormatter(LegacyFormatter())
+    else:
+        writer.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+    record_queue = queue.Queue(queue_size)
+    handler = BackgroundHandler(record_queue)
+    handler.addFilter(CategoryFilter(sampling, rate_limit))
+
+    root = logging.getLogger(ROOT)
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    root.propagate = False
+
+    listener = QueueListener(record_queue, writer)
+    listener.start()
+    return listener
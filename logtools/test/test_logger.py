@@ -0,0 +1,61 @@
+import io
+import logging
+
+from twisted.trial import unittest
+
+from logtools.logger import CategoryFilter, LegacyFormatter, get_logger, setup_logging
+
+def record(category, message="message", level=logging.INFO, **extra):
+    result = logging.LogRecord(f"gateway.{category}", level, __file__, 0, message, (), None)
+    result.__dict__.update(extra)
+    return result
+
+class legacyFormatterTestCase(unittest.TestCase):
+    def test_tags(self):
+        formatter = LegacyFormatter()
+        self.assertEqual(formatter.format(record("dis.recv", "ExocetMM40 Entity")), "[DIS RECV] ExocetMM40 Entity")
+        self.assertEqual(formatter.format(record("sim.info")), "[DIS INFO] message")
+        self.assertEqual(formatter.format(record("http.info", tag="HTTP INFO:PDU")), "[HTTP INFO:PDU] message")
+        self.assertEqual(formatter.format(record("new.category")), "[NEW CATEGORY] message")
+
+class categoryFilterTestCase(unittest.TestCase):
+    def test_sampling(self):
+        category_filter = CategoryFilter(sampling={"dis.recv": 10})
+        kept = [category_filter.filter(record("dis.recv")) for _ in range(100)]
+        self.assertEqual(sum(kept), 10)
+        self.assertTrue(kept[0])
+        self.assertEqual(category_filter.dropped, 90)
+        self.assertTrue(all(category_filter.filter(record("dis.send")) for _ in range(10)))
+
+    def test_parent_category(self):
+        category_filter = CategoryFilter(sampling={"dis": 2, "dis.send": 5})
+        self.assertEqual(sum(category_filter.filter(record("dis.recv")) for _ in range(10)), 5)
+        self.assertEqual(sum(category_filter.filter(record("dis.send")) for _ in range(10)), 2)
+
+    def test_rate_limit(self):
+        now = [0.0]
+        category_filter = CategoryFilter(rate_limit={"http.info": 3}, clock=lambda: now[0])
+        self.assertEqual(sum(category_filter.filter(record("http.info")) for _ in range(10)), 3)
+        now[0] = 1.5
+        self.assertEqual(sum(category_filter.filter(record("http.info")) for _ in range(10)), 3)
+
+    def test_errors_never_dropped(self):
+        category_filter = CategoryFilter(sampling={"dis": 100}, rate_limit={"dis": 0})
+        self.assertTrue(all(category_filter.filter(record("dis.error", level=logging.ERROR)) for _ in range(10)))
+
+class setupLoggingTestCase(unittest.TestCase):
+    def reset(self, root):
+        root.handlers.clear()
+        root.setLevel(logging.NOTSET)
+        root.propagate = True
+
+    def test_background_writer(self):
+        stream = io.StringIO()
+        listener = setup_logging("INFO", "legacy", sampling={"dis.recv": 2}, stream=stream)
+        self.addCleanup(self.reset, logging.getLogger("gateway"))
+        log = get_logger("dis.recv")
+        for i in range(4):
+            log.info("Entity %s", i)
+        get_logger("dis.info").debug("hidden")
+        listener.stop()
+        self.assertEqual(stream.getvalue().splitlines(), ["[DIS RECV] Entity 0", "[DIS RECV] Entity 2"])
@@ -0,0 +1,57 @@
+# -*- test-case-name: simtools.test.test_emission_policy -*-
+import math
+
+from distools.dead_reckoning import extrapolate_position
+
+class EmissionPolicy:
+    """
+    Decides when a simulated missile has to emit its state, so that it can be propagated at a high rate
+    without increasing network traffic. The state is emitted when the position the receivers extrapolate
+    from the last emission, with the dead reckoning algorithm set in the EntityStatePdu, departs from the
+    actual position by more than a threshold, when the direction of the velocity turns by more than a
+    threshold, or when the heartbeat interval has elapsed. Launch and termination are always emitted.
+    """
+    def __init__(self, position_threshold=1.0, orientation_threshold=math.radians(3.0), heartbeat=5.0, algorithm=4):
+        self.position_threshold = position_threshold # meters
+        self.orientation_threshold = orientation_threshold # radians
+        self.heartbeat = heartbeat # seconds
+        self.algorithm = algorithm # dead reckoning algorithm of the emitted EntityStatePdus [UID 44]
+        self.emitted = 0
+        self.suppressed = 0
+
+    def should_emit(self, last_emission, nowtimestamp, position, velocity):
+        """
+        Args:
+            last_emission: (time, ECEF position, ECEF velocity) of the last emitted state, None before launch
+            nowtimestamp: current time in seconds
+            position: current ECEF position in meters
+            velocity: current ECEF velocity in m/s
+
+        Returns:
+            True if the state has to be emitted
+        """
+        if last_emission is None or self.has_diverged(last_emission, nowtimestamp, position, velocity):
+            self.emitted += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def has_diverged(self, last_emission, nowtimestamp, position, velocity):
+        emission_time, emitted_position, emitted_velocity = last_emission
+        deltatime = nowtimestamp - emission_time
+        if deltatime >= self.heartbeat:
+            return True
+        predicted = extrapolate_position(self.algorithm, emitted_position, emitted_velocity, (0.0, 0.0, 0.0), deltatime)
+        if math.dist(predicted, position) > self.position_threshold:
+            return True
+        return angle_between(emitted_velocity, velocity) > self.orientation_threshold
+
+def angle_between(a, b):
+    """
+    Gets the angle, in radians, between two vectors. Null vectors are considered aligned.
+    """
+    norms = math.hypot(*a) * math.hypot(*b)
+    if norms == 0.0:
+        return 0.0
+    cosine = sum(x * y for x, y in zip(a, b)) / norms
+    return math.acos(max(-1.0, min(1.0, cosine)))
@@ -0,0 +1,153 @@
+# -*- test-case-name: simtools.test.test_fleet -*-
+import time
+
+import numpy as np
+
+from distools.geotools.tools import lla2ecef_batch, natural_velocity_to_ECEF_batch
+from admintools.profiler import timings
+
+fleet_step_stage = timings.stage("sim.fleet_step")
+emit_stage = timings.stage("sim.emit")
+
+# Names of the state arrays, indexed by row
+STATE_ARRAYS = ("positions", "courses", "speeds", "timestamps", "ranges", "launch_points")
+
+class MissileFleet:
+    """
+    Holds the state of every live missile in NumPy arrays, one entry per missile, so that propagation,
+    ECEF conversion, velocity and range checks run as one vectorized step for the whole fleet.
+    Behaves as a set of simtools.objects.Missile: update() advances, range checks and emits the missiles
+    the same way Missile.update() does, emission policy included, with the range measured as the straight
+    line between the launch point and the current position (within a few millimeters of the geodesic
+    distance at missile ranges). The position and time of each Missile object are kept in sync, so that
+    Missile.terminate() ends a flight from where the fleet left the missile.
+    """
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.capacity = capacity
+        self.index = {} # entity key -> row
+        # Propagated state, one row per missile
+        self.positions = np.zeros((capacity, 3)) # latitude, longitude, altitude
+        self.courses = np.zeros(capacity)
+        self.speeds = np.zeros(capacity)
+        self.timestamps = np.zeros(capacity)
+        self.ranges = np.zeros(capacity) # km
+        self.launch_points = np.zeros((capacity, 3)) # ECEF, meters
+        # Per-missile objects, only used at emission time, in the same rows
+        self.keys = []
+        self.missiles = []
+
+    def lists(self):
+        return (self.keys, self.missiles)
+
+    def grow(self):
+        """
+        Doubles the capacity of the state arrays, keeping the current entries.
+        """
+        self.capacity *= 2
+        for name in STATE_ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros((self.capacity,) + array.shape[1:])
+            grown[:self.size] = array[:self.size]
+            setattr(self, name, grown)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def add(self, key, missile, nowtimestamp):
+        """
+        Adds the state of a newly created Missile to the fleet.
+
+        Args:
+            key: (site, application, entity) key of the missile
+            missile: the simtools.objects.Missile, already advanced to its current position
+            nowtimestamp: time of the missile current position, on the clock later given to update()
+        """
+        if self.size == self.capacity:
+            self.grow()
+        row = self.size
+        self.positions[row] = missile.current_position
+        self.courses[row] = missile.course
+        self.speeds[row] = missile.speed
+        self.timestamps[row] = nowtimestamp
+        self.ranges[row] = missile.range
+        self.launch_points[row] = lla2ecef_batch(missile.initial_position)[0]
+        self.keys.append(key)
+        self.missiles.append(missile)
+        self.index[key] = row
+        self.size += 1
+
+    def remove(self, key):
+        """
+        Removes a missile from the fleet, moving the last entry into its row.
+        """
+        row = self.index.pop(key)
+        last = self.size - 1
+        if row != last:
+            for name in STATE_ARRAYS:
+                array = getattr(self, name)
+                array[row] = array[last]
+            for values in self.lists():
+                values[row] = values[last]
+            self.index[self.keys[row]] = row
+        for values in self.lists():
+            values.pop()
+        self.size = last
+
+    def advance(self, nowtimestamp):
+        """
+        Moves every missile along its course to the given time, as Missile.advance() does.
+
+        Returns:
+            (positions, velocities, distances): N×3 ECEF positions in meters, N×3 ECEF velocities in m/s
+            and N distances from the launch point in km
+        """
+        n = self.size
+        positions = self.positions[:n]
+        deltatimes = nowtimestamp - self.timestamps[:n]
+        courses = np.radians(self.courses[:n])
+        speeds = self.speeds[:n]
+        latitude_variations = deltatimes * np.cos(courses) * speeds / (1854.0 * 60.0)
+        longitude_variations = deltatimes * np.sin(courses) * speeds / (1854.0 * 60.0 * np.cos(np.radians(positions[:, 0])))
+        positions[:, 0] += latitude_variations
+        positions[:, 1] += longitude_variations
+        self.timestamps[:n] = nowtimestamp
+
+        ecef_positions = lla2ecef_batch(positions)
+        ecef_velocities = natural_velocity_to_ECEF_batch(positions[:, 0], positions[:, 1], positions[:, 2], self.courses[:n], speeds)
+        distances = np.linalg.norm(ecef_positions - self.launch_points[:n], axis=1) / 1000.0
+        return ecef_positions, ecef_velocities, distances
+
+    def update(self, nowtimestamp):
+        """
+        Advances every missile and emits its state over the network, unless its emission policy tells that
+        the receivers can still predict it. The missiles that went past their maximum range send their
+        final state and are removed.
+
+        Returns:
+            the keys of the removed missiles
+        """
+        start = time.perf_counter()
+        ecef_positions, ecef_velocities, distances = self.advance(nowtimestamp)
+        out_of_range = distances > self.ranges[:self.size]
+        fleet_step_stage.add(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rows = zip(self.missiles, self.positions[:self.size].tolist(), ecef_positions.tolist(), ecef_velocities.tolist(), out_of_range.tolist())
+        for missile, current_position, position, velocity, is_out_of_range in rows:
+            missile.current_position = current_position
+            missile.current_timestamp = nowtimestamp
+            position, velocity = tuple(position), tuple(velocity)
+            if is_out_of_range:
+                missile.is_out_of_range = True
+            if is_out_of_range or missile.emission_policy is None or missile.emission_policy.should_emit(missile.last_emission, nowtimestamp, position, velocity):
+                missile.emit(nowtimestamp, position, velocity)
+        emit_stage.add(time.perf_counter() - start)
+
+        keys = [self.keys[row] for row in np.flatnonzero(out_of_range).tolist()]
+        for key in keys:
+            self.remove(key)
+        return keys
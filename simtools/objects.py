@@ -1,20 +1,31 @@
 # -*- test-case-name: simtools.test.test_objects -*-
 import datetime
 import math
+import time
 
 from geopy import distance
 
 from opendis.RangeCoordinates import GPS
 from distools.geotools.tools import natural_velocity_to_ECEF
+from logtools.logger import get_logger
+from admintools.profiler import timings
 
 gps = GPS()
 
+log = get_logger("sim.info")
+
+advance_stage = timings.stage("sim.advance")
+range_check_stage = timings.stage("sim.range_check")
+ecef_stage = timings.stage("sim.ecef")
+emit_stage = timings.stage("sim.emit")
+
 class Missile():
-    def __init__(self, entity_id, entity_type, emitter, initial_position, course, speed, range, initial_timestamp, endpoint_time, max_flight_time, STN, target_latitude, target_longitude):
+    def __init__(self, entity_id, entity_type, emitter, initial_position, course, speed, range, initial_timestamp, endpoint_time, max_flight_time, STN, target_latitude, target_longitude, emission_policy=None):
         self.entity_id = entity_id
         self.entity_type = entity_type
         self.emitter = emitter
         self.is_out_of_range = True if ((endpoint_time - initial_timestamp) > max_flight_time) else False
+        self.remaining_flight_time = max_flight_time - (endpoint_time - initial_timestamp)
         self.initial_timestamp = initial_timestamp
         self.initial_position = initial_position # [latitude, longitude, altitude]
         self.course = course
@@ -27,6 +38,8 @@ class Missile():
         self.target_latitude = target_latitude
         self.target_longitude = target_longitude
         self.loop = None 
+        self.emission_policy = emission_policy # None = emit on every update
+        self.last_emission = None # (time, ECEF position, ECEF velocity) of the last emitted state
 
     def setLoop(self, loop):
         """
@@ -41,31 +54,61 @@ class Missile():
         """
         Stops missile update loop when it has reached its maximum range
         """
-        self.loop.stop()
+        if self.loop is not None:
+            self.loop.stop()
 
-    def update(self):
+    def update(self, nowtimestamp=None):
         """
-        Updates a missile position depending on the time elapsed and sends it over the network.
-        If the missile has reached its maximum range, stops its loop.
+        Updates a missile position depending on the time elapsed and sends it over the network,
+        unless its emission policy tells that the receivers can still predict it.
+        If the missile has reached its maximum range, sends its final state and stops its loop.
+
+        Args:
+            nowtimestamp: current time in seconds, given by the simulation clock. Defaults to the system time.
         """
-        nowtimestamp = datetime.datetime.now().timestamp()
+        if nowtimestamp is None:
+            nowtimestamp = datetime.datetime.now().timestamp()
         deltatime = nowtimestamp - self.current_timestamp
+        start = time.perf_counter()
         newposition = self.advance(deltatime)
+        advance_stage.add(time.perf_counter() - start)
 
         self.current_position = newposition
         self.current_timestamp = nowtimestamp
 
-        self.emit()
-
+        start = time.perf_counter()
         dist = distance.distance(self.current_position, self.initial_position).km
+        range_check_stage.add(time.perf_counter() - start)
 
-        print("[DIS INFO] Distance from shooting point: ", dist)
+        log.info("Distance from shooting point: %s", dist)
         if  dist > self.range:
             self.is_out_of_range = True
             self.stopLoop()
 
+        start = time.perf_counter()
+        position, velocity = self.ecef_state()
+        ecef_stage.add(time.perf_counter() - start)
+        if self.is_out_of_range or self.emission_policy is None or self.emission_policy.should_emit(self.last_emission, nowtimestamp, position, velocity):
+            start = time.perf_counter()
+            self.emit(nowtimestamp, position, velocity)
+            emit_stage.add(time.perf_counter() - start)
+
         return
 
+    def terminate(self, nowtimestamp):
+        """
+        Ends the flight of a missile that has reached its maximum flight time and sends its final state.
+
+        Args:
+            nowtimestamp: current time in seconds, given by the simulation clock
+        """
+        self.current_position = self.advance(nowtimestamp - self.current_timestamp)
+        self.current_timestamp = nowtimestamp
+        self.is_out_of_range = True
+        self.stopLoop()
+        position, velocity = self.ecef_state()
+        self.emit(nowtimestamp, position, velocity)
+
     def advance(self, deltatime):
         """
         Computes the new position of a missile based on its speed, course, and elapsed time.
@@ -82,18 +125,28 @@ class Missile():
         newposition = [ self.current_position[0] + latitude_variation, self.current_position[1] + longitude_variation, self.current_position[2]]
         return newposition
 
-    def emit(self):
+    def ecef_state(self):
         """
-        Emits the current state of the missile over the network, including position and velocity, in ECEF coordinates.
+        Gets the current position and velocity of the missile in ECEF coordinates.
+
+        Returns:
+            ((X, Y, Z), (Xvel, Yvel, Zvel)) in meters and meters per second
         """
         [lat, lon, alt] = self.current_position
-        (X, Y, Z) = gps.lla2ecef( [lat, lon, alt])
-        (Xvel, Yvel, Zvel) = natural_velocity_to_ECEF(lat, lon, alt, self.course, self.speed)
+        position = gps.lla2ecef( [lat, lon, alt])  # Coordonnées de l'entité
+        velocity = natural_velocity_to_ECEF(lat, lon, alt, self.course, self.speed)  # Vitesse de l'entité
+        return tuple(position), velocity
 
+    def emit(self, nowtimestamp, position, velocity):
+        """
+        Emits the current state of the missile over the network, including position and velocity, in ECEF coordinates.
 
-        position = (X, Y, Z)  # Coordonnées de l'entité
-        velocity = (Xvel, Yvel, Zvel)  # Vitesse de l'entité
-
+        Args:
+            nowtimestamp: current time in seconds
+            position: ECEF position of the missile
+            velocity: ECEF velocity of the missile
+        """
         self.emitter.emit_entity_state(self.entity_id, self.entity_type, position, velocity)
 
-        self.emitter.emit_custom_pdu(self.STN, self.target_latitude, self.target_longitude)
\ No newline at end of file
+        self.emitter.emit_custom_pdu(self.STN, self.target_latitude, self.target_longitude)
+        self.last_emission = (nowtimestamp, position, velocity)
@@ -0,0 +1,123 @@
+# -*- test-case-name: simtools.test.test_scheduler -*-
+import heapq
+from itertools import count
+
+from twisted.internet import reactor, task
+
+from logtools.logger import get_logger
+from .fleet import MissileFleet
+
+log = get_logger("sim.error")
+
+class SimulationScheduler:
+    """
+    Single simulation clock advancing every active missile once per tick.
+    The tick is divided into slots and each missile is assigned to the least loaded slot when it is added,
+    so that emissions are spread evenly over the tick period instead of coming in bursts.
+    Missiles are retired when they reach their maximum range, or through an expiry heap when their
+    maximum flight time has elapsed.
+    When vectorized, the missiles of each slot are held in a MissileFleet and advanced in one NumPy step.
+    """
+    def __init__(self, tick=5.0, slots=10, clock=reactor, on_retire=None, vectorized=False):
+        self.tick = tick # seconds between two updates of a missile
+        self.clock = clock
+        self.on_retire = on_retire # called with the entity id of each retired missile
+        self.missiles = {} # entity id -> missile
+        self.slots = [{} for _ in range(slots)] # entity id -> missile, updated at the same sub-tick
+        self.slot_of = {} # entity id -> slot index
+        self.fleets = [MissileFleet() for _ in range(slots)] if vectorized else None # MissileFleet of each slot
+        self.next_slot = 0
+        self.expiries = [] # heap of (expiry time, sequence, entity id, missile)
+        self.sequence = count()
+        self.loop = task.LoopingCall(self.run_slot)
+        self.loop.clock = clock
+
+    def start(self):
+        self.loop.start(self.tick / len(self.slots), now=False)
+
+    def stop(self):
+        if self.loop.running:
+            self.loop.stop()
+
+    def __contains__(self, entity_id):
+        return entity_id in self.missiles
+
+    def __len__(self):
+        return len(self.missiles)
+
+    def add(self, entity_id, missile):
+        """
+        Registers a missile, emits its launch state right away and schedules its next updates.
+
+        Args:
+            entity_id: (site, application, entity) key of the missile
+            missile: the Missile to advance
+        """
+        now = self.clock.seconds()
+        missile.current_timestamp = now # the missile runs on the simulation clock from now on
+        # Least loaded slot, preferring the ones running last so that the next update comes about one tick later
+        order = [(self.next_slot + k) % len(self.slots) for k in range(len(self.slots))]
+        index = min(reversed(order), key=lambda i: len(self.slots[i]))
+        self.missiles[entity_id] = missile
+        self.slots[index][entity_id] = missile
+        self.slot_of[entity_id] = index
+        heapq.heappush(self.expiries, (now + missile.remaining_flight_time, next(self.sequence), entity_id, missile))
+        missile.update(now)
+        if missile.is_out_of_range:
+            self.retire(entity_id)
+        elif self.fleets is not None:
+            self.fleets[index].add(entity_id, missile, now)
+
+    def retire(self, entity_id):
+        """
+        Stops updating a missile.
+        """
+        missile = self.missiles.pop(entity_id, None)
+        if missile is None:
+            return
+        missile.is_out_of_range = True
+        index = self.slot_of.pop(entity_id)
+        del self.slots[index][entity_id]
+        if self.fleets is not None and entity_id in self.fleets[index]:
+            self.fleets[index].remove(entity_id)
+        if self.on_retire is not None:
+            self.on_retire(entity_id)
+
+    def retire_expired(self, now):
+        """
+        Retires the missiles whose maximum flight time has elapsed, after their final state is sent.
+        """
+        while self.expiries and self.expiries[0][0] <= now:
+            _, _, entity_id, missile = heapq.heappop(self.expiries)
+            if self.missiles.get(entity_id) is missile:
+                try:
+                    missile.terminate(now)
+                except Exception as e:
+                    log.error("Failed to terminate missile %s: %s", entity_id, e)
+                self.retire(entity_id)
+
+    def run_slot(self):
+        """
+        Advances the missiles of the current slot, then moves on to the next one.
+        """
+        now = self.clock.seconds()
+        self.retire_expired(now)
+        index = self.next_slot
+        slot = self.slots[index]
+        self.next_slot = (self.next_slot + 1) % len(self.slots)
+        if self.fleets is not None:
+            try:
+                retired = self.fleets[index].update(now)
+            except Exception as e:
+                log.error("Failed to update the missiles of slot %s: %s", index, e)
+                retired = []
+            for entity_id in retired:
+                self.retire(entity_id)
+            return
+        for entity_id, missile in list(slot.items()):
+            try:
+                missile.update(now)
+            except Exception as e:
+                log.error("Failed to update missile %s: %s", entity_id, e)
+            if missile.is_out_of_range:
+                self.retire(entity_id)
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import math
+
+from twisted.trial import unittest
+from opendis.dis7 import EntityID
+
+from simtools.emission_policy import EmissionPolicy, angle_between
+from simtools.objects import Missile
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+class RecordingEmitter:
+    def __init__(self):
+        self.entity_states = []
+
+    def emit_entity_state(self, entity_id, entity_type, position, velocity):
+        self.entity_states.append((position, velocity))
+
+    def emit_custom_pdu(self, STN, target_latitude, target_longitude):
+        pass
+
+class emissionPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.policy = EmissionPolicy(position_threshold=1.0, orientation_threshold=math.radians(3.0), heartbeat=5.0)
+        self.emission = (0.0, (6378137.0, 0.0, 0.0), (0.0, 300.0, 0.0))
+
+    def test_launch(self):
+        self.assertTrue(self.policy.should_emit(None, 0.0, (6378137.0, 0.0, 0.0), (0.0, 300.0, 0.0)))
+
+    def test_predicted_state_suppressed(self):
+        self.assertFalse(self.policy.should_emit(self.emission, 2.0, (6378137.0, 600.5, 0.0), (0.0, 300.0, 0.0)))
+        self.assertEqual((self.policy.emitted, self.policy.suppressed), (0, 1))
+
+    def test_position_threshold(self):
+        self.assertTrue(self.policy.should_emit(self.emission, 2.0, (6378137.0, 602.0, 0.0), (0.0, 300.0, 0.0)))
+
+    def test_orientation_threshold(self):
+        turned = (0.0, 300.0 * math.cos(math.radians(5.0)), 300.0 * math.sin(math.radians(5.0)))
+        self.assertTrue(self.policy.should_emit(self.emission, 0.1, (6378137.0, 30.0, 0.0), turned))
+
+    def test_heartbeat(self):
+        self.assertTrue(self.policy.should_emit(self.emission, 5.0, (6378137.0, 1500.0, 0.0), (0.0, 300.0, 0.0)))
+
+    def test_angle_between(self):
+        self.assertAlmostEqual(angle_between((1.0, 0.0, 0.0), (0.0, 2.0, 0.0)), math.pi / 2)
+        self.assertEqual(angle_between((0.0, 0.0, 0.0), (1.0, 0.0, 0.0)), 0.0)
+
+class missileEmissionTestCase(unittest.TestCase):
+    def fly(self, emission_policy, tick):
+        emitter = RecordingEmitter()
+        missile = Missile(EntityID(1, 20, 300), ENTITY_TYPE, emitter, [43, 5, 5], 230, 318, 10,
+                          1747084949, 1747084949, 125.78616352201257, "00020", 44, "5.143", emission_policy)
+        missile.current_timestamp = 0.0
+        now = 0.0
+        updates = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            while not missile.is_out_of_range:
+                missile.update(now)
+                updates += 1
+                now += tick
+        return emitter.entity_states, updates, missile
+
+    def test_without_policy_every_update_is_emitted(self):
+        emissions, updates, _ = self.fly(None, 5.0)
+        self.assertEqual(len(emissions), updates)
+
+    def test_high_rate_propagation_with_heartbeat(self):
+        policy = EmissionPolicy(position_threshold=1.0, heartbeat=5.0)
+        emissions, updates, missile = self.fly(policy, 0.5)
+        self.assertGreater(updates, 60)
+        self.assertLess(len(emissions), updates / 5)
+        self.assertEqual(emissions[-1], missile.ecef_state()) # termination is emitted
+        self.assertEqual(policy.emitted + policy.suppressed + 1, updates) # the last update always emits
@@ -0,0 +1,156 @@
+import math
+
+from twisted.internet import task
+from twisted.internet.defer import ensureDeferred
+from twisted.trial import unittest
+from opendis.dis7 import EntityID
+
+from httptools.http_poller import HttpPoller
+from simtools.emission_policy import EmissionPolicy
+from simtools.fleet import MissileFleet
+from simtools.objects import Missile
+from simtools.scheduler import SimulationScheduler
+
+ENTITY_TYPE = {"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}
+
+class RecordingEmitter:
+    def __init__(self):
+        self.entity_states = []
+        self.custom_pdus = []
+
+    def emit_entity_state(self, entity_id, entity_type, position, velocity):
+        self.entity_states.append((entity_id.entityID, tuple(position), tuple(velocity)))
+
+    def emit_custom_pdu(self, STN, target_latitude, target_longitude):
+        self.custom_pdus.append((STN, target_latitude, target_longitude))
+
+def make_missile(emitter, entity_number, course, latitude=43.0, maxrange=10, emission_policy=None):
+    return Missile(EntityID(1, 20, entity_number), ENTITY_TYPE, emitter, [latitude, 5.0, 5], course, 318, maxrange,
+                   1747084949, 1747084972, 125.78616352201257, "00020", 44, "5.143", emission_policy)
+
+class fleetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.make_fleet()
+
+    def make_fleet(self, emission_policy=None):
+        self.reference_emitter = RecordingEmitter()
+        self.fleet_emitter = RecordingEmitter()
+        self.fleet = MissileFleet(capacity=2)
+        self.missiles = []
+        self.fleet_missiles = []
+        for i, (course, latitude) in enumerate([(0, 43.0), (90, 43.0), (230, 60.0), (315, -30.0), (180, 0.0)]):
+            missile = make_missile(self.reference_emitter, i, course, latitude, emission_policy=emission_policy and EmissionPolicy(**emission_policy))
+            missile.current_timestamp = 0.0
+            self.missiles.append(missile)
+            fleet_missile = make_missile(self.fleet_emitter, i, course, latitude, emission_policy=emission_policy and EmissionPolicy(**emission_policy))
+            fleet_missile.current_timestamp = 0.0
+            self.fleet_missiles.append(fleet_missile)
+            self.fleet.add((1, 20, i), fleet_missile, 0.0)
+
+    def update_missiles(self, now):
+        for missile in self.missiles:
+            if not missile.is_out_of_range:
+                missile.update(now)
+
+    def test_grows_past_capacity(self):
+        self.assertEqual(len(self.fleet), 5)
+        self.assertGreaterEqual(self.fleet.capacity, 5)
+        self.assertIn((1, 20, 4), self.fleet)
+
+    def test_matches_missile_update(self):
+        for now in (5.0, 10.0, 15.0):
+            self.update_missiles(now)
+            self.fleet.update(now)
+        self.assertEqual(len(self.fleet_emitter.entity_states), len(self.reference_emitter.entity_states))
+        for (fleet_id, fleet_position, fleet_velocity), (reference_id, reference_position, reference_velocity) in zip(
+                self.fleet_emitter.entity_states, self.reference_emitter.entity_states):
+            self.assertEqual(fleet_id, reference_id)
+            for a, b in zip(fleet_position, reference_position):
+                self.assertAlmostEqual(a, b, delta=1e-3)
+            for a, b in zip(fleet_velocity, reference_velocity):
+                self.assertAlmostEqual(a, b, delta=1e-6)
+        self.assertEqual(self.fleet_emitter.custom_pdus, self.reference_emitter.custom_pdus)
+
+    def test_emission_policy(self):
+        self.make_fleet({"position_threshold": 1.0, "orientation_threshold": math.radians(3.0), "heartbeat": 10.0})
+        for now in (0.0, 1.0, 2.0, 3.0, 11.0, 12.0):
+            self.update_missiles(now)
+            self.fleet.update(now)
+        self.assertEqual([entity_id for entity_id, _, _ in self.fleet_emitter.entity_states],
+                         [entity_id for entity_id, _, _ in self.reference_emitter.entity_states])
+        self.assertLess(len(self.fleet_emitter.entity_states), 6 * 5)
+
+    def test_missiles_kept_in_sync(self):
+        self.fleet.update(5.0)
+        missile = self.fleet_missiles[0]
+        self.assertEqual(missile.current_timestamp, 5.0)
+        self.assertEqual(missile.current_position, self.fleet.positions[0].tolist())
+        self.assertEqual(missile.last_emission[0], 5.0)
+
+    def test_range_check_matches_missile(self):
+        removed = []
+        now = 0.0
+        while len(self.fleet):
+            now += 5.0
+            self.update_missiles(now)
+            removed += self.fleet.update(now)
+            self.assertEqual(sorted(removed),
+                             sorted((1, 20, i) for i, missile in enumerate(self.missiles) if missile.is_out_of_range))
+        self.assertEqual(len(removed), 5)
+
+    def test_remove_keeps_rows_consistent(self):
+        self.fleet.remove((1, 20, 1))
+        self.fleet.update(5.0)
+        self.assertEqual([entity_id for entity_id, _, _ in self.fleet_emitter.entity_states], [0, 4, 2, 3])
+        self.assertEqual(self.fleet.index[(1, 20, 4)], 1)
+
+class FakePoster:
+    def __init__(self):
+        self.acks = []
+
+    async def post_to_api(self, json_payload, is_ack):
+        self.acks.append(json_payload)
+        return True
+
+class PollerEmitter(RecordingEmitter):
+    def get_RemoteDISSite(self):
+        return 1
+
+ENGAGEMENT = {
+    "id": 4, "latitude": 43.0, "longitude": 5.0, "STN": "00020", "target_latitude": 44, "target_longitude": "5.143",
+    "AN": 20, "EN": [22, 23], "entity_type": ENTITY_TYPE, "speed": 318, "course": 230, "maxrange": 10,
+    "current_time": 1747084972, "timestamp": 1747084949, "weapon_flight_time": 125.78616352201257,
+}
+
+class vectorizedSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.retired = []
+        self.emitter = PollerEmitter()
+        self.scheduler = SimulationScheduler(tick=2.0, slots=2, clock=self.clock, on_retire=self.retired.append, vectorized=True)
+        self.scheduler.start()
+        self.poster = FakePoster()
+        self.poller = HttpPoller("http://api/poll", "token", 5, self.emitter, self.poster, "http://api/ack", False, None, self.scheduler, clock=self.clock)
+
+    def test_engagement_through_poller(self):
+        self.successResultOf(ensureDeferred(self.poller.process_engagements([ENGAGEMENT])))
+        self.assertEqual(self.poster.acks, [{"engagement": 4}])
+        self.clock.advance(1.0)
+        self.assertEqual(sorted(self.scheduler.missiles), [(1, 20, 22), (1, 20, 23)])
+        self.assertEqual(sum(len(fleet) for fleet in self.scheduler.fleets), 2)
+        self.assertEqual(len(self.emitter.entity_states), 2) # launch states
+        self.clock.pump([1.0] * 4)
+        self.assertEqual(len(self.emitter.entity_states), 6) # one update per missile and tick
+        # 23 s of the flight elapsed at launch: the 10 km range is reached after about 8 s more
+        self.clock.pump([1.0] * 10)
+        self.assertEqual(sorted(self.retired), [(1, 20, 22), (1, 20, 23)])
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertEqual(sum(len(fleet) for fleet in self.scheduler.fleets), 0)
+
+    def test_expiry(self):
+        engagement = dict(ENGAGEMENT, EN=[22], maxrange=1000, weapon_flight_time=28.0) # 5 s of flight left
+        self.successResultOf(ensureDeferred(self.poller.process_engagements([engagement])))
+        self.clock.pump([1.0] * 6)
+        self.assertEqual(self.retired, [(1, 20, 22)])
+        self.assertEqual(len(self.scheduler.fleets[0]) + len(self.scheduler.fleets[1]), 0)
+        self.assertEqual(len(self.emitter.entity_states), 4) # launch, 2 updates and the final state at expiry
@@ -13,7 +13,10 @@ class missileTestCase(unittest.TestCase):
         current_time = 1747084972
         timestamp = 1747084949
         weapon_flight_time = 125.78616352201257
-        self.missile = Missile(entity_id, entity_type, None, initial_position, course, speed, maxrange, timestamp, current_time, weapon_flight_time)
+        STN = "00020"
+        target_latitude = 44
+        target_longitude = "5.143"
+        self.missile = Missile(entity_id, entity_type, None, initial_position, course, speed, maxrange, timestamp, current_time, weapon_flight_time, STN, target_latitude, target_longitude)
     
     def test_advance_north(self):
         self.missile.course = 0 
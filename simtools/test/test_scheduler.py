@@ -0,0 +1,82 @@
+from twisted.internet import task
+from twisted.trial import unittest
+
+from simtools.scheduler import SimulationScheduler
+
+class FakeMissile:
+    def __init__(self, remaining_flight_time=100.0, updates_in_range=1000):
+        self.remaining_flight_time = remaining_flight_time
+        self.updates_in_range = updates_in_range
+        self.is_out_of_range = False
+        self.current_timestamp = None
+        self.updates = []
+
+    def update(self, nowtimestamp=None):
+        self.updates.append(nowtimestamp)
+        if len(self.updates) > self.updates_in_range:
+            self.is_out_of_range = True
+
+    def terminate(self, nowtimestamp):
+        self.updates.append(("terminate", nowtimestamp))
+        self.is_out_of_range = True
+
+class schedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.scheduler = SimulationScheduler(tick=5.0, slots=5, clock=self.clock)
+        self.scheduler.start()
+
+    def test_update_once_per_tick(self):
+        missile = FakeMissile()
+        self.scheduler.add((1, 1, 1), missile)
+        self.assertEqual(missile.updates, [0]) # launch state
+        self.clock.pump([1.0] * 10)
+        self.assertEqual(len(missile.updates), 3)
+        self.assertEqual(missile.updates[2] - missile.updates[1], 5.0)
+
+    def test_emissions_spread_over_tick(self):
+        missiles = [FakeMissile() for _ in range(10)]
+        for i, missile in enumerate(missiles):
+            self.scheduler.add((1, 1, i), missile)
+        per_sub_tick = []
+        for _ in range(5):
+            before = sum(len(m.updates) for m in missiles)
+            self.clock.advance(1.0)
+            per_sub_tick.append(sum(len(m.updates) for m in missiles) - before)
+        self.assertEqual(per_sub_tick, [2, 2, 2, 2, 2])
+
+    def test_retire_out_of_range(self):
+        missile = FakeMissile(updates_in_range=2)
+        self.scheduler.add((1, 1, 1), missile)
+        self.clock.pump([1.0] * 20)
+        self.assertEqual(len(missile.updates), 3)
+        self.assertNotIn((1, 1, 1), self.scheduler)
+
+    def test_on_retire(self):
+        retired = []
+        self.scheduler.on_retire = retired.append
+        self.scheduler.add((1, 1, 1), FakeMissile(updates_in_range=1))
+        self.clock.pump([1.0] * 10)
+        self.assertEqual(retired, [(1, 1, 1)])
+
+    def test_retire_expired(self):
+        missile = FakeMissile(remaining_flight_time=7.0)
+        self.scheduler.add((1, 1, 1), missile)
+        self.clock.pump([1.0] * 20)
+        self.assertEqual(missile.updates, [0, 5.0, ("terminate", 7.0)])
+        self.assertTrue(missile.is_out_of_range)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_already_out_of_range_at_launch(self):
+        missile = FakeMissile(updates_in_range=0)
+        self.scheduler.add((1, 1, 1), missile)
+        self.assertNotIn((1, 1, 1), self.scheduler)
+
+    def test_readded_entity_is_not_retired_by_stale_expiry(self):
+        first = FakeMissile(remaining_flight_time=2.0, updates_in_range=0)
+        self.scheduler.add((1, 1, 1), first)
+        second = FakeMissile(remaining_flight_time=100.0)
+        self.scheduler.add((1, 1, 1), second)
+        self.clock.pump([1.0] * 10)
+        self.assertIn((1, 1, 1), self.scheduler)
+        self.assertEqual(len(second.updates), 3)
@@ -0,0 +1,103 @@
+"""
+Records DIS traffic to a capture file and replays it, to load test the gateway with the traffic profile
+of a real exercise.
+
+    python -m tools.dis_capture record exercise.discap --port 3000 [--group 224.0.0.5] [--duration 600]
+    python -m tools.dis_capture replay exercise.discap --to 127.0.0.1:3000 [--speed 4 | --max-speed]
+                                       [--exercise 2] [--site 20:21,10:11] [--application 300]
+
+The replay keeps the inter-arrival times of the capture, divided by --speed. With --max-speed datagrams
+are sent back to back. --exercise, --site and --application take either an ID, applied to every PDU,
+or a list of old:new pairs.
+"""
+import argparse
+import socket
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.protocol import DatagramProtocol
+
+from distools.capture import CaptureWriter, IdRemapper, parse_id_mapping, read_capture
+
+class Recorder(DatagramProtocol):
+    def __init__(self, writer, group=None):
+        self.writer = writer
+        self.group = group
+
+    def startProtocol(self):
+        if self.group:
+            self.transport.joinGroup(self.group)
+        print(f"[CAPTURE] Recording to {self.writer.file.name}")
+
+    def datagramReceived(self, data, addr):
+        self.writer.write(data, addr, time.time())
+
+def record(args):
+    writer = CaptureWriter(args.capture, args.buffer_size)
+    reactor.listenMulticast(args.port, Recorder(writer, args.group), interface=args.interface, listenMultiple=True)
+    if args.duration:
+        reactor.callLater(args.duration, reactor.stop)
+    reactor.addSystemEventTrigger("after", "shutdown", writer.close)
+    reactor.run()
+    print(f"[CAPTURE] {writer.records} datagrams recorded")
+
+def replay(args):
+    host, _, port = args.to.rpartition(":")
+    destination = (host, int(port))
+    remapper = IdRemapper(
+        parse_id_mapping(args.exercise) if args.exercise else None,
+        parse_id_mapping(args.site) if args.site else None,
+        parse_id_mapping(args.application) if args.application else None,
+    )
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, args.ttl)
+
+    sent = 0
+    first = start = None
+    for timestamp, _, data in read_capture(args.capture):
+        if first is None:
+            first, start = timestamp, time.perf_counter()
+        elif not args.max_speed:
+            delay = start + (timestamp - first) / args.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sender.sendto(remapper.remap(data) if remapper else data, destination)
+        sent += 1
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    rate = sent / elapsed if elapsed else 0.0
+    print(f"[REPLAY] {sent} datagrams sent to {args.to} in {elapsed:.2f} s ({rate:,.0f} datagrams/s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Records and replays DIS traffic.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recording = commands.add_parser("record", help="record DIS datagrams to a capture file")
+    recording.add_argument("capture", help="capture file, appended to if it exists")
+    recording.add_argument("--port", type=int, default=3000, help="UDP port to listen on (default: 3000)")
+    recording.add_argument("--group", help="multicast group to join")
+    recording.add_argument("--interface", default="", help="address to listen on (default: all)")
+    recording.add_argument("--duration", type=float, default=0, help="seconds to record, 0 until interrupted")
+    recording.add_argument("--buffer-size", type=int, default=1 << 20, help="bytes buffered between two writes")
+    recording.set_defaults(run=record)
+
+    replaying = commands.add_parser("replay", help="replay a capture file")
+    replaying.add_argument("capture", help="capture file")
+    replaying.add_argument("--to", default="127.0.0.1:3000", help="destination host:port (default: 127.0.0.1:3000)")
+    speed = replaying.add_mutually_exclusive_group()
+    speed.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 1 for real time (default: 1)")
+    speed.add_argument("--max-speed", action="store_true", help="send as fast as possible")
+    replaying.add_argument("--exercise", help="exercise ID remapping: N or old:new,...")
+    replaying.add_argument("--site", help="site ID remapping: N or old:new,...")
+    replaying.add_argument("--application", help="application ID remapping: N or old:new,...")
+    replaying.add_argument("--ttl", type=int, default=1, help="multicast TTL (default: 1)")
+    replaying.set_defaults(run=replay)
+
+    args = parser.parse_args(argv)
+    if args.command == "replay" and args.speed <= 0:
+        parser.error("--speed must be positive, use --max-speed to send as fast as possible")
+    args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
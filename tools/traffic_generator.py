@@ -0,0 +1,250 @@
+"""
+Generates synthetic DIS traffic at the scale of a large exercise: N moving entities of the types simulated by
+mock_simu.py, spread over several processes, at a target aggregate PDU rate, with an optional mix of other
+PDU types to exercise the gateway filtering. Each entity PDU is serialized once and only its location,
+velocity and timestamp are written before each send.
+
+    python -m tools.traffic_generator --entities 5000 --hz 10 --processes 4 --to 127.0.0.1:3000 --duration 60
+    python -m tools.traffic_generator --entities 2000 --rate 30000 --mix fire:0.05,detonation:0.05,data:0.1
+
+Reports the aggregate rate actually reached every --report-interval seconds and at the end.
+"""
+import argparse
+import multiprocessing
+import random
+import socket
+import struct
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import CollisionPdu, DataPdu, DetonationPdu, EntityID, FirePdu
+
+from distools.geotools.tools import lla2ecef_batch, natural_velocity_to_ECEF_batch
+from distools.pdus.entity_state_template import EntityStateTemplate, dis_timestamp
+
+# Entity types of mock_simu.py: entity type, speed range (m/s), altitude range (m), maximum turn rate (degrees/s)
+ENTITY_TYPES = {
+    "NH90": ({"kind": 1, "domain": 2, "country": 78, "category": 22, "subcategory": 2, "specific": 0, "extra": 0}, (40, 80), (100, 3000), 6.0),
+    "ExocetMM40": ({"kind": 2, "domain": 6, "country": 71, "category": 1, "subcategory": 1, "specific": 4, "extra": 0}, (280, 320), (5, 30), 2.0),
+    "Normandie": ({"kind": 1, "domain": 3, "country": 62, "category": 6, "subcategory": 5, "specific": 1, "extra": 0}, (5, 15), (0, 0), 1.0),
+}
+SITE = 20 # red team, as mock_simu.py
+APPLICATIONS = (100, 200, 300) # its 3 units
+
+# Other PDU types of the mix: opendis class and PDU type (not set by opendis)
+OTHER_PDUS = {
+    "fire": (FirePdu, 2),
+    "detonation": (DetonationPdu, 3),
+    "collision": (CollisionPdu, 4),
+    "data": (DataPdu, 20),
+}
+LENGTH = struct.Struct(">H")
+LENGTH_OFFSET = 8
+
+METERS_PER_DEGREE = 1854.0 * 60.0 # as Missile.advance()
+
+def other_pdu_datagram(name, exercise_id=1):
+    pdu_class, pdu_type = OTHER_PDUS[name]
+    pdu = pdu_class()
+    pdu.pduStatus = 0
+    pdu.pduType = pdu_type
+    pdu.exerciseID = exercise_id
+    memoryStream = BytesIO()
+    pdu.serialize(DataOutputStream(memoryStream))
+    datagram = bytearray(memoryStream.getvalue())
+    LENGTH.pack_into(datagram, LENGTH_OFFSET, len(datagram))
+    return bytes(datagram)
+
+def parse_mix(spec):
+    """
+    Parses "fire:0.05,data:0.1" into {"fire": 0.05, "data": 0.1}: the share of each PDU type in the traffic.
+    """
+    mix = {}
+    for item in filter(None, spec.split(",")):
+        name, _, share = item.strip().partition(":")
+        if name not in OTHER_PDUS:
+            raise ValueError(f"Unknown PDU type in mix: '{name}'. Expected one of {', '.join(OTHER_PDUS)}.")
+        mix[name] = float(share)
+    if sum(mix.values()) >= 1:
+        raise ValueError("The shares of the mix must add up to less than 1")
+    return mix
+
+class Entities:
+    """
+    Kinematic state of the entities of one process, as arrays. Entities fly at constant speed and altitude,
+    turning at a rate that changes from time to time.
+    """
+    def __init__(self, first, count, area, seed):
+        rng = np.random.default_rng(seed)
+        names = list(ENTITY_TYPES)
+        kinds = rng.integers(len(names), size=count)
+        self.templates = []
+        speeds, altitudes, turn_rates = np.empty(count), np.empty(count), np.empty(count)
+        for i, kind in enumerate(kinds):
+            entity_type, (min_speed, max_speed), (min_altitude, max_altitude), max_turn_rate = ENTITY_TYPES[names[kind]]
+            number = first + i
+            entity_id = EntityID(SITE, APPLICATIONS[number % len(APPLICATIONS)], number // len(APPLICATIONS) + 1)
+            self.templates.append(EntityStateTemplate(entity_id, entity_type, marking=f"{number:05d}"))
+            speeds[i] = rng.uniform(min_speed, max_speed)
+            altitudes[i] = rng.uniform(min_altitude, max_altitude)
+            turn_rates[i] = max_turn_rate
+        south, west, north, east = area
+        self.latitudes = rng.uniform(south, north, count)
+        self.longitudes = rng.uniform(west, east, count)
+        self.altitudes = altitudes
+        self.courses = rng.uniform(0, 360, count)
+        self.speeds = speeds
+        self.max_turn_rates = turn_rates
+        self.turn_rates = rng.uniform(-1, 1, count) * turn_rates
+        self.updated = np.zeros(count) # time of the last update of each entity, 0 = not started
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.templates)
+
+    def advance(self, rows, now):
+        """
+        Moves the given entities to the given time.
+
+        Returns:
+            N×3 arrays of ECEF positions and velocities of these entities
+        """
+        updated = self.updated[rows]
+        elapsed = np.where(updated > 0, now - updated, 0.0)
+        self.updated[rows] = now
+        courses = (self.courses[rows] + self.turn_rates[rows] * elapsed) % 360
+        self.courses[rows] = courses
+        changing = self.rng.random(len(rows)) < elapsed / 30.0 # a new turn rate every 30 s on average
+        self.turn_rates[rows[changing]] = self.rng.uniform(-1, 1, changing.sum()) * self.max_turn_rates[rows[changing]]
+        radians = np.radians(courses)
+        latitudes = np.clip(self.latitudes[rows] + elapsed * np.cos(radians) * self.speeds[rows] / METERS_PER_DEGREE, -85, 85)
+        longitudes = (self.longitudes[rows] + elapsed * np.sin(radians) * self.speeds[rows] / (METERS_PER_DEGREE * np.cos(np.radians(latitudes))) + 180) % 360 - 180
+        self.latitudes[rows], self.longitudes[rows] = latitudes, longitudes
+        altitudes = self.altitudes[rows]
+        positions = lla2ecef_batch(np.column_stack((latitudes, longitudes, altitudes)))
+        velocities = natural_velocity_to_ECEF_batch(latitudes, longitudes, altitudes, courses, self.speeds[rows])
+        return positions, velocities
+
+def worker(index, first, count, rate, mix, destination, duration, area, seed, sent, chunk=500):
+    """
+    Sends the PDUs of one process: its entities in round robin, and its share of the other PDU types.
+
+    Args:
+        sent: shared array of counters, [index * (1 + len(OTHER_PDUS)) + kind], kind 0 being EntityStatePdus
+    """
+    entities = Entities(first, count, area, seed)
+    others = {name: other_pdu_datagram(name) for name in mix}
+    other_names = list(mix)
+    other_thresholds = np.cumsum([mix[name] for name in other_names])
+    slots = {name: index * (1 + len(OTHER_PDUS)) + 1 + i for i, name in enumerate(OTHER_PDUS)}
+    entity_slot = index * (1 + len(OTHER_PDUS))
+    rng = random.Random(seed)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sendto = sender.sendto
+
+    cursor = 0
+    total = 0
+    start = time.perf_counter()
+    wall_start = time.time()
+    while True:
+        elapsed = time.perf_counter() - start
+        if duration and elapsed >= duration:
+            return
+        due = min(int(rate * elapsed) - total, chunk)
+        if due <= 0:
+            time.sleep(min(0.001, (total + 1) / rate - elapsed))
+            continue
+        entity_pdus = due
+        for _ in range(due):
+            draw = rng.random()
+            if other_names and draw < other_thresholds[-1]:
+                name = other_names[int(np.searchsorted(other_thresholds, draw, side="right"))]
+                sendto(others[name], destination)
+                sent[slots[name]] += 1
+                entity_pdus -= 1
+        if entity_pdus:
+            rows = (cursor + np.arange(entity_pdus)) % len(entities)
+            cursor = (cursor + entity_pdus) % len(entities)
+            now = wall_start + elapsed
+            positions, velocities = entities.advance(rows, now)
+            timestamp = dis_timestamp(now)
+            templates = entities.templates
+            for row, position, velocity in zip(rows.tolist(), positions.tolist(), velocities.tolist()):
+                sendto(templates[row].pack(position, velocity, timestamp), destination)
+            sent[entity_slot] += entity_pdus
+        total += due
+
+def totals(sent, processes):
+    kinds = ["EntityState", *OTHER_PDUS]
+    width = len(kinds)
+    return {kind: sum(sent[i * width + k] for i in range(processes)) for k, kind in enumerate(kinds)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates synthetic DIS traffic from several processes.")
+    parser.add_argument("--to", default="127.0.0.1:3000", help="destination host:port (default: 127.0.0.1:3000)")
+    parser.add_argument("--entities", type=int, default=1000, help="number of simulated entities (default: 1000)")
+    parser.add_argument("--hz", type=float, default=10.0, help="EntityStatePdus per second and per entity (default: 10)")
+    parser.add_argument("--rate", type=float, help="aggregate PDUs per second, all types, instead of --hz")
+    parser.add_argument("--mix", default="", help="share of other PDU types, e.g. fire:0.05,detonation:0.02,data:0.1")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="sending processes (default: one per core)")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 until interrupted")
+    parser.add_argument("--area", default="42,4,44,8", help="south,west,north,east bounds of the initial positions, in degrees")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between two rate reports")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    host, _, port = args.to.rpartition(":")
+    destination = (host, int(port))
+    area = tuple(float(bound) for bound in args.area.split(","))
+    rate = args.rate or args.entities * args.hz / (1 - sum(mix.values()))
+    processes = max(1, min(args.processes, args.entities))
+
+    sent = multiprocessing.Array("q", processes * (1 + len(OTHER_PDUS)), lock=False)
+    workers = []
+    for index in range(processes):
+        first = index * args.entities // processes
+        count = (index + 1) * args.entities // processes - first
+        process = multiprocessing.Process(
+            target=worker,
+            args=(index, first, count, rate / processes, mix, destination, args.duration, area, args.seed * 1000 + index, sent),
+            daemon=True,
+        )
+        process.start()
+        workers.append(process)
+    print(f"[GENERATOR] {args.entities} entities, {processes} processes, target {rate:,.0f} PDUs/s to {args.to}")
+
+    start = last_time = time.perf_counter()
+    last_total = 0
+    try:
+        while any(process.is_alive() for process in workers):
+            time.sleep(0.1)
+            now = time.perf_counter()
+            if now - last_time >= args.report_interval:
+                total = sum(totals(sent, processes).values())
+                print(f"[GENERATOR] {(total - last_total) / (now - last_time):>12,.0f} PDUs/s")
+                last_time, last_total = now, total
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+    for process in workers:
+        process.join()
+
+    elapsed = time.perf_counter() - start
+    counts = totals(sent, processes)
+    total = sum(counts.values())
+    print(f"[GENERATOR] {total} PDUs sent in {elapsed:.1f} s: {total / elapsed:,.0f} PDUs/s reached for {rate:,.0f} targeted "
+          f"({total / elapsed / rate:.0%})")
+    for kind, count in counts.items():
+        if count:
+            print(f"[GENERATOR] {kind:<12} {count:>10} ({count / total:.1%})")
+
+if __name__ == "__main__":
+    sys.exit(main())